@@ -0,0 +1,113 @@
+"""Compares the compact call result encoding of the ABI with pickle.
+
+Sample call results are encoded and decoded one by one with both formats,
+then as a single stream with the compact format, and the sizes and median
+durations are printed.
+
+Usage: python -m benchmarks.call_results [--count 10000] [--repeat 5]
+"""
+import base64
+import pickle
+import statistics
+import time
+from argparse import ArgumentParser
+
+from pikciosc.abi import ABI
+from pikciosc.models import CallInfo, ContractInterface, EndPointDef, \
+    StopWatch, SuccessInfo, TypedNamed, Variable
+
+_INTERFACE = ContractInterface('bench_contract', [], [
+    EndPointDef('transfer', 'bool', [
+        TypedNamed('sender', 'str'), TypedNamed('receiver', 'str'),
+        TypedNamed('amount', 'int'),
+    ]),
+    EndPointDef('balances', 'dict', []),
+])
+
+
+def _call_results(count):
+    """Creates sample call results: successful transfers, failed ones and
+    calls returning containers.
+
+    :rtype: list[CallInfo]
+    """
+    call_results = []
+    for i in range(count):
+        stop_watch = StopWatch(1600000000.0 + i, 1600000000.5 + i)
+        if i % 10 == 9:
+            call_results.append(CallInfo(
+                'balances', [], stop_watch,
+                ret_val={str(j): j * 100 for j in range(10)}, gas_used=420))
+            continue
+        kwargs = [Variable('sender', str, f'account-{i}'),
+                  Variable('receiver', str, f'account-{i + 1}'),
+                  Variable('amount', int, i * 3)]
+        if i % 10 == 8:
+            call_results.append(CallInfo(
+                'transfer', kwargs, stop_watch,
+                SuccessInfo('ValueError: insufficient funds')))
+        else:
+            call_results.append(CallInfo('transfer', kwargs, stop_watch,
+                                         ret_val=True, gas_used=120))
+    return call_results
+
+
+def _pickle_encode(call_result):
+    return base64.encodebytes(pickle.dumps(call_result)).decode('utf-8')
+
+
+def _pickle_decode(encoded_call_result):
+    return pickle.loads(base64.decodebytes(encoded_call_result.encode()))
+
+
+def _median_duration(func, repeat):
+    """Runs a function several times and returns its median duration and
+    last result.
+
+    :rtype: tuple[float,any]
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def run(count, repeat):
+    """Runs the benchmark and prints one line per format."""
+    abi = ABI(_INTERFACE)
+    call_results = _call_results(count)
+    formats = [
+        ('pickle', lambda: [_pickle_encode(c) for c in call_results],
+         lambda encoded: [_pickle_decode(e) for e in encoded]),
+        ('compact', lambda: [abi.encode_result(c) for c in call_results],
+         lambda encoded: [abi.decode_result(e) for e in encoded]),
+        ('stream', lambda: abi.encode_results(call_results),
+         lambda encoded: list(abi.decode_results(encoded))),
+    ]
+    print(f"{'format':<8} {'size (bytes)':>13} {'encode (ms)':>12} "
+          f"{'decode (ms)':>12}")
+    for name, encode, decode in formats:
+        encode_time, encoded = _median_duration(encode, repeat)
+        decode_time, _ = _median_duration(lambda: decode(encoded), repeat)
+        size = (len(encoded) if isinstance(encoded, bytes) else
+                sum(len(e) for e in encoded))
+        print(f'{name:<8} {size:>13} {encode_time * 1000:>12.1f} '
+              f'{decode_time * 1000:>12.1f}')
+
+
+def _parse_args():
+    """Loads the arguments from the command line."""
+    parser = ArgumentParser(description='Call result encoding benchmark')
+    parser.add_argument("--count", "-c", type=int, default=10000,
+                        help='Number of call results')
+    parser.add_argument("--repeat", "-r", type=int, default=5,
+                        help='Number of runs per format')
+    known_args, _ = parser.parse_known_args()
+    return known_args.count, known_args.repeat
+
+
+if __name__ == '__main__':
+    run(*_parse_args())
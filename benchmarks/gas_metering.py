@@ -0,0 +1,103 @@
+"""Measures the overhead of gas metering on contract calls.
+
+Each endpoint of a sample contract is called without metering, then metered by
+line and by opcode, and the median durations are compared.
+
+Usage: python -m benchmarks.gas_metering [--repeat 20]
+"""
+import os
+import statistics
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pikciosc.invoke import gas, shell
+from pikciosc.models import Variable
+
+_CONTRACT = '''
+balances = {}
+
+
+def _fee(amount):
+    return amount // 100
+
+
+def transfers(count: int) -> int:
+    for i in range(count):
+        sender, receiver = str(i % 10), str((i + 1) % 10)
+        amount = 1000 - _fee(1000)
+        balances[sender] = balances.get(sender, 0) - amount
+        balances[receiver] = balances.get(receiver, 0) + amount
+    return len(balances)
+
+
+def sort_values(count: int) -> int:
+    return len(sorted(str(i) for i in range(count)))
+
+
+def fibonacci(n: int) -> int:
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+'''
+
+_CALLS = [
+    ('transfers', [Variable('count', int, 20000)]),
+    ('sort_values', [Variable('count', int, 20000)]),
+    ('fibonacci', [Variable('n', int, 18)]),
+]
+
+
+def _median_duration(module, endpoint, kwargs, granularity, repeat):
+    """Calls an endpoint several times and returns the median duration and
+    the gas used. Calls are not metered if granularity is None.
+
+    :rtype: tuple[float,int]
+    """
+    durations = []
+    gas_used = None
+    for _ in range(repeat):
+        meter = granularity and gas.GasMeter(module.__dict__, 10 ** 12,
+                                             granularity)
+        kwargs_dct = {arg.name: arg.value for arg in kwargs}
+        start = time.perf_counter()
+        if meter:
+            with meter:
+                getattr(module, endpoint)(**kwargs_dct)
+        else:
+            getattr(module, endpoint)(**kwargs_dct)
+        durations.append(time.perf_counter() - start)
+        gas_used = meter and meter.gas_used
+    return statistics.median(durations), gas_used
+
+
+def run(repeat):
+    """Runs the benchmark and prints one line per endpoint and granularity."""
+    with tempfile.TemporaryDirectory() as folder:
+        contract_path = os.path.join(folder, 'bench_contract.py')
+        with open(contract_path, 'w') as fd:
+            fd.write(_CONTRACT)
+        module = shell._load_module(contract_path)
+
+        print(f"{'endpoint':<12} {'granularity':<12} {'plain (ms)':>11} "
+              f"{'metered (ms)':>13} {'overhead':>9} {'gas':>10}")
+        for endpoint, kwargs in _CALLS:
+            plain, _ = _median_duration(module, endpoint, kwargs, None,
+                                        repeat)
+            for granularity in (gas.GRANULARITY_LINE, gas.GRANULARITY_OPCODE):
+                metered, gas_used = _median_duration(
+                    module, endpoint, kwargs, granularity, repeat)
+                print(f'{endpoint:<12} {granularity:<12} '
+                      f'{plain * 1000:>11.2f} {metered * 1000:>13.2f} '
+                      f'{metered / plain:>8.1f}x {gas_used:>10}')
+
+
+def _parse_args():
+    """Loads the arguments from the command line."""
+    parser = ArgumentParser(description='Gas metering overhead benchmark')
+    parser.add_argument("--repeat", "-r", type=int, default=20,
+                        help='Number of calls per endpoint and mode')
+    known_args, _ = parser.parse_known_args()
+    return known_args.repeat
+
+
+if __name__ == '__main__':
+    run(_parse_args())
@@ -0,0 +1,124 @@
+"""Checks the imports of the command line entry points.
+
+Each entry point is imported in a fresh interpreter, several times, and the
+modules it loads are checked against the ones it must not load, such as the
+sandbox for the shell running inside it. The median duration of the import is
+reported as well and, with `--budget`, compared with the budget of the entry
+point. The script exits with an error status if any entry point loads a
+forbidden module, or is over budget when budgets are enforced.
+
+Budgets are in milliseconds and may be scaled for slower machines. As they
+depend on the machine, they are not enforced by default.
+
+Usage: python -m benchmarks.import_time [--repeat 5] [--budget] [--scale 1.0]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+_HEAVY_MODULES = ('mypy', 'pydoc')
+"""Modules loaded on first use only, by every entry point."""
+
+_ENTRY_POINTS = (
+    ('pikciosc.invoke.shell', 40,
+     _HEAVY_MODULES + ('argparse', 'subprocess', 'pikciosc.invoke.sandbox')),
+    ('pikciosc.invoke.worker', 45,
+     _HEAVY_MODULES + ('argparse', 'subprocess', 'pikciosc.invoke.sandbox')),
+    ('pikciosc.invoke.invoke', 35,
+     _HEAVY_MODULES + ('subprocess', 'pikciosc.invoke.sandbox')),
+    ('pikciosc.client', 40,
+     _HEAVY_MODULES + ('pikciosc.parse', 'pikciosc.invoke.sandbox')),
+    ('pikciosc.parse.parser', 70, _HEAVY_MODULES + ('pikciosc.invoke',)),
+    ('pikciosc.compile', 50, _HEAVY_MODULES + ('pikciosc.parse',)),
+    ('pikciosc.quotations', 70, _HEAVY_MODULES + ('pikciosc.parse',)),
+    ('pikciosc.models', 20, _HEAVY_MODULES),
+    ('pikciosc.abi', 40, _HEAVY_MODULES),
+)
+"""Entry points, with their budget in milliseconds and the modules they must
+not load."""
+
+_IMPORT_SCRIPT = '''
+import importlib, json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps([time.perf_counter() - start,
+                  sorted(set(sys.modules) - before)]))
+'''
+"""Imports a module, printing the duration and the modules loaded."""
+
+
+def _import(module_name):
+    """Imports a module in a new interpreter.
+
+    :return: Duration of the import, in seconds, and loaded modules.
+    :rtype: tuple[float,list[str]]
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-c', _IMPORT_SCRIPT, module_name],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    duration, modules = json.loads(output)
+    return duration, modules
+
+
+def _forbidden(modules, forbidden):
+    """Lists the loaded modules which are, or belong to, forbidden ones.
+
+    :rtype: list[str]
+    """
+    return [
+        module for module in modules
+        if any(module == name or module.startswith(f'{name}.')
+               for name in forbidden)
+    ]
+
+
+def run(repeat, enforce_budget, scale):
+    """Measures every entry point and prints one line for each.
+
+    :param repeat: Number of imports per entry point.
+    :type repeat: int
+    :param enforce_budget: If True, entry points over budget fail the check.
+    :type enforce_budget: bool
+    :param scale: Factor applied to the budgets.
+    :type scale: float
+    :return: True if no entry point loads a forbidden module or, when budgets
+        are enforced, is over budget.
+    :rtype: bool
+    """
+    print(f"{'entry point':<26} {'import (ms)':>12} {'budget (ms)':>12}")
+    success = True
+    for module_name, budget, forbidden in _ENTRY_POINTS:
+        results = [_import(module_name) for _ in range(repeat)]
+        duration = statistics.median(result[0] for result in results) * 1000
+        budget *= scale
+        loaded = _forbidden(results[0][1], forbidden)
+        status = 'ok'
+        if enforce_budget and duration > budget:
+            status = 'OVER BUDGET'
+        if loaded:
+            status = f"loads {', '.join(loaded)}"
+        success = success and status == 'ok'
+        print(f'{module_name:<26} {duration:>12.1f} {budget:>12.0f}  {status}')
+    return success
+
+
+def _parse_args():
+    """Loads the arguments from the command line."""
+    parser = ArgumentParser(description='Entry points import time budget')
+    parser.add_argument("--repeat", "-r", type=int, default=5,
+                        help='Number of imports per entry point')
+    parser.add_argument("--budget", "-b", action='store_true',
+                        help='Fail if an entry point is over budget')
+    parser.add_argument("--scale", "-s", type=float, default=1.0,
+                        help='Factor applied to the budgets')
+    known_args, _ = parser.parse_known_args()
+    return known_args.repeat, known_args.budget, known_args.scale
+
+
+if __name__ == '__main__':
+    if not run(*_parse_args()):
+        sys.exit(1)
@@ -0,0 +1,98 @@
+"""Compares the speed of the ast and mypy parsing backends.
+
+Contracts are parsed without cache by each backend, in a fresh interpreter to
+account for the import of the backend, then repeatedly in the same process.
+The median durations are printed.
+
+Usage: python -m benchmarks.parse_backends [contract.py ...] [--repeat 20]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+from pikciosc.parse.parser import BACKENDS, parse_string
+
+_DEFAULT_CONTRACT = os.path.join(os.path.dirname(__file__), '..', 'assets',
+                                 'smart_contract.py')
+
+_COLD_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+from pikciosc.parse import parse_string
+with open(sys.argv[2]) as fd:
+    try:
+        parse_string(fd.read(), 'submitted_code', False, sys.argv[1])
+    except ValueError:
+        pass
+print(time.perf_counter() - start)
+'''
+"""Imports the parser and parses a contract, printing the duration. Invalid
+contracts are measured too, as their error is the result of the parse."""
+
+
+def _parse(source, backend):
+    """Parses a contract without cache, ignoring its errors."""
+    try:
+        parse_string(source, 'submitted_code', False, backend)
+    except ValueError:
+        pass
+
+
+def _cold_duration(backend, file_path):
+    """Parses a contract in a new interpreter.
+
+    :return: Duration of the import and parse, in seconds.
+    :rtype: float
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-c', _COLD_SCRIPT, backend, file_path],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    return float(output)
+
+
+def _warm_duration(backend, source, repeat):
+    """Parses a contract repeatedly in this process, after a first parse.
+
+    :return: Median duration of a parse, in seconds.
+    :rtype: float
+    """
+    _parse(source, backend)
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _parse(source, backend)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def run(files, repeat):
+    """Runs the benchmark and prints one line per contract and backend."""
+    print(f"{'contract':<30} {'backend':<8} {'cold (ms)':>10} "
+          f"{'warm (ms)':>10}")
+    for file_path in files or [_DEFAULT_CONTRACT]:
+        with open(file_path) as fd:
+            source = fd.read()
+        for backend in BACKENDS:
+            cold = statistics.median(
+                _cold_duration(backend, file_path) for _ in range(3))
+            warm = _warm_duration(backend, source, repeat)
+            print(f'{os.path.basename(file_path):<30} {backend:<8} '
+                  f'{cold * 1000:>10.1f} {warm * 1000:>10.2f}')
+
+
+def _parse_args():
+    """Loads the arguments from the command line."""
+    parser = ArgumentParser(description='Parsing backends benchmark')
+    parser.add_argument("files", nargs='*',
+                        help='Contracts to parse, the sample one by default')
+    parser.add_argument("--repeat", "-r", type=int, default=20,
+                        help='Number of parses per backend')
+    known_args, _ = parser.parse_known_args()
+    return known_args.files, known_args.repeat
+
+
+if __name__ == '__main__':
+    run(*_parse_args())
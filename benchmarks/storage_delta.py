@@ -0,0 +1,132 @@
+"""Compares the storage delta exchanged with sandboxes with full storage
+states.
+
+A contract with a large storage is called as a sandbox worker does, and its
+result is encoded and decoded as a worker response. The full mode restores
+storage without copy and answers with the whole states before and after the
+call, the delta mode is the one of `shell.execute`. The response sizes and
+the median durations of a whole round trip are printed, for a call changing
+a small variable and for a call changing the large one in place.
+
+Usage: python -m benchmarks.storage_delta [--size 10000] [--repeat 20]
+"""
+import os
+import statistics
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from pikciosc.invoke import shell
+from pikciosc.invoke.protocol import decode_response, encode_response, \
+    STATUS_OK
+from pikciosc.models import CallInfo, ExecutionInfo, Variable
+
+_CONTRACT = '''
+counter = 0
+balances = {}
+
+
+def increment() -> int:
+    global counter
+    counter += 1
+    return counter
+
+
+def deposit(account: str, amount: int) -> int:
+    balances[account] = balances.get(account, 0) + amount
+    return balances[account]
+'''
+
+_CALLS = [
+    ('increment', []),
+    ('deposit', [Variable('account', str, 'account-0'),
+                 Variable('amount', int, 10)]),
+]
+
+
+def _full_round_trip(module, storage_vars, endpoint, kwargs):
+    """Calls an endpoint and exchanges the full storage states.
+
+    :rtype: tuple[int,ExecutionInfo]
+    """
+    for var in storage_vars:
+        setattr(module, var.name, var.value)
+    call_info = CallInfo(endpoint, kwargs)
+    call_info.ret_val = getattr(module, endpoint)(
+        **{arg.name: arg.value for arg in kwargs})
+    storage_after = [
+        Variable(var.name, var.type, getattr(module, var.name))
+        for var in storage_vars
+    ]
+    response = encode_response(STATUS_OK, ExecutionInfo(
+        storage_vars, call_info, storage_after=storage_after).to_dict())
+    return len(response), ExecutionInfo.from_dict(decode_response(response))
+
+
+def _delta_round_trip(module, storage_vars, endpoint, kwargs):
+    """Calls an endpoint like a sandbox worker and exchanges the storage
+    delta.
+
+    :rtype: tuple[int,ExecutionInfo]
+    """
+    execution_info = shell.execute(module.__file__, storage_vars, endpoint,
+                                   kwargs, module)
+    response = encode_response(STATUS_OK, execution_info.to_dict(delta=True))
+    return len(response), ExecutionInfo.from_dict(
+        decode_response(response)).materialise(storage_vars)
+
+
+def _median_duration(func, repeat):
+    """Runs a function several times and returns its median duration and
+    last result.
+
+    :rtype: tuple[float,any]
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def run(size, repeat):
+    """Runs the benchmark and prints one line per endpoint and mode."""
+    storage_vars = [
+        Variable('counter', int, 0),
+        Variable('balances', dict,
+                 {f'account-{i}': i * 100 for i in range(size)}),
+    ]
+    with tempfile.TemporaryDirectory() as folder:
+        contract_path = os.path.join(folder, 'bench_contract.py')
+        with open(contract_path, 'w') as fd:
+            fd.write(_CONTRACT)
+        module = shell._load_module(contract_path)
+
+        print(f"{'endpoint':<10} {'mode':<6} {'size (bytes)':>13} "
+              f"{'round trip (ms)':>16}")
+        for endpoint, kwargs in _CALLS:
+            for mode, round_trip in (('full', _full_round_trip),
+                                     ('delta', _delta_round_trip)):
+                duration, (response_size, _) = _median_duration(
+                    lambda: round_trip(module, storage_vars, endpoint,
+                                       kwargs),
+                    repeat)
+                print(f'{endpoint:<10} {mode:<6} {response_size:>13} '
+                      f'{duration * 1000:>16.2f}')
+
+
+def _parse_args():
+    """Loads the arguments from the command line."""
+    parser = ArgumentParser(description='Storage delta benchmark')
+    parser.add_argument("--size", "-s", type=int, default=10000,
+                        help='Number of entries of the large storage value')
+    parser.add_argument("--repeat", "-r", type=int, default=20,
+                        help='Number of calls per endpoint and mode')
+    known_args, _ = parser.parse_known_args()
+    return known_args.size, known_args.repeat
+
+
+if __name__ == '__main__':
+    run(*_parse_args())
@@ -1,20 +1,150 @@
 """
 This modules contains objects manipulating contracts to generate ABIs.
 ABIs let encode calls in bytecode to be transported on the network.
+
+ABIs and endpoint selectors are shared by the whole process through LRU
+caches keyed by the fingerprint of the contract interface. Their size is
+bounded by PKC_SC_ABI_CACHE_SIZE (128 interfaces by default).
 """
+import hashlib
 import json
 import base64
+import binascii
+import logging
+import math
+import os
 import pickle
+import struct
+import threading
+import warnings
+from collections import OrderedDict
+
+from pikciosc.codec import SequenceCodec
+from pikciosc.models import ContractInterface, CallInfo, StopWatch, \
+    SuccessInfo, Variable
+
+ENV_PKC_SC_ABI_CACHE_SIZE = 'PKC_SC_ABI_CACHE_SIZE'
+
+_RESULT_VERSION = 2
+"""Version of the call result encoding. Pickled results never start with
+it."""
+_RESULT_HEADER = struct.Struct('>BB8sdd')
+"""Version, flags, endpoint selector, start and end of the call."""
+_RESULT_TAGGED_ARGS = 0x01
+_RESULT_HAS_GAS = 0x02
+_RESULT_HAS_ERROR = 0x04
+_RESULT_HAS_RETURN = 0x08
+_RESULT_TAGGED_RETURN = 0x10
+_GAS = struct.Struct('>q')
+_NAN = float('nan')
+_TAGGED_CODEC = SequenceCodec([None])
+"""Encodes a single value tagged with its own type."""
+_ERROR_CODEC = SequenceCodec([str, None])
+"""Encodes an error message and its optional category."""
+_TAGGED_TYPES = {
+    typ.__name__: typ
+    for typ in (bool, int, float, str, bytes, list, tuple, dict)
+}
+"""Types of arguments restored from tagged call results. Other types are not
+located by name, as that could import modules."""
+
+
+class _LRUCache(object):
+    """Thread-safe mapping evicting its least recently used entries, with
+    hit and miss counters."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Gets the value of a key, or None if not cached."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Caches a value, evicting entries past PKC_SC_ABI_CACHE_SIZE."""
+        max_size = int(os.environ.get(ENV_PKC_SC_ABI_CACHE_SIZE, 128))
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops all the entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Gets the counters and size of the cache.
+
+        :rtype: dict[str,int]
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries)}
+
+
+_ABI_CACHE = _LRUCache()
+"""Maps interface fingerprints to ABIs."""
+_SELECTORS_CACHE = _LRUCache()
+"""Maps interface fingerprints to endpoint selectors maps."""
+
+
+def get_interface_fingerprint(json_dct):
+    """Computes a stable hash of the JSON form of a contract interface.
+    Persisted selectors are ignored.
+
+    :param json_dct: The contract interface, as a dictionary.
+    :type json_dct: dict
+    :rtype: str
+    """
+    json_dct = {key: value for key, value in json_dct.items()
+                if key != 'selectors_fingerprint'}
+    json_dct['endpoints'] = [
+        {key: value for key, value in endpoint.items() if key != 'selector'}
+        for endpoint in json_dct.get('endpoints', [])
+    ]
+    canonical = json.dumps(json_dct, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
 
-from Crypto.Hash import SHA3_256
 
-from pikciosc.models import ContractInterface
+def get_cache_info():
+    """Gets the hit and miss counters and the size of the ABI caches.
+
+    :rtype: dict[str,dict[str,int]]
+    """
+    return {'abi': _ABI_CACHE.info(), 'selectors': _SELECTORS_CACHE.info()}
+
+
+def clear_caches():
+    """Empties the ABI caches and resets their counters."""
+    _ABI_CACHE.clear()
+    _SELECTORS_CACHE.clear()
 
 
 class ABI(object):
-    """Digests Smart Contract to offer calls encoding features."""
+    """Digests Smart Contract to offer calls encoding features.
+
+    An encoded call is made of a version byte, the endpoint selector and the
+    arguments, encoded positionally from the endpoint parameter types. Calls
+    encoded before versioning (selector followed by pickled arguments) can
+    still be decoded.
+    """
 
     _KECCAK_LEN = 8  # Keccak length used to identify an endpoint signature.
+    _CALL_VERSION = 2  # Version of the call encoding.
+    _FRAME_LENGTH = struct.Struct('>I')  # Length of a call in a stream.
 
     def __init__(self, contract_interface=None):
         """Creates an ABI used to encode calls to provided contract interface.
@@ -23,7 +153,47 @@ class ABI(object):
             or decode calls.
         """
         self._interface = contract_interface or ContractInterface()
-        self._selectors_map = self._make_endpoint_encoding_map(self._interface)
+        self.fingerprint = get_interface_fingerprint(
+            self._interface.to_dict())
+        self._endpoints = {ep.name: ep for ep in self._interface.endpoints}
+        self._selectors_map = _SELECTORS_CACHE.get(self.fingerprint)
+        if self._selectors_map is None:
+            self._selectors_map = self._make_endpoint_encoding_map(
+                self._interface)
+            _SELECTORS_CACHE.put(self.fingerprint, self._selectors_map)
+        self._codecs = {}
+        self._return_codecs = {}
+
+    @classmethod
+    def _from_cache(cls, json_dct, interface_factory):
+        """Gets an ABI from the process cache, creating it if needed.
+
+        :param json_dct: The contract interface, as a dictionary.
+        :type json_dct: dict
+        :param interface_factory: Creates the contract interface on cache
+            miss.
+        :type interface_factory: callable
+        :rtype: ABI
+        """
+        fingerprint = get_interface_fingerprint(json_dct)
+        abi = _ABI_CACHE.get(fingerprint)
+        if abi is None or type(abi) is not cls:
+            abi = cls(interface_factory())
+            _ABI_CACHE.put(fingerprint, abi)
+        return abi
+
+    @classmethod
+    def from_interface(cls, contract_interface):
+        """Gets the ABI of a contract interface from the process cache,
+        creating it if needed.
+
+        :param contract_interface: The contract interface.
+        :type contract_interface: ContractInterface
+        :return: An ABI for the specified contract.
+        :rtype: ABI
+        """
+        return cls._from_cache(contract_interface.to_dict(),
+                               lambda: contract_interface)
 
     @classmethod
     def from_string_interface(cls, json_string):
@@ -35,8 +205,8 @@ class ABI(object):
         :rtype: ABI
         """
         json_dct = json.loads(json_string)
-        interface = ContractInterface.from_dict(json_dct)
-        return cls(interface)
+        return cls._from_cache(
+            json_dct, lambda: ContractInterface.from_dict(json_dct))
 
     @classmethod
     def from_file_interface(cls, file_path):
@@ -48,8 +218,21 @@ class ABI(object):
         """
         with open(file_path) as fd:
             json_dct = json.load(fd)
-            interface = ContractInterface.from_dict(json_dct)
-            return cls(interface)
+        return cls._from_cache(
+            json_dct, lambda: ContractInterface.from_dict(json_dct))
+
+    def persist_selectors(self, file_path):
+        """Writes the contract interface with the selector of each endpoint,
+        so that ABIs created from it do not compute them again, as long as
+        the interface does not change.
+
+        :param file_path: Path to the JSON interface to write.
+        :type file_path: str
+        """
+        for endpoint in self._interface.endpoints:
+            endpoint.selector = self._selectors_map[endpoint.name].hex()
+        self._interface.selectors_fingerprint = self.fingerprint
+        self._interface.to_file(file_path)
 
     @property
     def endpoints(self):
@@ -66,24 +249,121 @@ class ABI(object):
         :return: The encoded call.
         :rtype: str
         """
-        return base64.encodebytes(
-            self._encode_endpoint(endpoint_name) +
-            self._encode_arguments(kwargs)
-        ).decode('utf-8')
+        return base64.b64encode(
+            self._encode_payload(endpoint_name, kwargs)).decode('utf-8')
 
-    def decode_call(self, encoded_call):
+    def decode_call(self, encoded_call, allow_pickle=True):
         """Decodes a call.
 
         :param encoded_call: The bytes composing the call (endpoint and
             arguments.)
         :type encoded_call: str
+        :param allow_pickle: If False, calls encoded with pickle by older
+            versions are rejected. Unpickling untrusted data is unsafe.
+        :type allow_pickle: bool
         :return: A tuple endpoint_name, arguments for the call.
         :rtype: tuple[str,dict]
         """
-        byts = base64.decodebytes(encoded_call.encode())
+        return self._decode_payload(
+            memoryview(binascii.a2b_base64(encoded_call)), allow_pickle)
+
+    def encode_calls(self, calls):
+        """Encodes many calls into a single stream of bytes.
+
+        Each call is prefixed by its length on 4 bytes, so that the stream
+        can be split without decoding it.
+
+        :param calls: Couples of endpoint name and dictionary of arguments.
+        :type calls: collections.Iterable[tuple[str,dict[str,any]]]
+        :return: The encoded calls.
+        :rtype: bytes
+        """
+        return self._join_frames(
+            self._encode_payload(endpoint_name, kwargs)
+            for endpoint_name, kwargs in calls
+        )
+
+    def decode_calls(self, buffer):
+        """Decodes, one by one, the calls of a stream created by
+        encode_calls.
+
+        The buffer is never copied: calls are decoded from slices of a
+        memoryview over it, such as a mmap of a block payload.
+
+        :param buffer: The stream of encoded calls.
+        :type buffer: bytes|bytearray|memoryview|mmap.mmap
+        :return: A generator of tuples endpoint_name, arguments for each call.
+        :rtype: collections.Iterator[tuple[str,dict]]
+        """
+        for payload in self._split_frames(buffer):
+            yield self._decode_payload(payload, False)
+
+    def _join_frames(self, payloads):
+        """Concatenates payloads, each prefixed by its length.
+
+        :type payloads: collections.Iterable[bytes]
+        :rtype: bytes
+        """
+        parts = []
+        for payload in payloads:
+            parts.append(self._FRAME_LENGTH.pack(len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+
+    def _split_frames(self, buffer):
+        """Splits a stream of length-prefixed payloads without copying it.
+
+        :type buffer: bytes|bytearray|memoryview|mmap.mmap
+        :rtype: collections.Iterator[memoryview]
+        """
+        view = memoryview(buffer)
+        offset = 0
+        while offset < len(view):
+            try:
+                length, = self._FRAME_LENGTH.unpack_from(view, offset)
+            except struct.error:
+                raise ValueError('Encoded stream is truncated.')
+            offset += self._FRAME_LENGTH.size
+            if offset + length > len(view):
+                raise ValueError('Encoded stream is truncated.')
+            yield view[offset:offset + length]
+            offset += length
+
+    def _encode_payload(self, endpoint_name, kwargs):
+        """Encodes a call to bytes: version, selector and arguments.
+
+        :rtype: bytes
+        """
         return (
-            self._decode_endpoint(byts[:self._KECCAK_LEN]),
-            self._decode_arguments(byts[self._KECCAK_LEN:])
+            bytes((self._CALL_VERSION,)) +
+            self._encode_endpoint(endpoint_name) +
+            self._encode_arguments(endpoint_name, kwargs)
+        )
+
+    def _decode_payload(self, payload, allow_pickle):
+        """Decodes a call from its bytes.
+
+        :param payload: The encoded call.
+        :type payload: memoryview
+        :param allow_pickle: If False, calls encoded with pickle by older
+            versions are rejected.
+        :type allow_pickle: bool
+        :rtype: tuple[str,dict]
+        """
+        selector_end = self._KECCAK_LEN + 1
+        selector = bytes(payload[1:selector_end])
+        if payload and payload[0] == self._CALL_VERSION and \
+                selector in self._selectors_map:
+            endpoint_name = self._selectors_map[selector]
+            return (
+                endpoint_name,
+                self._decode_arguments(endpoint_name, payload[selector_end:])
+            )
+        if not allow_pickle:
+            raise ValueError('Unsupported call encoding.')
+        return (
+            self._decode_endpoint(bytes(payload[:self._KECCAK_LEN])),
+            pickle.loads(payload[self._KECCAK_LEN:])
         )
 
     def _decode_endpoint(self, endpoint_selector):
@@ -112,62 +392,312 @@ class ABI(object):
                            f"invalid for contract '{self._interface.name}'")
         return self._selectors_map[endpoint_name]
 
-    @staticmethod
-    def _encode_arguments(kwargs):
+    def _get_codec(self, endpoint_name):
+        """Gets the codec of the parameters of an endpoint, building it on
+        first use.
+
+        :param endpoint_name: Name of the endpoint.
+        :type endpoint_name: str
+        :return: The parameter names and their codec.
+        :rtype: tuple[tuple[str],SequenceCodec]
+        """
+        codec = self._codecs.get(endpoint_name)
+        if codec is None:
+            params = self._endpoints[endpoint_name].params
+            codec = self._codecs[endpoint_name] = (
+                tuple(param.name for param in params),
+                SequenceCodec([param.type for param in params])
+            )
+        return codec
+
+    def _encode_arguments(self, endpoint_name, kwargs):
         """Encodes provided named arguments.
 
+        :param endpoint_name: Name of the called endpoint.
+        :type endpoint_name: str
         :param kwargs: Dictionary of arguments names and values to provide.
         :type kwargs: dict[str,any]
         :return: The encoded arguments.
         :rtype: bytes
         """
-        return pickle.dumps(kwargs)
+        names, codec = self._get_codec(endpoint_name)
+        if set(kwargs) != set(names):
+            raise ValueError(f"Arguments of '{endpoint_name}' must be "
+                             f"{', '.join(names) or 'empty'}.")
+        return codec.encode([kwargs[name] for name in names])
 
-    @staticmethod
-    def _decode_arguments(encoded_kwargs):
+    def _decode_arguments(self, endpoint_name, encoded_kwargs):
         """Decodes provided named arguments.
 
+        :param endpoint_name: Name of the called endpoint.
+        :type endpoint_name: str
         :param encoded_kwargs: Encoded arguments.
-        :type encoded_kwargs: bytes
+        :type encoded_kwargs: bytes|memoryview
         :returns: Dictionary of decoded arguments names and values.
         :rtype: dict[str,any]
         """
-        return pickle.loads(encoded_kwargs)
+        names, codec = self._get_codec(endpoint_name)
+        values, end = codec.decode(encoded_kwargs)
+        if end != len(encoded_kwargs):
+            raise ValueError(f"Unexpected data after the arguments of "
+                             f"'{endpoint_name}'.")
+        return dict(zip(names, values))
 
     @staticmethod
-    def encode_call_result(call_result):
-        """Encodes provided named arguments.
+    def encode_call_result(call_result, contract_interface=None):
+        """Encodes provided call result.
 
         :param call_result: object detailing execution of a call.
         :type call_result: CallInfo
+        :param contract_interface: Interface of the called contract. If
+            provided, the result is encoded compactly by its ABI (see
+            encode_result). Otherwise it is pickled, which is deprecated.
+        :type contract_interface: ContractInterface
         :return: The encoded call result.
         :rtype: str
         """
+        if contract_interface is not None:
+            return ABI.from_interface(contract_interface).encode_result(
+                call_result)
+        warnings.warn("Pickling call results is deprecated, provide the "
+                      "contract interface.", DeprecationWarning, stacklevel=2)
         return base64.encodebytes(pickle.dumps(call_result)).decode('utf-8')
 
     @staticmethod
-    def decode_call_result(encoded_call_result):
-        """Decodes provided named arguments.
+    def decode_call_result(encoded_call_result, contract_interface=None,
+                           allow_pickle=True):
+        """Decodes provided call result.
 
         :param encoded_call_result: Encoded call result.
         :type encoded_call_result: str
+        :param contract_interface: Interface of the called contract. If
+            provided, the result is decoded by its ABI (see decode_result).
+            Otherwise it is unpickled, which is deprecated.
+        :type contract_interface: ContractInterface
+        :param allow_pickle: If False, pickled results are rejected.
+            Unpickling untrusted data is unsafe.
+        :type allow_pickle: bool
         :returns: object detailing execution of a call.
         :rtype: CallInfo
         """
+        if contract_interface is not None:
+            return ABI.from_interface(contract_interface).decode_result(
+                encoded_call_result, allow_pickle)
+        if not allow_pickle:
+            raise ValueError("Decoding a call result without its contract "
+                             "interface requires unpickling.")
+        warnings.warn("Unpickling call results is deprecated, provide the "
+                      "contract interface.", DeprecationWarning, stacklevel=2)
         return pickle.loads(base64.decodebytes(encoded_call_result.encode()))
 
-    def _do_encode_endpoint(self, endpoint_name):
+    def encode_result(self, call_result):
+        """Encodes provided call result.
+
+        Arguments and returned value are encoded from the endpoint types in
+        the interface. Values not matching them are tagged with their own
+        type instead.
+
+        :param call_result: object detailing execution of a call.
+        :type call_result: CallInfo
+        :return: The encoded call result.
+        :rtype: str
+        """
+        return base64.b64encode(
+            self._encode_result_payload(call_result)).decode('utf-8')
+
+    def decode_result(self, encoded_call_result, allow_pickle=True):
+        """Decodes a call result created by encode_result.
+
+        :param encoded_call_result: Encoded call result.
+        :type encoded_call_result: str
+        :param allow_pickle: If False, results pickled by older versions are
+            rejected. Unpickling untrusted data is unsafe.
+        :type allow_pickle: bool
+        :returns: object detailing execution of a call.
+        :rtype: CallInfo
+        """
+        return self._decode_result_payload(
+            memoryview(binascii.a2b_base64(encoded_call_result)),
+            allow_pickle)
+
+    def encode_results(self, call_results):
+        """Encodes many call results into a single length-delimited stream
+        of bytes, like encode_calls.
+
+        :param call_results: objects detailing execution of calls.
+        :type call_results: collections.Iterable[CallInfo]
+        :rtype: bytes
+        """
+        return self._join_frames(
+            self._encode_result_payload(call_result)
+            for call_result in call_results
+        )
+
+    def decode_results(self, buffer):
+        """Decodes, one by one, the call results of a stream created by
+        encode_results, without copying the buffer.
+
+        :param buffer: The stream of encoded call results.
+        :type buffer: bytes|bytearray|memoryview|mmap.mmap
+        :rtype: collections.Iterator[CallInfo]
+        """
+        for payload in self._split_frames(buffer):
+            yield self._decode_result_payload(payload, False)
+
+    def _get_return_codec(self, endpoint_name):
+        """Gets the codec of the value returned by an endpoint, building it
+        on first use.
+
+        :rtype: SequenceCodec
+        """
+        codec = self._return_codecs.get(endpoint_name)
+        if codec is None:
+            codec = self._return_codecs[endpoint_name] = SequenceCodec(
+                [self._endpoints[endpoint_name].type])
+        return codec
+
+    def _encode_result_payload(self, call_result):
+        """Encodes a call result to bytes.
+
+        :type call_result: CallInfo
+        :rtype: bytes
+        """
+        endpoint_name = call_result.endpoint_name
+        selector = self._encode_endpoint(endpoint_name)
+        endpoint = self._endpoints[endpoint_name]
+        flags = 0
+        parts = []
+
+        names, codec = self._get_codec(endpoint_name)
+        args = {var.name: var for var in call_result.kwargs}
+        params = {param.name: param.type for param in endpoint.params}
+        if set(args) == set(names) and all(
+                var.type is params[name] and type(var.value) is var.type
+                for name, var in args.items()):
+            parts.append(codec.encode([args[name].value for name in names]))
+        else:
+            flags |= _RESULT_TAGGED_ARGS
+            parts.append(_TAGGED_CODEC.encode([[
+                (var.name, var.type.__name__ if var.type else None, var.value)
+                for var in call_result.kwargs
+            ]]))
+
+        if call_result.gas_used is not None:
+            flags |= _RESULT_HAS_GAS
+            parts.append(_GAS.pack(call_result.gas_used))
+
+        success_info = call_result.success_info
+        if not success_info.is_success:
+            flags |= _RESULT_HAS_ERROR
+            parts.append(_ERROR_CODEC.encode(
+                [str(success_info.error), success_info.category]))
+
+        ret_val = call_result.ret_val
+        if ret_val is not None:
+            flags |= _RESULT_HAS_RETURN
+            if type(ret_val) is endpoint.type:
+                parts.append(
+                    self._get_return_codec(endpoint_name).encode([ret_val]))
+            else:
+                flags |= _RESULT_TAGGED_RETURN
+                parts.append(_TAGGED_CODEC.encode([ret_val]))
+
+        stop_watch = call_result.stop_watch
+        header = _RESULT_HEADER.pack(
+            _RESULT_VERSION, flags, selector,
+            _NAN if stop_watch.start is None else stop_watch.start,
+            _NAN if stop_watch.end is None else stop_watch.end)
+        return header + b''.join(parts)
+
+    def _decode_result_payload(self, payload, allow_pickle):
+        """Decodes a call result from its bytes.
+
+        :param payload: The encoded call result.
+        :type payload: memoryview
+        :param allow_pickle: If False, results pickled by older versions are
+            rejected.
+        :type allow_pickle: bool
+        :rtype: CallInfo
+        """
+        if not payload or payload[0] != _RESULT_VERSION:
+            if not allow_pickle:
+                raise ValueError('Unsupported call result encoding.')
+            return pickle.loads(payload)
+        try:
+            _, flags, selector, start, end = _RESULT_HEADER.unpack_from(
+                payload)
+        except struct.error:
+            raise ValueError('Encoded call result is truncated.')
+        endpoint_name = self._decode_endpoint(selector)
+        endpoint = self._endpoints[endpoint_name]
+        offset = _RESULT_HEADER.size
+
+        if flags & _RESULT_TAGGED_ARGS:
+            (args,), offset = _TAGGED_CODEC.decode(payload, offset)
+            try:
+                kwargs = [Variable(name, _TAGGED_TYPES.get(type_name), value)
+                          for name, type_name, value in args]
+            except (TypeError, ValueError):
+                raise ValueError('Invalid arguments in encoded call result.')
+        else:
+            names, codec = self._get_codec(endpoint_name)
+            values, offset = codec.decode(payload, offset)
+            kwargs = [Variable(param.name, param.type, value)
+                      for param, value in zip(endpoint.params, values)]
+
+        gas_used = None
+        if flags & _RESULT_HAS_GAS:
+            try:
+                gas_used, = _GAS.unpack_from(payload, offset)
+            except struct.error:
+                raise ValueError('Encoded call result is truncated.')
+            offset += _GAS.size
+
+        success_info = SuccessInfo()
+        if flags & _RESULT_HAS_ERROR:
+            (error, category), offset = _ERROR_CODEC.decode(payload, offset)
+            success_info = SuccessInfo(error, category)
+
+        ret_val = None
+        if flags & _RESULT_HAS_RETURN:
+            codec = (
+                _TAGGED_CODEC if flags & _RESULT_TAGGED_RETURN else
+                self._get_return_codec(endpoint_name)
+            )
+            (ret_val,), offset = codec.decode(payload, offset)
+
+        if offset != len(payload):
+            raise ValueError('Unexpected data after the call result.')
+        stop_watch = StopWatch(None if math.isnan(start) else start,
+                               None if math.isnan(end) else end)
+        return CallInfo(endpoint_name, kwargs, stop_watch, success_info,
+                        ret_val, gas_used)
+
+    def _do_encode_endpoint(self, endpoint, trust_selector):
         """Performs the actual encoding of an endpoint.
 
-        Encoding is obtained by hashing the canonical for of the endpoint.
+        Encoding is obtained by hashing the canonical form of the endpoint
+        with SHA3-256, unless the interface provides it and is trusted.
+        Untrusted selectors which do not match that hash are ignored.
 
-        :param endpoint_name: Name of endpoint to compute encoding for.
-        :type endpoint_name: str
+        :param endpoint: Endpoint to compute encoding for.
+        :type endpoint: EndPointDef
+        :param trust_selector: True if the selectors of the interface were
+            persisted with its current fingerprint.
+        :type trust_selector: bool
         :return: The encoded selector for the endpoint.
         :rtype: bytes
         """
-        signature = self._interface.get_canonical_signature(endpoint_name)
-        return SHA3_256.new(signature.encode()).digest()[:self._KECCAK_LEN]
+        if trust_selector and endpoint.selector:
+            return bytes.fromhex(endpoint.selector)
+        signature = endpoint.canonical_signature
+        selector = hashlib.sha3_256(
+            signature.encode()).digest()[:self._KECCAK_LEN]
+        if endpoint.selector and endpoint.selector != selector.hex():
+            logging.warning(f"Ignoring the selector of endpoint "
+                            f"'{endpoint.name}', which does not match its "
+                            f"signature.")
+        return selector
 
     def _make_endpoint_encoding_map(self, contract_interface):
         """Builds a dictionary mapping endpoint names to selectors and vice
@@ -179,8 +709,10 @@ class ABI(object):
             versa.
         :rtype: dict[byte|str,str|bytes]
         """
+        trust_selectors = (
+            contract_interface.selectors_fingerprint == self.fingerprint)
         selector_to_ep = {
-            self._do_encode_endpoint(ep.name): ep.name
+            self._do_encode_endpoint(ep, trust_selectors): ep.name
             for ep in contract_interface.endpoints
         }
         ep_to_selector = {
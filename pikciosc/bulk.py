@@ -0,0 +1,316 @@
+"""This module parses, compiles and quotes many contracts in a single run.
+
+Contracts are read from a folder, searched recursively for Python files, or
+from a manifest listing one contract path per line. They are spread over a
+pool of processes, each of which generates the interface, the bytecode and
+the submit quotation of a contract in one go.
+
+Results are written as NDJSON, one JSON object per contract, in the order of
+the contracts:
+
+- `file`: path to the contract.
+- `sha256`: digest of the source code.
+- `interface`: the parsed interface.
+- `compiled`: path to the compiled contract in the artifact store, if any.
+- `quotation`: the submit quotation, if PKC_SC_SUBMIT_CHAR_COST is set.
+- `error`: message of the error which stopped the processing of the contract,
+  in place of the above results.
+
+A partial run is resumed by writing to the same output: contracts already
+successfully processed with an unchanged source code are not processed again.
+Contracts changed since, or which failed, are processed again, and their new
+result is appended: the last result of a contract prevails.
+
+A contract crashing the process handling it gets an error result, the
+contracts handled by other processes are not affected.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pikciosc.parse import parse_string
+from pikciosc.quotations import ENV_PKC_SC_SUBMIT_CHAR_COST, \
+    get_submit_quotation
+
+MANIFEST_COMMENT = '#'
+_MAX_CHUNK_SIZE = 64
+"""Maximum number of contracts sent at once to a process of the pool."""
+_CRASH_ERROR = 'The process handling the contract crashed.'
+
+
+def list_contracts(source):
+    """Lists the contracts to process.
+
+    :param source: Folder searched recursively for Python files, or manifest
+        listing one contract per line. Relative paths of a manifest are
+        relative to its folder. Blank lines and comments are ignored.
+    :type source: str
+    :return: Paths to the contracts, sorted for folders, in the order of the
+        manifest otherwise.
+    :rtype: list[str]
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(folder, filename)
+            for folder, _, filenames in os.walk(source)
+            for filename in filenames if filename.endswith('.py')
+        )
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"No contract folder or manifest at "
+                                f"'{source}'.")
+    manifest_folder = os.path.dirname(source)
+    with open(source) as fd:
+        lines = [line.strip() for line in fd]
+    return [
+        os.path.join(manifest_folder, line) for line in lines
+        if line and not line.startswith(MANIFEST_COMMENT)
+    ]
+
+
+def _source_digest(source):
+    """Computes the digest of a source code, recorded in its result.
+
+    :rtype: str
+    """
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_store(store_folder):
+    """Opens an artifact store once per process.
+
+    :rtype: ArtifactStore
+    """
+    from pikciosc.store import ArtifactStore
+    return ArtifactStore(store_folder)
+
+
+def process_contract(file_path, store_folder=None, quote=True):
+    """Parses, compiles and quotes a single contract.
+
+    :param file_path: Path to the source code of the contract.
+    :type file_path: str
+    :param store_folder: Folder of the artifact store to compile into. If
+        omitted, the contract is only compiled to be quoted.
+    :type store_folder: str
+    :param quote: If False, the submit quotation is not generated.
+    :type quote: bool
+    :return: The result of the contract, see this module.
+    :rtype: dict
+    """
+    result = {'file': file_path}
+    try:
+        with open(file_path) as fd:
+            source = fd.read()
+        result['sha256'] = _source_digest(source)
+        interface = parse_string(source, 'submitted_code')
+        compiled = None
+        if store_folder:
+            store = _get_store(store_folder)
+            compiled = store.get_object_path(store.put(source, file_path))
+        quotation = get_submit_quotation(source) if quote else None
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+        return result
+    result['interface'] = interface.to_dict()
+    result['compiled'] = compiled
+    result['quotation'] = quotation and quotation.__dict__
+    return result
+
+
+def _read_done(output_path):
+    """Reads the results of a previous run, and drops the last one if it has
+    been interrupted while being written.
+
+    :param output_path: Path to the NDJSON output.
+    :type output_path: str
+    :return: The digest of the source of each successfully processed
+        contract, by path.
+    :rtype: dict[str,str]
+    """
+    done = {}
+    try:
+        fd = open(output_path, 'r+')
+    except FileNotFoundError:
+        return done
+    with fd:
+        complete_size = 0
+        for line in iter(fd.readline, ''):
+            if not line.endswith('\n'):
+                break
+            complete_size = fd.tell()
+            try:
+                result = json.loads(line)
+                if 'error' in result:
+                    done.pop(result['file'], None)
+                else:
+                    done[result['file']] = result.get('sha256')
+            except (ValueError, KeyError, TypeError):
+                logging.warning(f"Ignoring invalid result '{line.strip()}'.")
+        fd.truncate(complete_size)
+    return done
+
+
+def _is_done(file_path, done):
+    """Tells whether a contract has been processed since its last change.
+
+    :rtype: bool
+    """
+    if file_path not in done:
+        return False
+    try:
+        with open(file_path) as fd:
+            return _source_digest(fd.read()) == done[file_path]
+    except (OSError, ValueError):
+        return False
+
+
+def _process_chunk(task, file_paths):
+    """Processes a chunk of contracts in a process of the pool.
+
+    :rtype: list[dict]
+    """
+    return [task(file_path) for file_path in file_paths]
+
+
+def _process_isolated(task, file_paths):
+    """Processes contracts one at a time in a dedicated process, replaced
+    each time a contract crashes it.
+
+    :return: The result of each contract, in order.
+    :rtype: collections.Iterable[dict]
+    """
+    executor = ProcessPoolExecutor(1)
+    try:
+        for file_path in file_paths:
+            try:
+                yield executor.submit(task, file_path).result()
+            except BrokenProcessPool:
+                yield {'file': file_path, 'error': _CRASH_ERROR}
+                executor.shutdown()
+                executor = ProcessPoolExecutor(1)
+    finally:
+        executor.shutdown()
+
+
+def _process_all(task, file_paths, workers, chunk_size):
+    """Processes contracts in chunks over a pool of processes.
+
+    A crash of a process breaks the pool: the chunk being waited for is then
+    processed again in isolation, to find the contracts crashing, and a new
+    pool processes the next chunks.
+
+    :return: The result of each contract, in order.
+    :rtype: collections.Iterable[dict]
+    """
+    chunks = [file_paths[start:start + chunk_size]
+              for start in range(0, len(file_paths), chunk_size)]
+    index = 0
+    while index < len(chunks):
+        try:
+            with ProcessPoolExecutor(workers) as executor:
+                futures = [executor.submit(_process_chunk, task, chunk)
+                           for chunk in chunks[index:]]
+                for future in futures:
+                    results = future.result()
+                    index += 1
+                    yield from results
+        except BrokenProcessPool:
+            logging.warning('A process crashed, processing its contracts '
+                            'again in isolation.')
+            yield from _process_isolated(task, chunks[index])
+            index += 1
+
+
+def run(source, output_path=None, store_folder=None, workers=None,
+        resume=True):
+    """Processes every contract of a folder or manifest and writes their
+    results as NDJSON.
+
+    :param source: Folder or manifest of the contracts, see `list_contracts`.
+    :type source: str
+    :param output_path: Path to the NDJSON output, standard output by default.
+    :type output_path: str
+    :param store_folder: Folder of an artifact store to compile into.
+    :type store_folder: str
+    :param workers: Number of processes, the number of CPUs by default.
+    :type workers: int
+    :param resume: If False, an existing output is overwritten instead of
+        being resumed.
+    :type resume: bool
+    :return: The number of processed, skipped and failed contracts.
+    :rtype: tuple[int,int,int]
+    """
+    file_paths = list_contracts(source)
+    done = _read_done(output_path) if output_path and resume else {}
+    pending = [path for path in file_paths if not _is_done(path, done)]
+    skipped = len(file_paths) - len(pending)
+    if skipped:
+        logging.info(f'{skipped} contracts already processed.')
+
+    quote = ENV_PKC_SC_SUBMIT_CHAR_COST in os.environ
+    if not quote:
+        logging.warning(f"'{ENV_PKC_SC_SUBMIT_CHAR_COST}' is not set, "
+                        f"contracts are not quoted.")
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, min(_MAX_CHUNK_SIZE, len(pending) // (workers * 4)))
+    task = functools.partial(process_contract, store_folder=store_folder,
+                             quote=quote)
+
+    failed = 0
+    out = open(output_path, 'a' if resume else 'w') if output_path else \
+        sys.stdout
+    try:
+        for result in _process_all(task, pending, workers, chunk_size):
+            if 'error' in result:
+                failed += 1
+                logging.error(f"{result['file']}: {result['error']}")
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logging.info(f'{len(pending)} contracts processed, {failed} failed, '
+                 f'{skipped} skipped.')
+    return len(pending), skipped, failed
+
+
+def _parse_args():
+    """Loads the arguments from the command line."""
+    parser = ArgumentParser(description='Pikcio Smart Contract bulk '
+                                        'processing module.')
+    parser.add_argument("source", type=str,
+                        help='Folder of contracts, or manifest listing one '
+                             'contract per line')
+    parser.add_argument("-o", "--output", type=str, dest='output',
+                        help='Path to the NDJSON results. Resumed if it '
+                             'exists.')
+    parser.add_argument("-s", "--store", type=str, dest='store_folder',
+                        help='Folder of an artifact store to compile into.')
+    parser.add_argument("-w", "--workers", type=int,
+                        help='Number of processes, one per CPU by default.')
+    parser.add_argument("--no-resume", action='store_false', dest='resume',
+                        help='Overwrite the results instead of resuming '
+                             'them.')
+    known_args, _ = parser.parse_known_args()
+    return (
+        known_args.source, known_args.output, known_args.store_folder,
+        known_args.workers, known_args.resume
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    args_source, output_path, store_folder, workers, resume = _parse_args()
+    _, _, failed_count = run(args_source, output_path, store_folder, workers,
+                             resume)
+    if failed_count:
+        sys.exit(1)
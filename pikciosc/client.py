@@ -0,0 +1,87 @@
+"""This module is the client of the pikciosc daemon.
+
+It takes the same arguments as the command line of the module it stands for,
+sends them to the daemon and prints the result, sparing the startup of an
+interpreter loading pikciosc for each command:
+
+    python -m pikciosc.client parse smart_contract.py --indent 4
+
+Relative paths are relative to the current folder of the client. Output files
+are written by the daemon.
+"""
+import json
+import os
+import socket
+import sys
+
+from pikciosc.invoke.protocol import decode_response, pack_frame, read_frame
+
+ENV_PKC_SC_DAEMON_SOCKET = 'PKC_SC_DAEMON_SOCKET'
+
+COMMAND_PARSE = 'parse'
+COMMAND_COMPILE = 'compile'
+COMMAND_QUOTE = 'quote'
+COMMAND_INVOKE = 'invoke'
+COMMANDS = (COMMAND_PARSE, COMMAND_COMPILE, COMMAND_QUOTE, COMMAND_INVOKE)
+
+_USAGE = (f"Usage: python -m pikciosc.client {{{','.join(COMMANDS)}}} "
+          f"[arguments of the command ...]")
+
+
+def get_socket_path(socket_path=None):
+    """Gets the path of the socket of the daemon.
+
+    :param socket_path: Path chosen by the caller, if any.
+    :type socket_path: str
+    :return: The path, from PKC_SC_DAEMON_SOCKET by default, in the temporary
+        folder otherwise.
+    :rtype: str
+    """
+    if socket_path or ENV_PKC_SC_DAEMON_SOCKET in os.environ:
+        return socket_path or os.environ[ENV_PKC_SC_DAEMON_SOCKET]
+    import tempfile  # Slow to load, and seldom needed.
+    return os.path.join(tempfile.gettempdir(), 'pikciosc.sock')
+
+
+def request(command, argv, stdin=None, socket_path=None):
+    """Runs a command in the daemon.
+
+    :param command: One of COMMANDS.
+    :type command: str
+    :param argv: Arguments of the command, as given to its module.
+    :type argv: list[str]
+    :param stdin: Standard input of the command, if it reads one.
+    :type stdin: str
+    :param socket_path: Path of the socket of the daemon.
+    :type socket_path: str
+    :return: What the command prints.
+    :rtype: str
+    :raise WorkerError: If the command failed.
+    """
+    payload = json.dumps({
+        'command': command,
+        'argv': list(argv),
+        'cwd': os.getcwd(),
+        'stdin': stdin,
+    }).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(get_socket_path(socket_path))
+        conn.sendall(pack_frame(payload))
+        with conn.makefile('rb') as channel_in:
+            return decode_response(read_frame(channel_in))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        sys.exit(_USAGE)
+    _command, _argv = sys.argv[1], sys.argv[2:]
+    _stdin = (
+        sys.stdin.read() if _command == COMMAND_INVOKE and '--batch' in _argv
+        else None
+    )
+    try:
+        output = request(_command, _argv, _stdin)
+    except (OSError, RuntimeError) as e:
+        sys.exit(f'{_command} failed: {e}')
+    if output:
+        print(output)
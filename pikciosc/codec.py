@@ -0,0 +1,317 @@
+"""This module encodes values to compact binary forms driven by their types.
+
+A sequence of typed values, such as the parameters of an endpoint, is encoded
+positionally without names:
+
+- `float` and `bool` are fixed-width, big-endian. Consecutive ones are packed
+  with a single struct.
+- `int` is a one byte tag followed by 8 bytes, big-endian, or by its length
+  on 4 bytes and its bytes if it does not fit in 64 bits.
+- `str` and `bytes` are prefixed with their length on 4 bytes.
+- Other values (`list`, `dict`, `tuple`, unknown types...) carry a one byte
+  tag before their content, recursively, as the interface does not tell the
+  types of their items.
+
+Values must be of their declared type, no conversion is made. Integers are
+accepted for `float` though, but booleans are only accepted for `bool`.
+
+Codecs are built once per sequence of types and work on any buffer, including
+memoryview slices, without copying it.
+"""
+import struct
+
+_LENGTH = struct.Struct('>I')
+_INT64 = struct.Struct('>q')
+_FLOAT = struct.Struct('>d')
+
+_FIXED_FORMATS = {bool: '?', float: 'd'}
+"""Struct formats of fixed-width types."""
+
+_MAX_DEPTH = 64
+"""Maximum nesting of tagged values, bounding recursion on decoding."""
+
+_TAG_NONE = b'N'
+_TAG_TRUE = b'T'
+_TAG_FALSE = b'F'
+_TAG_INT = b'i'
+_TAG_BIG_INT = b'I'
+_TAG_FLOAT = b'f'
+_TAG_STR = b's'
+_TAG_BYTES = b'b'
+_TAG_LIST = b'l'
+_TAG_TUPLE = b't'
+_TAG_DICT = b'd'
+
+
+def _read_length(buffer, offset):
+    """Reads a length prefix, and checks the buffer holds that many bytes.
+
+    :return: The length and the offset after the prefix.
+    :rtype: tuple[int,int]
+    """
+    length, = _LENGTH.unpack_from(buffer, offset)
+    offset += _LENGTH.size
+    if offset + length > len(buffer):
+        raise ValueError('Encoded value is truncated.')
+    return length, offset
+
+
+def _encode_str(value, parts):
+    raw = value.encode('utf-8')
+    parts.append(_LENGTH.pack(len(raw)))
+    parts.append(raw)
+
+
+def _decode_str(buffer, offset):
+    length, offset = _read_length(buffer, offset)
+    return str(buffer[offset:offset + length], 'utf-8'), offset + length
+
+
+def _encode_bytes(value, parts):
+    parts.append(_LENGTH.pack(len(value)))
+    parts.append(bytes(value))
+
+
+def _decode_bytes(buffer, offset):
+    length, offset = _read_length(buffer, offset)
+    return bytes(buffer[offset:offset + length]), offset + length
+
+
+def _check_type(value, typ):
+    """Checks a value can be encoded as provided type.
+
+    :raises TypeError: If it cannot.
+    """
+    if typ is bool:
+        valid = value is True or value is False
+    elif typ is float:
+        valid = isinstance(value, (float, int)) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, typ) and not isinstance(value, bool)
+    if not valid:
+        raise TypeError(f"got '{type(value).__name__}'")
+
+
+def _encode_int(value, parts):
+    _check_type(value, int)
+    _encode_any(value, parts)
+
+
+def _decode_int(buffer, offset):
+    tag = bytes(buffer[offset:offset + 1])
+    if tag not in (_TAG_INT, _TAG_BIG_INT):
+        raise ValueError('Encoded value is not an integer.')
+    return _decode_any(buffer, offset)
+
+
+def _encode_any(value, parts, depth=0):
+    """Appends the tagged encoding of a value to a list of byte strings.
+
+    :param value: The value to encode.
+    :param parts: The list receiving the encoded parts.
+    :type parts: list[bytes]
+    :param depth: Nesting level of the value.
+    :type depth: int
+    :raises ValueError: If the value cannot be encoded.
+    """
+    if depth > _MAX_DEPTH:
+        raise ValueError('Value is too deeply nested to be encoded.')
+    if value is None:
+        parts.append(_TAG_NONE)
+    elif value is True or value is False:
+        parts.append(_TAG_TRUE if value else _TAG_FALSE)
+    elif isinstance(value, int):
+        try:
+            parts.append(_TAG_INT + _INT64.pack(value))
+        except struct.error:
+            raw = value.to_bytes((value.bit_length() + 8) // 8, 'big',
+                                 signed=True)
+            parts.append(_TAG_BIG_INT + _LENGTH.pack(len(raw)) + raw)
+    elif isinstance(value, float):
+        parts.append(_TAG_FLOAT + _FLOAT.pack(value))
+    elif isinstance(value, str):
+        parts.append(_TAG_STR)
+        _encode_str(value, parts)
+    elif isinstance(value, (bytes, bytearray)):
+        parts.append(_TAG_BYTES)
+        _encode_bytes(value, parts)
+    elif isinstance(value, (list, tuple)):
+        parts.append(_TAG_LIST if isinstance(value, list) else _TAG_TUPLE)
+        parts.append(_LENGTH.pack(len(value)))
+        for item in value:
+            _encode_any(item, parts, depth + 1)
+    elif isinstance(value, dict):
+        parts.append(_TAG_DICT)
+        parts.append(_LENGTH.pack(len(value)))
+        for key, item in value.items():
+            _encode_any(key, parts, depth + 1)
+            _encode_any(item, parts, depth + 1)
+    else:
+        raise ValueError(f"Values of type '{type(value).__name__}' cannot be "
+                         f"encoded.")
+
+
+def _decode_any(buffer, offset, depth=0):
+    """Decodes a tagged value from a buffer.
+
+    :param buffer: The buffer holding the encoded value.
+    :type buffer: bytes|memoryview
+    :param offset: Position of the value in the buffer.
+    :type offset: int
+    :param depth: Nesting level of the value.
+    :type depth: int
+    :return: The value and the offset following it.
+    :rtype: tuple[any,int]
+    :raises ValueError: If the buffer does not hold a valid value.
+    """
+    if depth > _MAX_DEPTH:
+        raise ValueError('Encoded value is too deeply nested.')
+    tag = bytes(buffer[offset:offset + 1])
+    offset += 1
+    if tag == _TAG_NONE:
+        return None, offset
+    if tag == _TAG_TRUE or tag == _TAG_FALSE:
+        return tag == _TAG_TRUE, offset
+    if tag == _TAG_INT:
+        return _INT64.unpack_from(buffer, offset)[0], offset + _INT64.size
+    if tag == _TAG_BIG_INT:
+        length, offset = _read_length(buffer, offset)
+        return (int.from_bytes(buffer[offset:offset + length], 'big',
+                               signed=True), offset + length)
+    if tag == _TAG_FLOAT:
+        return _FLOAT.unpack_from(buffer, offset)[0], offset + _FLOAT.size
+    if tag == _TAG_STR:
+        return _decode_str(buffer, offset)
+    if tag == _TAG_BYTES:
+        return _decode_bytes(buffer, offset)
+    if tag in (_TAG_LIST, _TAG_TUPLE, _TAG_DICT):
+        count, = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        items = []
+        for _ in range(count * 2 if tag == _TAG_DICT else count):
+            item, offset = _decode_any(buffer, offset, depth + 1)
+            items.append(item)
+        if tag == _TAG_DICT:
+            try:
+                return dict(zip(items[::2], items[1::2])), offset
+            except TypeError:
+                raise ValueError('Encoded dictionary has unhashable keys.')
+        return (items if tag == _TAG_LIST else tuple(items)), offset
+    if not tag:
+        raise ValueError('Encoded value is truncated.')
+    raise ValueError(f'Unknown tag {tag!r} in encoded value.')
+
+
+def _fixed_step(types):
+    """Creates the codec of consecutive fixed-width values, packed as a single
+    struct.
+
+    :rtype: tuple[callable,callable,int]
+    """
+    fixed = struct.Struct('>' + ''.join(_FIXED_FORMATS[typ] for typ in types))
+    types = tuple(types)
+    count = len(types)
+
+    def encode(values, parts):
+        for value, typ in zip(values, types):
+            _check_type(value, typ)
+        parts.append(fixed.pack(*values))
+
+    def decode(buffer, offset, values):
+        values.extend(fixed.unpack_from(buffer, offset))
+        return offset + fixed.size
+
+    return encode, decode, count
+
+
+def _single_step(encode_value, decode_value):
+    """Creates the codec of a single value from its value codec.
+
+    :rtype: tuple[callable,callable,int]
+    """
+    def encode(values, parts):
+        encode_value(values[0], parts)
+
+    def decode(buffer, offset, values):
+        value, offset = decode_value(buffer, offset)
+        values.append(value)
+        return offset
+
+    return encode, decode, 1
+
+
+_VARIABLE_CODECS = {
+    int: (_encode_int, _decode_int),
+    str: (_encode_str, _decode_str),
+    bytes: (_encode_bytes, _decode_bytes),
+}
+
+
+class SequenceCodec(object):
+    """Encodes and decodes sequences of values of fixed types."""
+
+    def __init__(self, types):
+        """Builds the codec of a sequence of types.
+
+        :param types: Type of each value of the sequence. None stands for an
+            unknown type.
+        :type types: list[type|None]
+        """
+        self.types = tuple(types)
+        self._steps = []
+        fixed_run = []
+        for typ in self.types:
+            if typ in _FIXED_FORMATS:
+                fixed_run.append(typ)
+                continue
+            if fixed_run:
+                self._steps.append(_fixed_step(fixed_run))
+                fixed_run = []
+            encode_value, decode_value = _VARIABLE_CODECS.get(
+                typ, (_encode_any, _decode_any))
+            self._steps.append(_single_step(encode_value, decode_value))
+        if fixed_run:
+            self._steps.append(_fixed_step(fixed_run))
+
+    def encode(self, values):
+        """Encodes a sequence of values.
+
+        :param values: One value per type of the codec, in the same order.
+        :type values: list|tuple
+        :rtype: bytes
+        :raises ValueError: If a value does not match its type.
+        """
+        if len(values) != len(self.types):
+            raise ValueError(f'Expected {len(self.types)} values, got '
+                             f'{len(values)}.')
+        parts = []
+        index = 0
+        try:
+            for encode, _, count in self._steps:
+                encode(values[index:index + count], parts)
+                index += count
+        except (struct.error, AttributeError, TypeError) as e:
+            raise ValueError(f'Invalid value for type '
+                             f'{self.types[index]}: {e}')
+        return b''.join(parts)
+
+    def decode(self, buffer, offset=0):
+        """Decodes a sequence of values from a buffer.
+
+        :param buffer: The buffer holding the encoded values.
+        :type buffer: bytes|memoryview
+        :param offset: Position of the sequence in the buffer.
+        :type offset: int
+        :return: The values and the offset following them.
+        :rtype: tuple[list,int]
+        :raises ValueError: If the buffer does not hold a valid sequence.
+        """
+        values = []
+        try:
+            for _, decode, _ in self._steps:
+                offset = decode(buffer, offset, values)
+        except struct.error:
+            raise ValueError('Encoded value is truncated.')
+        except UnicodeDecodeError as e:
+            raise ValueError(f'Invalid encoded value: {e}')
+        return values, offset
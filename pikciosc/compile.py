@@ -1,70 +1,231 @@
 """This module encapsulates the tools chose to compile the code into
 bytecode.
 """
+import ast
+import importlib.util
+import json
 import logging
-import uuid
-import tempfile
+import marshal
+import sys
 from argparse import ArgumentParser
-from py_compile import compile
 
 import os
 
+QUOTATION_TABLE_EXT = '.quotes.json'
+OPTIMIZE_LEVEL = 2
+"""Optimization level of compiled contracts: asserts and docstrings are
+stripped."""
+
 
 def _get_temp_filename():
     """Generates a temporary unique filename.
 
     :rtype: str
     """
+    import tempfile
+    import uuid
     return os.path.join(tempfile.gettempdir(), f'{str(uuid.uuid4())}.py')
 
 
-def compile_file(source_file, dest_file=None):
-    """Compile provided file of source code into specified location.
+def get_quotation_table_path(compiled_file):
+    """Gets the path of the quotation table stored alongside a compiled
+    contract.
 
-    :param source_file: Path to the file to compile.
-    :type source_file: str
-    :param dest_file: Output path of compiled code. If omitted, destination
-        will match PEP requirements.
-    :return: The path to the compiled file.
+    :param compiled_file: Path to the compiled contract.
+    :type compiled_file: str
+    :rtype: str
+    """
+    return os.path.splitext(compiled_file)[0] + QUOTATION_TABLE_EXT
+
+
+def build_quotation_table(source):
+    """Counts the lines of each function defined at the top level of provided
+    source code, without executing it.
+
+    Lines are counted like `inspect.getsourcelines` does: decorators,
+    signature, comments and blank lines inside the body are included.
+
+    :param source: Source code of the contract.
+    :type source: str
+    :return: The number of lines of each function, by name.
+    :rtype: dict[str,int]
+    """
+    import inspect  # Slow to load, and only needed for the table.
+
+    lines = source.splitlines(True)
+    table = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            first_line = min([node.lineno] + [
+                decorator.lineno for decorator in node.decorator_list])
+            table[node.name] = len(inspect.getblock(lines[first_line - 1:]))
+    return table
+
+
+def write_quotation_table(source, compiled_file):
+    """Stores the quotation table of a source code alongside its compiled
+    version.
+
+    :param source: Source code of the contract.
+    :type source: str
+    :param compiled_file: Path to the compiled contract.
+    :type compiled_file: str
+    :return: The path to the quotation table.
     :rtype: str
     """
-    return compile(source_file, dest_file, optimize=2)
+    table_path = get_quotation_table_path(compiled_file)
+    with open(table_path, 'w') as fd:
+        json.dump(build_quotation_table(source), fd)
+    return table_path
+
+
+def _pyc_header(source_bytes):
+    """Creates the header of a .pyc file.
+
+    From Python 3.7, the header marks the bytecode as unchecked hash-based
+    (PEP 552), so that the same source always gives the same bytes. Before,
+    a null timestamp is used.
+
+    :param source_bytes: The encoded source code.
+    :type source_bytes: bytes
+    :rtype: bytes
+    """
+    size = (len(source_bytes) & 0xFFFFFFFF).to_bytes(4, 'little')
+    if sys.version_info < (3, 7):
+        return importlib.util.MAGIC_NUMBER + bytes(4) + size
+    flags = (0b01).to_bytes(4, 'little')
+    return (importlib.util.MAGIC_NUMBER + flags +
+            importlib.util.source_hash(source_bytes))
+
+
+def compile_to_bytes(source, filename='<contract>'):
+    """Compiles provided source code into the content of a .pyc file, without
+    touching the filesystem.
+
+    :param source: Source code to compile.
+    :type source: str
+    :param filename: Name of the source file, as reported in tracebacks.
+    :type filename: str
+    :return: The header followed by the marshalled code object.
+    :rtype: bytes
+    """
+    code = compile(source, filename, 'exec', dont_inherit=True,
+                   optimize=OPTIMIZE_LEVEL)
+    return _pyc_header(source.encode()) + marshal.dumps(code)
+
 
+def _write_bytecode(bytecode, dest_file):
+    """Writes bytecode to a file atomically, creating its folder if needed.
 
-def compile_source(source, dest_file=None):
+    :param bytecode: Content of the .pyc file.
+    :type bytecode: bytes
+    :param dest_file: Output path of compiled code.
+    :type dest_file: str
+    """
+    import uuid  # Slow to load, and only needed once compiled.
+
+    dest_folder = os.path.dirname(dest_file)
+    if dest_folder:
+        os.makedirs(dest_folder, exist_ok=True)
+    temp_file = f'{dest_file}.{uuid.uuid4()}.tmp'
+    try:
+        with open(temp_file, 'wb') as fd:
+            fd.write(bytecode)
+        os.replace(temp_file, dest_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def compile_source(source, dest_file=None, quotation_table=True,
+                   filename=None):
     """Compile provided source code into specified location.
 
     :param source: Source code to compile.
     :type source: str
+    :param dest_file: Output path of compiled code. If omitted, destination
+        will match PEP requirements for a temporary source file.
+    :param quotation_table: If True, the quotation table of the endpoints is
+        stored alongside the compiled code.
+    :type quotation_table: bool
+    :param filename: Name of the source file, as reported in tracebacks.
+        Defaults to the destination with a .py extension.
+    :type filename: str
+    :return: The path to the compiled file.
+    :rtype: str
+    """
+    if not dest_file:
+        dest_file = importlib.util.cache_from_source(
+            _get_temp_filename(), optimization=OPTIMIZE_LEVEL)
+    filename = filename or os.path.splitext(dest_file)[0] + '.py'
+    _write_bytecode(compile_to_bytes(source, filename), dest_file)
+    if quotation_table:
+        write_quotation_table(source, dest_file)
+    return dest_file
+
+
+def compile_file(source_file, dest_file=None, quotation_table=True,
+                 store=None, contract_name=None):
+    """Compile provided file of source code into specified location.
+
+    :param source_file: Path to the file to compile.
+    :type source_file: str
     :param dest_file: Output path of compiled code. If omitted, destination
         will match PEP requirements.
+    :param quotation_table: If True, the quotation table of the endpoints is
+        stored alongside the compiled code.
+    :type quotation_table: bool
+    :param store: Optional artifact store to compile into. dest_file is then
+        ignored and the code is only compiled if not already stored.
+    :type store: ArtifactStore
+    :param contract_name: Name to register the compiled code under in the
+        store, if any.
+    :type contract_name: str
     :return: The path to the compiled file.
     :rtype: str
     """
-    temp_name = _get_temp_filename()
-    try:
-        with open(temp_name, 'w') as fd:
-            fd.write(source)
-        return compile_file(temp_name, dest_file)
-    finally:
-        if os.path.exists(temp_name):
-            os.remove(temp_name)
+    with open(source_file) as fd:
+        source = fd.read()
+    if store is not None:
+        if contract_name:
+            return store.add(contract_name, source, source_file)
+        return store.get_object_path(store.put(source, source_file))
+    if not dest_file:
+        dest_file = importlib.util.cache_from_source(
+            source_file, optimization=OPTIMIZE_LEVEL)
+    return compile_source(source, dest_file, quotation_table, source_file)
+
 
+def _parse_args(argv=None):
+    """Loads the arguments from the command line.
 
-def _parse_args():
-    """Loads the arguments from the command line."""
+    :param argv: Arguments to load instead of the ones of the process.
+    :type argv: list[str]
+    """
     parser = ArgumentParser(description='Pikcio Smart Contract Compiling '
                                         'module.')
     parser.add_argument("file", type=str, help='source code file to compile')
     parser.add_argument("-o", "--output", type=str, dest='output',
                         help='Path to the compiled script.')
-    known_args, _ = parser.parse_known_args()
-    return known_args.file, known_args.indent, known_args.output
+    parser.add_argument("-s", "--store", type=str, dest='store_folder',
+                        help='Folder of an artifact store to compile into.')
+    parser.add_argument("-n", "--name", type=str, dest='contract_name',
+                        help='Name of the contract in the artifact store.')
+    known_args, _ = parser.parse_known_args(argv)
+    return (
+        known_args.file, known_args.output, known_args.store_folder,
+        known_args.contract_name
+    )
 
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
-    args_file, indent, output_path = _parse_args()
-    compile_file(args_file, output_path)
+    args_file, output_path, store_folder, name = _parse_args()
+    if store_folder:
+        from pikciosc.store import ArtifactStore
+        print(compile_file(args_file, store=ArtifactStore(store_folder),
+                           contract_name=name))
+    else:
+        compile_file(args_file, output_path)
@@ -0,0 +1,272 @@
+"""This module runs pikciosc as a long-lived daemon.
+
+The parse, compile, quote and invoke commands are served over a Unix socket,
+so that callers do not start an interpreter and load pikciosc on each of
+them. Caches stay warm from one request to the next: parsed contracts,
+artifact stores, contract registries, journals and sandbox workers.
+
+Requests and responses are frames, as defined in `invoke/protocol.py`.
+A request is a JSON object holding the command, its arguments as given to
+the command line of its module, the current folder of the client and, for
+batch invocations, the standard input. The response holds what the command
+line would print. Clients are served concurrently, each connection by its
+own thread, and may send several requests over the same connection. See
+`client.py` for the client side.
+"""
+import functools
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from argparse import ArgumentParser
+
+from pikciosc.client import COMMAND_COMPILE, COMMAND_INVOKE, \
+    COMMAND_PARSE, COMMAND_QUOTE, get_socket_path
+from pikciosc.compile import _parse_args as _parse_compile_args, \
+    compile_file
+from pikciosc.invoke.invoke import _parse_args as _parse_invoke_args, \
+    invoke_batch_cli, invoke_cli
+from pikciosc.invoke.journal import ContractJournal
+from pikciosc.invoke.protocol import encode_response, pack_frame, \
+    read_frame, STATUS_ERROR, STATUS_OK, WorkerError
+from pikciosc.invoke.registry import ContractRegistry
+from pikciosc.parse.parser import _parse_args as _parse_parse_args, \
+    parse_file_cli
+from pikciosc.quotations import _parse_args as _parse_quote_args, \
+    get_exec_quotation, get_submit_quotation_cli
+from pikciosc.store import ArtifactStore
+
+
+def _absolute(cwd, path):
+    """Resolves a path given by a client against its current folder.
+
+    :rtype: str|None
+    """
+    return os.path.join(cwd, path) if path else path
+
+
+def _write_output(result, output_path):
+    """Writes the result of a command to its output file, if any.
+
+    :return: The result.
+    :rtype: str
+    """
+    if output_path:
+        with open(output_path, 'w') as outfile:
+            outfile.write(result)
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _get_store(store_folder):
+    """Opens an artifact store once for all requests.
+
+    :rtype: ArtifactStore
+    """
+    return ArtifactStore(store_folder)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_registry(bin_folder, interface_folder):
+    """Indexes contract folders once for all requests. Folders are checked
+    for changes on each lookup, as a contract may be invoked right after it
+    has been compiled.
+
+    :rtype: ContractRegistry
+    """
+    return ContractRegistry(bin_folder, interface_folder, poll_interval=0)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_journal(journal_folder, contract_name):
+    """Opens the journal of a contract once for all requests, along with the
+    lock serializing the invocations of the contract.
+
+    :rtype: tuple[ContractJournal,threading.Lock]
+    """
+    return ContractJournal(journal_folder, contract_name), threading.Lock()
+
+
+def _run_parse(argv, cwd, _stdin):
+    """Runs the command line of `parse.parser`."""
+    args_file, indent, output_path, use_cache, backend = \
+        _parse_parse_args(argv)
+    result = json.dumps(
+        parse_file_cli(_absolute(cwd, args_file), use_cache, backend),
+        indent=indent)
+    return _write_output(result, _absolute(cwd, output_path))
+
+
+def _run_compile(argv, cwd, _stdin):
+    """Runs the command line of `compile`."""
+    args_file, output_path, store_folder, name = _parse_compile_args(argv)
+    args_file = _absolute(cwd, args_file)
+    if store_folder:
+        return compile_file(
+            args_file, store=_get_store(_absolute(cwd, store_folder)),
+            contract_name=name)
+    compile_file(args_file, _absolute(cwd, output_path))
+    return ''
+
+
+def _run_quote(argv, cwd, _stdin):
+    """Runs the command line of `quotations`."""
+    service, args_file, endpoint, output_path = _parse_quote_args(argv)
+    args_file = _absolute(cwd, args_file)
+    if service == 'submit':
+        quotation = get_submit_quotation_cli(args_file)
+    else:
+        if not endpoint:
+            raise ValueError('Endpoint required to get a invoke quotation.')
+        quotation = get_exec_quotation(args_file, endpoint)
+    return _write_output(quotation.to_json(), _absolute(cwd, output_path))
+
+
+def _run_invoke(argv, cwd, stdin):
+    """Runs the command line of `invoke.invoke`."""
+    (bin_folder, interface_folder, last_exec_path, contract_name, endpoint,
+     kwargs, journal_folder, batch, indent, output_path) = \
+        _parse_invoke_args(argv)
+    bin_folder = _absolute(cwd, bin_folder)
+    interface_folder = _absolute(cwd, interface_folder)
+    last_exec_path = _absolute(cwd, last_exec_path)
+    registry = _get_registry(bin_folder, interface_folder)
+    journal, lock = (
+        _get_journal(_absolute(cwd, journal_folder), contract_name)
+        if journal_folder else (None, threading.Lock())
+    )
+    with lock:
+        if batch:
+            result = invoke_batch_cli(
+                bin_folder, interface_folder, last_exec_path, contract_name,
+                io.StringIO(stdin or ''), registry=registry, journal=journal)
+        else:
+            result = invoke_cli(
+                bin_folder, interface_folder, last_exec_path, contract_name,
+                endpoint, kwargs, registry=registry, journal=journal)
+    return _write_output(json.dumps(result, indent=indent),
+                         _absolute(cwd, output_path))
+
+
+_COMMANDS = {
+    COMMAND_PARSE: _run_parse,
+    COMMAND_COMPILE: _run_compile,
+    COMMAND_QUOTE: _run_quote,
+    COMMAND_INVOKE: _run_invoke,
+}
+
+
+def handle_request(payload):
+    """Runs the command of a request.
+
+    :param payload: The encoded request.
+    :type payload: bytes
+    :return: The encoded response.
+    :rtype: bytes
+    """
+    try:
+        request = json.loads(payload.decode())
+        command = request['command']
+        if command not in _COMMANDS:
+            raise ValueError(f"Unknown command '{command}'.")
+        output = _COMMANDS[command](request['argv'], request['cwd'],
+                                    request.get('stdin'))
+    except SystemExit:
+        # Raised by argparse, which reports the error in the daemon log.
+        return encode_response(STATUS_ERROR, 'Invalid arguments.')
+    except Exception as e:
+        logging.error(f'Request failed: {e}')
+        return encode_response(STATUS_ERROR, str(e) or type(e).__name__)
+    return encode_response(STATUS_OK, output)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serves the requests of a client connection until it is closed."""
+
+    def handle(self):
+        while True:
+            try:
+                payload = read_frame(self.rfile)
+            except WorkerError:
+                return
+            if payload is None:
+                return
+            self.wfile.write(pack_frame(handle_request(payload)))
+
+
+class DaemonServer(socketserver.ThreadingMixIn,
+                   socketserver.UnixStreamServer):
+    """Unix socket server handling each client in its own thread."""
+
+    daemon_threads = True
+
+
+def _remove_stale_socket(socket_path):
+    """Removes the socket left by a daemon which did not stop properly.
+
+    :raise RuntimeError: If a daemon is listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+            return
+    raise RuntimeError(f"A daemon is already listening on '{socket_path}'.")
+
+
+def serve(socket_path=None):
+    """Runs the daemon until it is interrupted or terminated.
+
+    The socket is only accessible by the user running the daemon.
+
+    :param socket_path: Path of the Unix socket to listen on,
+        PKC_SC_DAEMON_SOCKET or pikciosc.sock in the temporary folder by
+        default.
+    :type socket_path: str
+    """
+    socket_path = get_socket_path(socket_path)
+    _remove_stale_socket(socket_path)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    old_umask = os.umask(0o177)
+    try:
+        server = DaemonServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(old_umask)
+    logging.info(f"Listening on '{socket_path}'.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+def _parse_args(argv=None):
+    """Loads the arguments from the command line.
+
+    :param argv: Arguments to load instead of the ones of the process.
+    :type argv: list[str]
+    """
+    parser = ArgumentParser(description='Pikcio Smart Contract daemon.')
+    parser.add_argument("--socket", "-s", type=str, dest='socket_path',
+                        help='Path of the Unix socket to listen on, '
+                             'PKC_SC_DAEMON_SOCKET by default.')
+    known_args, _ = parser.parse_known_args(argv)
+    return known_args.socket_path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    serve(_parse_args())
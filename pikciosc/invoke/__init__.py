@@ -1,3 +1,3 @@
-from pikciosc.invoke.invoke import invoke
+from pikciosc.invoke.invoke import invoke, invoke_batch
 
-__all__ = [invoke]
+__all__ = [invoke, invoke_batch]
@@ -0,0 +1,234 @@
+"""This module provides asyncio counterparts of the invocation features.
+
+Each invocation runs in a dedicated worker process (see `worker.py`) driven
+through asyncio subprocesses, so that a single event loop can run many
+invocations concurrently. If the environment variable SANDBOX is 'none' or
+'fork', the worker is a plain local process. Otherwise it is run inside a
+docker container.
+"""
+import asyncio
+import os
+import uuid
+
+from pikciosc.invoke.invoke import prepare_invocation
+from pikciosc.invoke.limits import ExecutionLimits, LimitExceededError, \
+    WallTimeExceededError, limit_exceeded_executions
+from pikciosc.invoke.protocol import decode_response, encode_job, \
+    pack_frame, unpack_frame, WorkerError
+from pikciosc.invoke.runner import DockerRunner, LocalRunner
+from pikciosc.invoke.worker import OP_EXECUTE, OP_EXECUTE_BATCH
+from pikciosc.models import ExecutionInfo
+
+ENV_PKC_SC_MAX_CONCURRENCY = 'PKC_SC_MAX_CONCURRENCY'
+
+
+def _make_runner(script_path):
+    """Creates the runner used to start the worker executing a script.
+
+    :param script_path: Full path to the script to execute.
+    :type script_path: str
+    :rtype: WorkerRunner
+    """
+    if os.environ.get('SANDBOX', '').lower() in ('none', 'fork'):
+        return LocalRunner()
+    return DockerRunner(os.path.dirname(script_path))
+
+
+class AsyncInvoker(object):
+    """Runs contract invocations from an event loop, with bounded
+    concurrency."""
+
+    def __init__(self, max_concurrency=16, timeout=None):
+        """Creates a new AsyncInvoker.
+
+        :param max_concurrency: Maximum number of invocations running at the
+            same time. Extra invocations wait for a slot.
+        :type max_concurrency: int
+        :param timeout: Default number of seconds after which an invocation is
+            aborted and its sandbox killed. None means no limit.
+        :type timeout: float
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        """The semaphore bounding concurrency, created in the running loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @staticmethod
+    async def _kill(process, runner, name):
+        """Kills a worker process and releases its sandbox.
+
+        :param process: The worker process.
+        :type process: asyncio.subprocess.Process
+        :param runner: The runner which started the worker.
+        :type runner: WorkerRunner
+        :param name: Name of the worker.
+        :type name: str
+        """
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        await asyncio.get_event_loop().run_in_executor(None, runner.kill, name)
+
+    async def _run_job(self, runner, job, timeout):
+        """Runs a job in a new worker and returns its result.
+
+        :param runner: Runner used to start the worker.
+        :type runner: WorkerRunner
+        :param job: The job to run.
+        :type job: dict
+        :param timeout: Number of seconds after which the job is aborted.
+        :type timeout: float
+        :return: The job result.
+        :raise WallTimeExceededError: If the worker ran past the wall time
+            limit of its calls, before the timeout.
+        """
+        limits = ExecutionLimits.from_env()
+        limits_timeout = limits.host_timeout(
+            len(job['calls']) if 'calls' in job else 1)
+        limited_by_wall_time = limits_timeout is not None and (
+            timeout is None or limits_timeout < timeout)
+        if limited_by_wall_time:
+            timeout = limits_timeout
+
+        name = f'pikciosc-async-{uuid.uuid4().hex[:12]}'
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *runner.command(name), env=runner.environ(),
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(pack_frame(encode_job(job))), timeout)
+            except asyncio.TimeoutError:
+                await self._kill(process, runner, name)
+                if limited_by_wall_time:
+                    raise WallTimeExceededError(limits.wall_time)
+                raise
+            except BaseException:
+                # Timed out or cancelled: do not leave the sandbox running.
+                await self._kill(process, runner, name)
+                raise
+
+        try:
+            return decode_response(unpack_frame(stdout))
+        except WorkerError as e:
+            raise RuntimeError(stderr.decode() or str(e))
+
+    async def invoke(self, bin_folder, interface_folder, last_exec_info,
+                     contract_name, endpoint, kwargs, timeout=None,
+                     registry=None):
+        """Invoke a contract endpoint with provided arguments.
+
+        Parameters match the ones of `invoke.invoke`.
+
+        :param timeout: Number of seconds after which the invocation is
+            aborted. Defaults to the invoker timeout.
+        :type timeout: float
+        :return: the execution details.
+        :rtype: ExecutionInfo
+        """
+        script_path, vars_ = prepare_invocation(
+            bin_folder, interface_folder, last_exec_info, contract_name,
+            [endpoint], registry)
+        script_path = os.path.abspath(script_path)
+        runner = _make_runner(script_path)
+        try:
+            result = await self._run_job(runner, {
+                'op': OP_EXECUTE,
+                'script': runner.script_path(script_path),
+                'storage': vars_,
+                'endpoint': endpoint,
+                'kwargs': kwargs,
+            }, timeout or self.timeout)
+        except LimitExceededError as e:
+            return limit_exceeded_executions(
+                vars_, [(endpoint, kwargs)], str(e))[0]
+        return ExecutionInfo.from_dict(result).materialise(vars_)
+
+    async def invoke_batch(self, bin_folder, interface_folder, last_exec_info,
+                           contract_name, calls, timeout=None, registry=None):
+        """Invoke several endpoints of a contract in a row, in a single
+        sandbox session.
+
+        Parameters match the ones of `invoke.invoke_batch`.
+
+        :param timeout: Number of seconds after which the whole batch is
+            aborted. Defaults to the invoker timeout.
+        :type timeout: float
+        :return: the execution details of each call.
+        :rtype: list[ExecutionInfo]
+        """
+        script_path, vars_ = prepare_invocation(
+            bin_folder, interface_folder, last_exec_info, contract_name,
+            [endpoint for endpoint, _ in calls], registry)
+        script_path = os.path.abspath(script_path)
+        runner = _make_runner(script_path)
+        try:
+            result = await self._run_job(runner, {
+                'op': OP_EXECUTE_BATCH,
+                'script': runner.script_path(script_path),
+                'storage': vars_,
+                'calls': calls,
+            }, timeout or self.timeout)
+        except LimitExceededError as e:
+            return limit_exceeded_executions(vars_, calls, str(e))
+        return ExecutionInfo.from_dicts(result, vars_)
+
+
+_DEFAULT_INVOKER = None
+
+
+def get_default_invoker():
+    """Gets the invoker shared by invoke_async calls. Its concurrency is set by
+    the environment variable PKC_SC_MAX_CONCURRENCY (16 by default).
+
+    :rtype: AsyncInvoker
+    """
+    global _DEFAULT_INVOKER
+    if _DEFAULT_INVOKER is None:
+        _DEFAULT_INVOKER = AsyncInvoker(
+            int(os.environ.get(ENV_PKC_SC_MAX_CONCURRENCY, 16)))
+    return _DEFAULT_INVOKER
+
+
+async def invoke_async(bin_folder, interface_folder, last_exec_info,
+                       contract_name, endpoint, kwargs, timeout=None,
+                       registry=None):
+    """Invoke a contract endpoint with provided arguments, from an event loop.
+
+    Invocations made with this function share a global concurrency limit.
+
+    :param bin_folder: Path to the folder containing contract compiled scripts.
+    :type bin_folder: str
+    :param interface_folder: Path to the folder containing contract interfaces.
+    :type interface_folder: str
+    :param last_exec_info: Result of previous execution, if any.
+    :type last_exec_info: ExecutionInfo
+    :param contract_name: Name of the contract to execute.
+    :type contract_name: str
+    :param endpoint: Name of endpoint to execute.
+    :type endpoint: str
+    :param kwargs: List of named arguments to pass to the endpoint.
+    :type kwargs: list[Variable]
+    :param timeout: Number of seconds after which the invocation is aborted
+        and its sandbox killed.
+    :type timeout: float
+    :param registry: Optional registry to look the contract up in. When
+        provided, bin_folder and interface_folder are ignored.
+    :type registry: ContractRegistry
+    :return: the execution details.
+    :rtype: ExecutionInfo
+    """
+    return await get_default_invoker().invoke(
+        bin_folder, interface_folder, last_exec_info, contract_name, endpoint,
+        kwargs, timeout, registry)
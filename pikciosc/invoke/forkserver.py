@@ -0,0 +1,309 @@
+"""This module provides a fork-server to execute contracts without docker.
+
+The server is a separate process that keeps pikciosc and the contract modules
+loaded. It forks a child for each invocation, so that every execution is
+isolated from the others and from the caller, at the cost of a fork instead
+of a whole interpreter startup. Invocations are received and answered over a
+Unix socket, one connection per invocation, using the framing of
+`protocol.py`. Each child first sends its pid, so that the client can kill it
+if it does not answer in time.
+"""
+import atexit
+import os
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from pikciosc.invoke import shell
+from pikciosc.invoke.limits import ExecutionLimits, LimitExceededError, \
+    SandboxKilledError, WallTimeExceededError, limit_exceeded_executions
+from pikciosc.invoke.protocol import decode_job, decode_response, \
+    encode_job, encode_response, pack_frame, read_frame, STATUS_ERROR, \
+    STATUS_OK, WorkerError
+from pikciosc.models import ExecutionInfo
+
+_CURRENT_DIR = os.path.dirname(__file__)
+_ROOT_DIR = os.path.dirname(os.path.dirname(_CURRENT_DIR))
+
+_PRELOAD_WALL_TIME = 5.0
+"""Maximum duration of the loading of a module in the server, in seconds, if
+no lower wall time limit is set."""
+
+_FORK_SERVER = None
+_FORK_SERVER_LOCK = threading.Lock()
+
+
+def _preload(modules, script_path):
+    """Loads the module at provided path in the server process, unless it is
+    already loaded and up to date.
+
+    The top-level code of the module runs under the execution limits, with a
+    wall time of at most _PRELOAD_WALL_TIME, so that it can't block the
+    server. Modules failing to load are not loaded again until they change.
+
+    :param modules: Loaded modules, mapping paths to (mtime, module) tuples.
+        The module is None if it could not be loaded.
+    :type modules: dict
+    :param script_path: Path to the module to load.
+    :type script_path: str
+    :return: The loaded module, or None if it could not be loaded.
+    :rtype: module
+    """
+    try:
+        mtime = os.stat(script_path).st_mtime_ns
+    except OSError:
+        modules.pop(script_path, None)
+        return None
+    if script_path in modules and modules[script_path][0] == mtime:
+        return modules[script_path][1]
+
+    limits = ExecutionLimits.from_env(kill_on_breach=False)
+    if limits.wall_time is None or limits.wall_time > _PRELOAD_WALL_TIME:
+        limits.wall_time = _PRELOAD_WALL_TIME
+    try:
+        with limits:
+            module = shell._load_module(script_path)
+    except (Exception, LimitExceededError):
+        # The child reports the error when it tries to load the module again.
+        module = None
+    modules[script_path] = (mtime, module)
+    return module
+
+
+def _run_child(conn, module, job):
+    """Executes a job in the current (forked) process and sends its result
+    back on the connection.
+
+    :param conn: Connection to answer on.
+    :type conn: socket.socket
+    :param module: Module preloaded by the server, if any.
+    :type module: module
+    :param job: The job to execute.
+    :type job: dict
+    """
+    conn.sendall(pack_frame(encode_response(STATUS_OK, os.getpid())))
+    limits = ExecutionLimits.from_env(kill_on_breach=True)
+    try:
+        if 'calls' in job:
+            result = [
+                execution_info.to_dict(delta=True)
+                for execution_info in shell.execute_batch(
+                    job['script'], job['storage'], job['calls'],
+                    limits=limits)
+            ]
+        else:
+            result = shell.execute(
+                job['script'], job['storage'], job['endpoint'], job['kwargs'],
+                module, limits=limits
+            ).to_dict(delta=True)
+        response = encode_response(STATUS_OK, result)
+    except Exception as e:
+        response = encode_response(STATUS_ERROR, str(e))
+    conn.sendall(pack_frame(response))
+
+
+def serve(socket_path, preload=()):
+    """Runs the fork-server until its standard input is closed.
+
+    :param socket_path: Path of the Unix socket to listen on.
+    :type socket_path: str
+    :param preload: Paths of contract modules to load right away.
+    :type preload: list[str]
+    """
+    modules = {}
+    for script_path in preload:
+        _preload(modules, script_path)
+
+    # Children are reaped automatically.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(128)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    selector.register(sys.stdin, selectors.EVENT_READ)
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is sys.stdin:
+                if not sys.stdin.buffer.read1(1):
+                    return  # The client process is gone.
+                continue
+
+            conn, _ = server.accept()
+            with conn, conn.makefile('rb') as channel_in:
+                job = decode_job(read_frame(channel_in))
+                module = _preload(modules, job['script'])
+                if os.fork() == 0:
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    try:
+                        server.close()
+                        _run_child(conn, module, job)
+                    finally:
+                        os._exit(0)
+
+
+def _kill(pid):
+    """Kills a child of the server, if it is still running.
+
+    :param pid: The pid of the child.
+    :type pid: int
+    """
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class ForkServer(object):
+    """Client side of a fork-server process."""
+
+    def __init__(self, preload=(), start_timeout=10.0):
+        """Starts a new fork-server process.
+
+        :param preload: Paths of contract modules to load right away.
+        :type preload: list[str]
+        :param start_timeout: Number of seconds to wait for the server to
+            listen.
+        :type start_timeout: float
+        """
+        self._dir = tempfile.mkdtemp(prefix='pikciosc-')
+        self.socket_path = os.path.join(self._dir, 'forkserver.sock')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, (_ROOT_DIR, env.get('PYTHONPATH')))
+        )
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.join(_CURRENT_DIR, 'forkserver.py'),
+             self.socket_path, *preload],
+            env=env, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + start_timeout
+        while not os.path.exists(self.socket_path):
+            if self._process.poll() is not None or time.monotonic() > deadline:
+                self.close()
+                raise RuntimeError('Fork-server failed to start.')
+            time.sleep(0.01)
+
+    def execute(self, script_path, storage_vars, endpoint, kwargs):
+        """Executes an endpoint in a process forked from the server.
+
+        :param script_path: Full path to the script to execute.
+        :type script_path: str
+        :param storage_vars: The list of storage vars to restore.
+        :type storage_vars: list[Variable]
+        :param endpoint: Name of endpoint to execute.
+        :type endpoint: str
+        :param kwargs: List of named arguments to pass to the endpoint.
+        :type kwargs: list[Variable]
+        :return: The resulting execution info.
+        :rtype: ExecutionInfo
+        """
+        try:
+            result = self._request({
+                'script': os.path.abspath(script_path),
+                'storage': storage_vars,
+                'endpoint': endpoint,
+                'kwargs': kwargs,
+            })
+        except LimitExceededError as e:
+            return limit_exceeded_executions(
+                storage_vars, [(endpoint, kwargs)], str(e))[0]
+        return ExecutionInfo.from_dict(result).materialise(storage_vars)
+
+    def execute_batch(self, script_path, storage_vars, calls):
+        """Executes several endpoints in a row in a process forked from the
+        server.
+
+        :param script_path: Full path to the script to execute.
+        :type script_path: str
+        :param storage_vars: The list of storage vars to restore before the
+            first call.
+        :type storage_vars: list[Variable]
+        :param calls: Ordered couples of endpoint names and named arguments.
+        :type calls: list[tuple[str,list[Variable]]]
+        :return: The resulting execution info of each call.
+        :rtype: list[ExecutionInfo]
+        """
+        try:
+            result = self._request({
+                'script': os.path.abspath(script_path),
+                'storage': storage_vars,
+                'calls': calls,
+            })
+        except LimitExceededError as e:
+            return limit_exceeded_executions(storage_vars, calls, str(e))
+        return ExecutionInfo.from_dicts(result, storage_vars)
+
+    def _request(self, job):
+        """Sends a job to the server and returns the result of its child.
+
+        :param job: The job to send.
+        :type job: dict
+        :return: The job result.
+        :raise LimitExceededError: If the child was stopped or did not answer
+            in time.
+        """
+        limits = ExecutionLimits.from_env()
+        start = time.monotonic()
+        pid = None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(self.socket_path)
+            conn.sendall(pack_frame(encode_job(job)))
+            conn.settimeout(limits.host_timeout(
+                len(job['calls']) if 'calls' in job else 1))
+            with conn.makefile('rb') as channel_in:
+                try:
+                    pid = decode_response(read_frame(channel_in))
+                    return decode_response(read_frame(channel_in))
+                except socket.timeout:
+                    if pid is not None:
+                        _kill(pid)
+                    raise WallTimeExceededError(limits.wall_time)
+                except WorkerError as e:
+                    # Children exceeding their limits are killed by SIGXCPU.
+                    max_time = limits.max_time
+                    if max_time and time.monotonic() - start >= max_time:
+                        raise SandboxKilledError()
+                    raise RuntimeError(f'Forked execution failed: {e}')
+
+    def close(self):
+        """Stops the server process."""
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def get_fork_server():
+    """Gets the shared fork-server, starting it if necessary.
+
+    :rtype: ForkServer
+    """
+    global _FORK_SERVER
+    with _FORK_SERVER_LOCK:
+        if _FORK_SERVER is None or _FORK_SERVER._process.poll() is not None:
+            _FORK_SERVER = ForkServer()
+        return _FORK_SERVER
+
+
+@atexit.register
+def close_fork_server():
+    """Stops the shared fork-server, if any."""
+    with _FORK_SERVER_LOCK:
+        if _FORK_SERVER is not None:
+            _FORK_SERVER.close()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,289 @@
+"""This module meters the work done by a contract call in gas units.
+
+Gas is counted on the bytecode instructions executed by the contract module,
+each instruction being weighted by its opcode. Instructions run outside the
+contract module (builtins, standard library) are not metered, but the calls
+made to them are.
+
+The work done inside a single instruction is not metered either: calling a
+builtin or C function costs the same whatever its arguments, and so do
+operators. `sum(range(10 ** 12))` or `'x' * 10 ** 9` cost a few gas units.
+Such calls are only bounded by the execution limits (see `limits.py`), which
+should be set along with the gas limit.
+
+Two granularities are available:
+- `line` (default): each executed line costs the weights of the instructions
+  it contains. It is several times cheaper to trace.
+- `opcode`: each executed instruction is charged. It requires Python 3.7+.
+"""
+import dis
+import os
+import sys
+import weakref
+
+from pikciosc.invoke.limits import LimitExceededError
+
+ENV_PKC_SC_GAS_LIMIT = 'PKC_SC_GAS_LIMIT'
+ENV_PKC_SC_GAS_GRANULARITY = 'PKC_SC_GAS_GRANULARITY'
+
+GRANULARITY_LINE = 'line'
+GRANULARITY_OPCODE = 'opcode'
+
+DEFAULT_OPCODE_COST = 1
+OPCODE_COSTS = {
+    # Bookkeeping instructions are free.
+    'NOP': 0, 'EXTENDED_ARG': 0, 'CACHE': 0, 'RESUME': 0, 'PRECALL': 0,
+    'KW_NAMES': 0,
+    # Calls create frames, or run builtins which are not metered.
+    'CALL': 5, 'CALL_FUNCTION': 5, 'CALL_FUNCTION_KW': 5,
+    'CALL_FUNCTION_EX': 5, 'CALL_METHOD': 5,
+    'MAKE_FUNCTION': 3,
+    'BUILD_LIST': 2, 'BUILD_TUPLE': 2, 'BUILD_SET': 2, 'BUILD_MAP': 2,
+    'BUILD_CONST_KEY_MAP': 2, 'BUILD_STRING': 2, 'BUILD_SLICE': 2,
+    'IMPORT_NAME': 20, 'IMPORT_FROM': 5,
+}
+"""Gas cost of opcodes, by name. Unlisted opcodes cost DEFAULT_OPCODE_COST."""
+
+_COSTS_BY_OPCODE = [
+    OPCODE_COSTS.get(name, DEFAULT_OPCODE_COST) for name in dis.opname
+]
+
+_OPCODE_COSTS = weakref.WeakKeyDictionary()
+"""Maps code objects to the gas costs of their instructions, by offset."""
+_LINE_COSTS = weakref.WeakKeyDictionary()
+"""Maps code objects to the gas costs of their lines, by line number."""
+
+
+class OutOfGasError(LimitExceededError):
+    """Raised when a metered call consumes more gas than its limit."""
+
+    def __init__(self, gas_limit):
+        super().__init__(f'Out of gas: limit of {gas_limit} exceeded.')
+        self.gas_limit = gas_limit
+
+
+def get_gas_limit():
+    """Gets the gas limit configured through PKC_SC_GAS_LIMIT.
+
+    :return: The gas limit, or None if calls are not metered.
+    :rtype: int|None
+    """
+    raw_limit = os.environ.get(ENV_PKC_SC_GAS_LIMIT)
+    return int(raw_limit) if raw_limit else None
+
+
+def _opcode_costs(code):
+    """Gets the gas costs of the instructions of a code object.
+
+    :param code: The code object.
+    :type code: CodeType
+    :return: The cost of each instruction, indexed by offset.
+    :rtype: list[int]
+    """
+    costs = _OPCODE_COSTS.get(code)
+    if costs is None:
+        costs = [0] * len(code.co_code)
+        for instruction in dis.get_instructions(code):
+            costs[instruction.offset] = _COSTS_BY_OPCODE[instruction.opcode]
+        _OPCODE_COSTS[code] = costs
+    return costs
+
+
+def _line_costs(code):
+    """Gets the gas costs of the lines of a code object.
+
+    :param code: The code object.
+    :type code: CodeType
+    :return: The cost of each line, by line number.
+    :rtype: dict[int,int]
+    """
+    costs = _LINE_COSTS.get(code)
+    if costs is None:
+        costs = {}
+        line = code.co_firstlineno
+        for instruction in dis.get_instructions(code):
+            line = instruction.starts_line or line
+            costs[line] = (costs.get(line, 0) +
+                           _COSTS_BY_OPCODE[instruction.opcode])
+        _LINE_COSTS[code] = costs
+    return costs
+
+
+def get_gas_granularity():
+    """Gets the metering granularity configured through
+    PKC_SC_GAS_GRANULARITY.
+
+    :rtype: str
+    """
+    granularity = os.environ.get(ENV_PKC_SC_GAS_GRANULARITY) or \
+        GRANULARITY_LINE
+    if granularity not in (GRANULARITY_LINE, GRANULARITY_OPCODE):
+        raise ValueError(f"Unknown gas granularity '{granularity}'.")
+    return granularity
+
+
+class GasMeter(object):
+    """Meters the gas consumed by the code of a module while it is active.
+
+    The meter is a context manager, tracing the current thread only:
+
+        with GasMeter(module.__dict__, 10000) as meter:
+            module.endpoint()
+        print(meter.gas_used)
+
+    Once the limit is exceeded, OutOfGasError is raised inside the metered code
+    and raised again on each line (or opcode) it runs afterwards, so that a
+    contract catching the error is still aborted. Callers should rely on
+    `exhausted` to know if the limit has been reached.
+    """
+
+    def __init__(self, module_globals, gas_limit, granularity=None):
+        """Creates a new GasMeter.
+
+        :param module_globals: Namespace of the module to meter. Only frames
+            running with these globals are metered.
+        :type module_globals: dict
+        :param gas_limit: Maximum gas the code can consume.
+        :type gas_limit: int
+        :param granularity: GRANULARITY_LINE or GRANULARITY_OPCODE. Defaults
+            to PKC_SC_GAS_GRANULARITY, or to lines.
+        :type granularity: str
+        """
+        granularity = granularity or get_gas_granularity()
+        if granularity == GRANULARITY_OPCODE and sys.version_info < (3, 7):
+            raise ValueError('Metering opcodes requires Python 3.7+.')
+        self.module_globals = module_globals
+        self.gas_limit = gas_limit
+        self.granularity = granularity
+        self.gas_used = 0
+        self._tracers = {}
+        self._previous_trace = None
+        self._active = False
+
+    @property
+    def exhausted(self):
+        """Tells if the gas limit has been exceeded."""
+        return self.gas_used > self.gas_limit
+
+    def _make_tracer(self, code):
+        """Creates the local trace function charging the gas of a code
+        object.
+
+        :param code: The code object to meter.
+        :type code: CodeType
+        :rtype: callable
+        """
+        if self.granularity == GRANULARITY_OPCODE:
+            costs = _opcode_costs(code)
+
+            def trace(frame, event, _arg):
+                if event == 'opcode':
+                    self.gas_used += costs[frame.f_lasti]
+                    if self.gas_used > self.gas_limit:
+                        self._abort(frame)
+                return trace
+        else:
+            costs = _line_costs(code)
+
+            def trace(frame, event, _arg):
+                if event == 'line':
+                    self.gas_used += costs.get(frame.f_lineno, 0)
+                    if self.gas_used > self.gas_limit:
+                        self._abort(frame)
+                return trace
+        return trace
+
+    def _trace_call(self, frame, event, _arg):
+        """Global trace function, choosing the frames to meter."""
+        if event != 'call' or frame.f_globals is not self.module_globals:
+            return None
+
+        if self.exhausted:
+            return self._arm_abort(frame)
+        code = frame.f_code
+        tracer = self._tracers.get(code)
+        if tracer is None:
+            tracer = self._tracers[code] = self._make_tracer(code)
+        if self.granularity == GRANULARITY_OPCODE:
+            frame.f_trace_lines = False
+            frame.f_trace_opcodes = True
+        return tracer
+
+    def _abort(self, frame):
+        """Raises OutOfGasError in a frame, making sure the frame and its
+        metered callers keep raising it afterwards.
+
+        :param frame: The frame exceeding the limit.
+        :type frame: FrameType
+        """
+        self._arm_abort(frame)
+        raise OutOfGasError(self.gas_limit)
+
+    def _arm_abort(self, frame):
+        """Installs _AbortTracer on a frame and its metered callers.
+
+        :param frame: The innermost frame to abort.
+        :type frame: FrameType
+        :return: The tracer of the frame.
+        :rtype: _AbortTracer
+        """
+        tracer = _AbortTracer(self, frame)
+        frame.f_trace = tracer
+        caller = frame.f_back
+        while caller is not None:
+            if caller.f_globals is self.module_globals and \
+                    not isinstance(caller.f_trace, _AbortTracer):
+                caller.f_trace = _AbortTracer(self, caller)
+            caller = caller.f_back
+        return tracer
+
+    def _rearm(self, frame):
+        """Restores the tracing of the thread once CPython removed it, while
+        the meter is still active.
+
+        :param frame: The frame which lost its tracer.
+        :type frame: FrameType
+        """
+        if not self._active:
+            return
+        sys.settrace(self._trace_call)
+        if frame.f_trace is None:
+            self._arm_abort(frame)
+
+    def __enter__(self):
+        self._previous_trace = sys.gettrace()
+        self._active = True
+        sys.settrace(self._trace_call)
+        return self
+
+    def __exit__(self, *_):
+        self._active = False
+        sys.settrace(self._previous_trace)
+        return False
+
+
+class _AbortTracer(object):
+    """Local trace function of the metered frames once the meter is
+    exhausted, raising OutOfGasError on each line or opcode.
+
+    When a trace function raises, CPython removes the trace function of the
+    thread and clears the tracer of the frame. As the frame holds the only
+    reference to its _AbortTracer, the tracer is then collected, and re-arms
+    the meter from __del__.
+    """
+
+    __slots__ = ('meter', 'frame')
+
+    def __init__(self, meter, frame):
+        self.meter = meter
+        self.frame = frame
+
+    def __call__(self, _frame, event, _arg):
+        if event in ('line', 'opcode'):
+            raise OutOfGasError(self.meter.gas_limit)
+        return self
+
+    def __del__(self):
+        frame, self.frame = self.frame, None
+        if frame is not None:
+            self.meter._rearm(frame)
@@ -1,24 +1,33 @@
 """This module focused on invoking an already registered contract endpoint.
+
+The sandbox is only imported once an endpoint is invoked, so that importing
+the `invoke` package, as the shell running inside the sandbox does, stays
+light.
 """
 import json
-import logging
 import os
-from argparse import ArgumentParser
+import sys
 
-from pikciosc.invoke.sandbox import execute_sandbox
+from pikciosc.invoke.journal import ContractJournal
 from pikciosc.invoke.utils import inflate_cli_arguments
-from pikciosc.models import ExecutionInfo, ContractInterface
+from pikciosc.models import ExecutionInfo, ContractInterface, Variable
 
 
-def find_script(bin_folder, contract_name):
+def find_script(bin_folder, contract_name, store=None):
     """Finds the script to execute based on the contract name.
 
     :param bin_folder: The folder containing the scripts.
     :type bin_folder: str
     :param contract_name: Name of the contract to execute.
     :type contract_name: str
+    :param store: Optional artifact store, looked up before the folder.
+    :type store: ArtifactStore
     :return: Path to the script to execute, or None if nothing found.
     """
+    if store is not None:
+        script_path = store.find_script(contract_name)
+        if script_path:
+            return script_path
     # Look for compiled scripts first.
     for ext in ('pyc', 'py'):
         script_path = os.path.join(bin_folder, f'{contract_name}.{ext}')
@@ -43,8 +52,80 @@ def _get_contract_interface(interface_folder, contract_name):
     return contract_interface
 
 
+def _dump_storage(storage_vars):
+    """Dumps storage vars as they are stored in journals, to compare them.
+
+    :type storage_vars: list[Variable]
+    :rtype: str
+    """
+    return json.dumps([var.to_dict() for var in storage_vars],
+                      sort_keys=True)
+
+
+def prepare_invocation(bin_folder, interface_folder, last_exec_info,
+                       contract_name, endpoints, registry=None, journal=None):
+    """Locates a contract script, checks the endpoints to call and gets the
+    storage to restore before calling them.
+
+    :param bin_folder: Path to the folder containing contract compiled scripts.
+    :type bin_folder: str
+    :param interface_folder: Path to the folder containing contract interfaces.
+    :type interface_folder: str
+    :param last_exec_info: Result of previous execution, if any.
+    :type last_exec_info: ExecutionInfo
+    :param contract_name: Name of the contract to execute.
+    :type contract_name: str
+    :param endpoints: Names of the endpoints to call.
+    :type endpoints: list[str]
+    :param registry: Optional registry to look the contract up in, instead of
+        the folders.
+    :type registry: ContractRegistry
+    :param journal: Optional journal of the contract. If last_exec_info is
+        not provided, storage is restored from the journal. Otherwise, it
+        must match the last state of the journal.
+    :type journal: ContractJournal
+    :return: The path to the script and the storage vars to restore.
+    :rtype: tuple[str,list[Variable]]
+    """
+    if journal is not None and journal.contract_name != contract_name:
+        raise ValueError(f"Journal of '{journal.contract_name}' cannot be "
+                         f"used with contract {contract_name}.")
+    state = journal.get_state() if journal is not None else None
+    if state is not None:
+        if not last_exec_info:
+            last_exec_info = ExecutionInfo(state)
+        elif _dump_storage(state) != _dump_storage(
+                last_exec_info.storage_after):
+            # New executions would be journaled as following the journal
+            # state, corrupting the replayed states.
+            raise ValueError(f"Last execution does not match the state of the"
+                             f" journal of contract {contract_name}.")
+
+    script_path = (
+        registry.find_script(contract_name) if registry else
+        find_script(bin_folder, contract_name)
+    )
+    if not script_path:
+        raise ValueError(f'No executable for contract {contract_name}.')
+
+    interface = (
+        registry.get_interface(contract_name) if registry else
+        _get_contract_interface(interface_folder, contract_name)
+    )
+    for endpoint in endpoints:
+        if not interface.is_supported_endpoint(endpoint):
+            raise ValueError(f'Endpoint {endpoint} is invalid for contract '
+                             f'{contract_name}.')
+
+    vars_ = (
+        last_exec_info.storage_after if last_exec_info else
+        interface.storage_vars
+    )
+    return script_path, vars_
+
+
 def invoke(bin_folder, interface_folder, last_exec_info, contract_name,
-           endpoint, kwargs):
+           endpoint, kwargs, registry=None, journal=None):
     """Invoke a contract endpoint with provided arguments.
 
     Storage variables are restored from previous contract execution and saved
@@ -62,27 +143,84 @@ def invoke(bin_folder, interface_folder, last_exec_info, contract_name,
     :type endpoint: str
     :param kwargs: List of named arguments to pass to the endpoint.
     :type kwargs: list[Variable]
+    :param registry: Optional registry to look the contract up in. When
+        provided, bin_folder and interface_folder are ignored.
+    :type registry: ContractRegistry
+    :param journal: Optional journal of the contract. Storage is restored from
+        its last state, which last_exec_info must match if provided, and the
+        new execution is appended to it.
+    :type journal: ContractJournal
     :return: the execution details.
     """
-    script_path = find_script(bin_folder, contract_name)
-    if not script_path:
-        raise ValueError(f'No executable for contract {contract_name}.')
-
-    interface = _get_contract_interface(interface_folder, contract_name)
-    if not interface.is_supported_endpoint(endpoint):
-        raise ValueError(f'Endpoint {endpoint} is invalid for contract '
-                         f'{contract_name}.')
+    from pikciosc.invoke.sandbox import execute_sandbox
 
-    vars_ = (
-        last_exec_info.storage_after if last_exec_info else
-        interface.storage_vars
-    )
+    script_path, vars_ = prepare_invocation(
+        bin_folder, interface_folder, last_exec_info, contract_name,
+        [endpoint], registry, journal)
     new_exec_info = execute_sandbox(script_path, vars_, endpoint, kwargs)
+    if journal is not None:
+        journal.append(new_exec_info)
     return new_exec_info
 
 
+def invoke_batch(bin_folder, interface_folder, last_exec_info, contract_name,
+                 calls, registry=None, journal=None):
+    """Invoke several endpoints of a contract in a row, in a single sandbox
+    session.
+
+    Storage variables are restored from previous contract execution and
+    threaded from one call to the next. A failed call does not alter them.
+
+    :param bin_folder: Path to the folder containing contract compiled scripts.
+    :type bin_folder: str
+    :param interface_folder: Path to the folder containing contract interfaces.
+    :type interface_folder: str
+    :param last_exec_info: Result of previous execution, if any.
+    :type last_exec_info: ExecutionInfo
+    :param contract_name: Name of the contract to execute.
+    :type contract_name: str
+    :param calls: Ordered couples of endpoint names and named arguments.
+    :type calls: list[tuple[str,list[Variable]]]
+    :param registry: Optional registry to look the contract up in. When
+        provided, bin_folder and interface_folder are ignored.
+    :type registry: ContractRegistry
+    :param journal: Optional journal of the contract. Storage is restored from
+        its last state, which last_exec_info must match if provided, and the
+        new executions are appended to it.
+    :type journal: ContractJournal
+    :return: the execution details of each call.
+    :rtype: list[ExecutionInfo]
+    """
+    from pikciosc.invoke.sandbox import execute_sandbox_batch
+
+    script_path, vars_ = prepare_invocation(
+        bin_folder, interface_folder, last_exec_info, contract_name,
+        [endpoint for endpoint, _ in calls], registry, journal)
+    executions = execute_sandbox_batch(script_path, vars_, calls)
+    if journal is not None:
+        for execution_info in executions:
+            journal.append(execution_info)
+    return executions
+
+
+def _open_journal(journal_folder, contract_name):
+    """Opens the journal of a contract if a journal folder is provided.
+
+    :param journal_folder: Folder where journals are stored, if any.
+    :type journal_folder: str
+    :param contract_name: Name of the contract.
+    :type contract_name: str
+    :rtype: ContractJournal|None
+    """
+    return (
+        ContractJournal(journal_folder, contract_name) if journal_folder else
+        None
+    )
+
+
 def invoke_cli(bin_folder, interface_folder, last_exec_path, contract_name,
-               endpoint, flat_kwargs):
+               endpoint, flat_kwargs, journal_folder=None, registry=None,
+               journal=None):
     """Invoke a contract endpoint with provided arguments coming from cli.
 
     Storage variables are restored from previous contract execution and saved
@@ -100,16 +238,84 @@ def invoke_cli(bin_folder, interface_folder, last_exec_path, contract_name,
     :type endpoint: str
     :param flat_kwargs: List of named arguments to pass to the endpoint.
     :type flat_kwargs: list
+    :param journal_folder: Folder of the contracts journals, if any.
+    :type journal_folder: str
+    :param registry: Optional registry to look the contract up in, instead of
+        the folders.
+    :type registry: ContractRegistry
+    :param journal: Journal of the contract, if already opened. Takes
+        precedence over journal_folder.
+    :type journal: ContractJournal
     :return: the execution details.
     """
     kwargs = inflate_cli_arguments(flat_kwargs)
     last_exec_info = ExecutionInfo.from_file(last_exec_path)
+    if journal is None:
+        journal = _open_journal(journal_folder, contract_name)
     return invoke(bin_folder, interface_folder, last_exec_info,
-                  contract_name, endpoint, kwargs).to_dict()
+                  contract_name, endpoint, kwargs, registry,
+                  journal).to_dict()
 
 
-def _parse_args():
-    """Loads the arguments from the command line."""
+def invoke_batch_cli(bin_folder, interface_folder, last_exec_path,
+                     contract_name, ndjson_lines, journal_folder=None,
+                     registry=None, journal=None):
+    """Invoke several endpoints of a contract in a row, with calls coming from
+    NDJSON lines.
+
+    Each line is a JSON object with an "endpoint" name and an optional
+    "kwargs" object mapping arguments names to their values.
+
+    :param bin_folder: Path to the folder containing contract compiled scripts.
+    :type bin_folder: str
+    :param interface_folder: Path to the folder containing contract interfaces.
+    :type interface_folder: str
+    :param last_exec_path: Path to the last execution, if any.
+    :type last_exec_path: str
+    :param contract_name: Name of the contract to execute.
+    :type contract_name: str
+    :param ndjson_lines: The lines describing the calls.
+    :type ndjson_lines: collections.Iterable[str]
+    :param journal_folder: Folder of the contracts journals, if any.
+    :type journal_folder: str
+    :param registry: Optional registry to look the contract up in, instead of
+        the folders.
+    :type registry: ContractRegistry
+    :param journal: Journal of the contract, if already opened. Takes
+        precedence over journal_folder.
+    :type journal: ContractJournal
+    :return: the execution details of each call.
+    :rtype: list[dict]
+    """
+    calls = []
+    for line in ndjson_lines:
+        if not line.strip():
+            continue
+        call = json.loads(line)
+        kwargs = [
+            Variable(name, type(value), value)
+            for name, value in call.get('kwargs', {}).items()
+        ]
+        calls.append((call['endpoint'], kwargs))
+    last_exec_info = ExecutionInfo.from_file(last_exec_path)
+    if journal is None:
+        journal = _open_journal(journal_folder, contract_name)
+    return [
+        execution_info.to_dict()
+        for execution_info in invoke_batch(bin_folder, interface_folder,
+                                           last_exec_info, contract_name,
+                                           calls, registry, journal)
+    ]
+
+
+def _parse_args(argv=None):
+    """Loads the arguments from the command line.
+
+    :param argv: Arguments to load instead of the ones of the process.
+    :type argv: list[str]
+    """
+    from argparse import ArgumentParser
+
     parser = ArgumentParser(description='Pikcio Smart Contract Invoker')
     parser.add_argument("bin_folder", type=str,
                         help='folder where python binaries are stored.')
@@ -117,32 +323,50 @@ def _parse_args():
                         help='folder where contract interfaces are stored.')
     parser.add_argument("endpoint", type=str,
                         help='endpoint to call')
-    parser.add_argument("contract_name", type=str,
+    parser.add_argument("contract_name", type=str, nargs='?',
                         help='Name of contract to execute.')
     parser.add_argument("--kwargs", "-kw", dest="kwargs", nargs='*',
                         help='List of args names and values')
     parser.add_argument("--last_exec_path", '-le', type=str,
                         dest="last_exec_path", default='',
                         help='Path to the last execution, if any')
+    parser.add_argument("--journal", '-j', type=str, dest="journal_folder",
+                        help='Folder of the contracts journals. Storage is '
+                             'restored from the journal of the contract '
+                             'unless a last execution is given, and new '
+                             'executions are appended to it')
+    parser.add_argument("--batch", action='store_true',
+                        help='Read calls as NDJSON lines from stdin and '
+                             'execute them in a row')
     parser.add_argument("-i", "--indent", type=int,
                         help='If positive, prettify the output json with tabs')
     parser.add_argument("-o", "--output", type=str, dest='output',
                         help='Path to the output file to create')
-    known_args, _ = parser.parse_known_args()
+    known_args, _ = parser.parse_known_args(argv)
     return (
         known_args.bin_folder, known_args.interface_folder,
         known_args.last_exec_path, known_args.endpoint,
-        known_args.contract_name, known_args.kwargs, known_args.indent,
+        known_args.contract_name, known_args.kwargs,
+        known_args.journal_folder, known_args.batch, known_args.indent,
         known_args.output
     )
 
 
 if __name__ == '__main__':
+    import logging
+
     logging.basicConfig(level=logging.DEBUG,
                         format='%(asctime)s - %(levelname)s - %(message)s')
-    args = _parse_args()
-    output_path = args[-1]
-    json_result = json.dumps(invoke_cli(*args[:-2]), indent=args[-2])
+    (bin_folder, interface_folder, last_exec_path, contract_name, endpoint,
+     kwargs, journal_folder, batch, indent, output_path) = _parse_args()
+    if batch:
+        result = invoke_batch_cli(bin_folder, interface_folder,
+                                  last_exec_path, contract_name, sys.stdin,
+                                  journal_folder)
+    else:
+        result = invoke_cli(bin_folder, interface_folder, last_exec_path,
+                            contract_name, endpoint, kwargs, journal_folder)
+    json_result = json.dumps(result, indent=indent)
 
     if output_path:
         with open(output_path, 'w') as outfile:
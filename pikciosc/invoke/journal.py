@@ -0,0 +1,199 @@
+"""This module keeps an append-only journal of the executions of a contract.
+
+Each contract has two files in the journal folder:
+
+- `<contract>.journal` holds one JSON execution per line, in the order of
+  their sequence numbers. Most executions are stored in their delta form. One
+  every `snapshot_interval` executions is stored with full storage states.
+- `<contract>.index` holds one fixed size record per execution: offset and
+  length of the execution in the journal, and sequence number of the closest
+  previous snapshot. Any execution is found in O(1) from its sequence number
+  and the storage state after it is rebuilt by replaying at most
+  `snapshot_interval - 1` deltas.
+
+A failed execution does not alter the storage state of the contract.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+
+from pikciosc.models import ExecutionInfo
+
+_INDEX_RECORD = struct.Struct('>QIQ')
+"""Offset and length of an execution, sequence number of its snapshot."""
+
+
+def _state_after(execution_info):
+    """Gets the storage state left by a full execution.
+
+    :type execution_info: ExecutionInfo
+    :rtype: list[Variable]
+    """
+    return (
+        execution_info.storage_after if execution_info.is_success else
+        execution_info.storage_before
+    )
+
+
+class ContractJournal(object):
+    """Append-only journal of the executions of a single contract."""
+
+    def __init__(self, folder, contract_name, snapshot_interval=100):
+        """Opens the journal of a contract, creating it if necessary.
+
+        :param folder: Folder where journals are stored.
+        :type folder: str
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :param snapshot_interval: Number of executions between two snapshots.
+        :type snapshot_interval: int
+        """
+        if snapshot_interval < 1:
+            raise ValueError('Snapshot interval must be positive.')
+        self.contract_name = contract_name
+        self.snapshot_interval = snapshot_interval
+        self.journal_path = os.path.join(folder, f'{contract_name}.journal')
+        self.index_path = os.path.join(folder, f'{contract_name}.index')
+        os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._journal_out = open(self.journal_path, 'ab')
+        self._index_out = open(self.index_path, 'ab')
+        self._journal_in = open(self.journal_path, 'rb')
+        self._index_in = open(self.index_path, 'rb')
+        self._index_map = None
+        self._state_cache = None
+
+    def __len__(self):
+        """Gets the number of executions in the journal."""
+        return os.fstat(self._index_in.fileno()).st_size // _INDEX_RECORD.size
+
+    @property
+    def last_seq(self):
+        """Sequence number of the last execution, or None if empty."""
+        count = len(self)
+        return count - 1 if count else None
+
+    def _index_entry(self, seq):
+        """Reads the index record of an execution from the mapped index.
+
+        :param seq: Sequence number of the execution.
+        :type seq: int
+        :return: Offset, length and snapshot sequence number.
+        :rtype: tuple[int,int,int]
+        """
+        if not 0 <= seq < len(self):
+            raise IndexError(f"No execution {seq} in the journal of "
+                             f"'{self.contract_name}'.")
+        end = (seq + 1) * _INDEX_RECORD.size
+        if self._index_map is None or len(self._index_map) < end:
+            if self._index_map is not None:
+                self._index_map.close()
+            self._index_map = mmap.mmap(self._index_in.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+        return _INDEX_RECORD.unpack_from(self._index_map,
+                                         seq * _INDEX_RECORD.size)
+
+    def _read_raw(self, seq):
+        """Reads an execution as it is stored in the journal.
+
+        :param seq: Sequence number of the execution.
+        :type seq: int
+        :return: The execution, maybe in its delta form.
+        :rtype: ExecutionInfo
+        """
+        offset, length, _ = self._index_entry(seq)
+        self._journal_in.seek(offset)
+        return ExecutionInfo.from_dict(
+            json.loads(self._journal_in.read(length).decode()))
+
+    def get_state(self, seq=None):
+        """Gets the storage state of the contract after an execution.
+
+        :param seq: Sequence number of the execution. Defaults to the last
+            one.
+        :type seq: int
+        :return: The storage state, or None if the journal is empty.
+        :rtype: list[Variable]
+        """
+        with self._lock:
+            seq = self.last_seq if seq is None else seq
+            if seq is None:
+                return None
+            if self._state_cache and self._state_cache[0] == seq:
+                return self._state_cache[1]
+
+            _, _, snapshot_seq = self._index_entry(seq)
+            state = _state_after(self._read_raw(snapshot_seq))
+            for replayed_seq in range(snapshot_seq + 1, seq + 1):
+                execution_info = self._read_raw(replayed_seq)
+                if execution_info.is_success:
+                    state = execution_info.materialise(state).storage_after
+            if seq == self.last_seq:
+                self._state_cache = (seq, state)
+            return state
+
+    def read(self, seq=None):
+        """Reads an execution and rebuilds its full storage states.
+
+        The storage after a failed execution is the one it started from.
+
+        :param seq: Sequence number of the execution. Defaults to the last
+            one.
+        :type seq: int
+        :return: The execution, or None if the journal is empty.
+        :rtype: ExecutionInfo
+        """
+        with self._lock:
+            seq = self.last_seq if seq is None else seq
+            if seq is None:
+                return None
+            execution_info = self._read_raw(seq)
+            if execution_info.storage_before is None:
+                execution_info.materialise(self.get_state(seq - 1))
+            if not execution_info.is_success:
+                execution_info.storage_after = execution_info.storage_before
+            return execution_info
+
+    def append(self, execution_info):
+        """Appends an execution to the journal.
+
+        :param execution_info: The execution to append, with its full
+            storage states.
+        :type execution_info: ExecutionInfo
+        :return: The sequence number of the appended execution.
+        :rtype: int
+        """
+        with self._lock:
+            seq = len(self)
+            is_snapshot = seq % self.snapshot_interval == 0
+            snapshot_seq = (
+                seq if is_snapshot else self._index_entry(seq - 1)[2]
+            )
+            payload = json.dumps(
+                execution_info.to_dict(delta=not is_snapshot),
+                separators=(',', ':')
+            ).encode()
+
+            offset = self._journal_out.tell()
+            self._journal_out.write(payload + b'\n')
+            self._journal_out.flush()
+            # The index is written last so that it never points to missing
+            # data.
+            self._index_out.write(
+                _INDEX_RECORD.pack(offset, len(payload), snapshot_seq))
+            self._index_out.flush()
+
+            self._state_cache = (seq, _state_after(execution_info))
+            return seq
+
+    def close(self):
+        """Closes the journal files."""
+        with self._lock:
+            if self._index_map is not None:
+                self._index_map.close()
+            for fd in (self._journal_out, self._index_out, self._journal_in,
+                       self._index_in):
+                fd.close()
@@ -0,0 +1,258 @@
+"""This module enforces per-call limits on the resources used by contracts.
+
+Three limits are supported, each configured through an environment variable:
+- wall time (PKC_SC_WALL_TIME_LIMIT, in seconds), enforced with SIGALRM.
+- CPU time (PKC_SC_CPU_TIME_LIMIT, in seconds), enforced with SIGPROF.
+- address space (PKC_SC_MEMORY_LIMIT, in bytes), enforced with RLIMIT_AS.
+  The limit is the address space a call can add to the process.
+
+Limits are enforced inside the process running the call, as long as it runs
+on the main thread. Other threads, such as the ones of the scheduler or of the
+daemon running contracts without sandbox, can't enforce them: a warning is
+logged instead. Signals are only handled between two bytecode
+instructions, so sandboxes also enforce them from the outside: the host stops
+waiting for a worker after the wall time limit, and a worker started with
+`kill_on_breach` is killed by SIGXCPU if it keeps running past its limits.
+"""
+import logging
+import math
+import os
+import resource
+import signal
+import threading
+
+from pikciosc.models import CallInfo, ExecutionInfo, SuccessInfo, \
+    ERROR_CATEGORY_LIMIT
+
+ENV_PKC_SC_WALL_TIME_LIMIT = 'PKC_SC_WALL_TIME_LIMIT'
+ENV_PKC_SC_CPU_TIME_LIMIT = 'PKC_SC_CPU_TIME_LIMIT'
+ENV_PKC_SC_MEMORY_LIMIT = 'PKC_SC_MEMORY_LIMIT'
+
+LIMITS_ENV_VARS = (
+    ENV_PKC_SC_WALL_TIME_LIMIT, ENV_PKC_SC_CPU_TIME_LIMIT,
+    ENV_PKC_SC_MEMORY_LIMIT
+)
+"""Environment variables configuring the limits, to forward to workers."""
+
+
+class LimitExceededError(BaseException):
+    """Raised inside a call exceeding one of its limits.
+
+    Like KeyboardInterrupt, it does not inherit from Exception so that the
+    contract code does not catch it by mistake.
+    """
+
+
+class WallTimeExceededError(LimitExceededError):
+    """Raised when a call runs longer than its wall time limit."""
+
+    def __init__(self, wall_time):
+        super().__init__(f'Wall time limit of {wall_time}s exceeded.')
+
+
+class CpuTimeExceededError(LimitExceededError):
+    """Raised when a call uses more CPU time than its limit."""
+
+    def __init__(self, cpu_time):
+        super().__init__(f'CPU time limit of {cpu_time}s exceeded.')
+
+
+class SandboxKilledError(LimitExceededError):
+    """Raised by hosts when a sandbox has been killed for exceeding its
+    limits."""
+
+    def __init__(self):
+        super().__init__('Limits exceeded, the sandbox has been killed.')
+
+
+def _float_env(env_var):
+    """Reads an optional number from an environment variable.
+
+    :rtype: float|None
+    """
+    raw_value = os.environ.get(env_var)
+    return float(raw_value) if raw_value else None
+
+
+def _address_space():
+    """Gets the current address space of the process, in bytes.
+
+    :return: The address space, or 0 if it cannot be read on this platform.
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as fd:
+            return int(fd.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ExecutionLimits(object):
+    """Limits applied to the calls run while the object is active, as a
+    context manager:
+
+        with ExecutionLimits(wall_time=2.0):
+            module.endpoint()
+
+    Entering the context again restarts the limits from scratch.
+    """
+
+    def __init__(self, wall_time=None, cpu_time=None, memory=None,
+                 kill_on_breach=False):
+        """Creates a new ExecutionLimits. Unset limits are not enforced.
+
+        :param wall_time: Maximum duration of a call, in seconds.
+        :type wall_time: float
+        :param cpu_time: Maximum CPU time of a call, in seconds.
+        :type cpu_time: float
+        :param memory: Maximum address space a call can allocate, in bytes.
+        :type memory: int
+        :param kill_on_breach: If True, the process is killed by SIGXCPU when
+            it keeps running after exceeding its CPU or wall time limit. Only
+            meant for sandbox processes.
+        :type kill_on_breach: bool
+        """
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.memory = memory
+        self.kill_on_breach = kill_on_breach
+        self._restore = []
+
+    @classmethod
+    def from_env(cls, kill_on_breach=False):
+        """Creates limits from the PKC_SC_*_LIMIT environment variables.
+
+        :param kill_on_breach: See __init__.
+        :type kill_on_breach: bool
+        :rtype: ExecutionLimits
+        """
+        memory = _float_env(ENV_PKC_SC_MEMORY_LIMIT)
+        return cls(
+            _float_env(ENV_PKC_SC_WALL_TIME_LIMIT),
+            _float_env(ENV_PKC_SC_CPU_TIME_LIMIT),
+            int(memory) if memory else None,
+            kill_on_breach
+        )
+
+    @property
+    def is_limited(self):
+        """Tells if at least one limit is set."""
+        return any(limit is not None for limit in (
+            self.wall_time, self.cpu_time, self.memory))
+
+    @property
+    def max_time(self):
+        """Gets the lowest time limit, either CPU or wall time, if any.
+
+        :rtype: float|None
+        """
+        time_limits = [limit for limit in (self.wall_time, self.cpu_time)
+                       if limit is not None]
+        return min(time_limits) if time_limits else None
+
+    def host_timeout(self, calls=1, grace=1.0):
+        """Computes how long a host should wait for a sandbox running some
+        calls under these limits.
+
+        :param calls: Number of calls run by the sandbox.
+        :type calls: int
+        :param grace: Extra delay given to the sandbox, in seconds.
+        :type grace: float
+        :return: The delay in seconds, or None to wait forever.
+        :rtype: float|None
+        """
+        if self.wall_time is None:
+            return None
+        return self.wall_time * max(calls, 1) + grace
+
+    def __enter__(self):
+        if not self.is_limited:
+            return self
+        if threading.current_thread() is not threading.main_thread():
+            _warn_unenforced()
+            return self
+
+        if self.wall_time is not None:
+            self._arm_timer(signal.ITIMER_REAL, signal.SIGALRM,
+                            self.wall_time, WallTimeExceededError)
+        if self.cpu_time is not None:
+            self._arm_timer(signal.ITIMER_PROF, signal.SIGPROF,
+                            self.cpu_time, CpuTimeExceededError)
+        if self.kill_on_breach and self.max_time is not None:
+            # A call can't use more CPU time than wall time.
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = usage.ru_utime + usage.ru_stime
+            self._set_rlimit(resource.RLIMIT_CPU,
+                             math.ceil(used + self.max_time) + 1)
+        if self.memory is not None:
+            self._set_rlimit(resource.RLIMIT_AS,
+                             _address_space() + self.memory)
+        return self
+
+    def __exit__(self, *_):
+        # Settings are restored in the reverse order of their setup.
+        while self._restore:
+            self._restore.pop()()
+        return False
+
+    def _arm_timer(self, timer, signum, delay, error_type):
+        """Raises an error of provided type in the main thread once the timer
+        expires.
+        """
+        def on_expiry(*_):
+            raise error_type(delay)
+
+        previous_handler = signal.signal(signum, on_expiry)
+        signal.setitimer(timer, delay)
+
+        def restore():
+            signal.setitimer(timer, 0)
+            signal.signal(signum, previous_handler)
+        self._restore.append(restore)
+
+    def _set_rlimit(self, rlimit, soft_limit):
+        """Lowers the soft value of a resource limit until the context
+        exits.
+        """
+        soft, hard = resource.getrlimit(rlimit)
+        if hard != resource.RLIM_INFINITY:
+            soft_limit = min(soft_limit, hard)
+        resource.setrlimit(rlimit, (soft_limit, hard))
+        self._restore.append(
+            lambda: resource.setrlimit(rlimit, (soft, hard)))
+
+
+_UNENFORCED_WARNED = False
+
+
+def _warn_unenforced():
+    """Warns, once per process, that limits are not enforced on the current
+    thread."""
+    global _UNENFORCED_WARNED
+    if not _UNENFORCED_WARNED:
+        _UNENFORCED_WARNED = True
+        logging.warning('Execution limits are not enforced for calls run out '
+                        'of the main thread. Use a sandbox to enforce them.')
+
+
+def limit_exceeded_executions(storage_vars, calls, error):
+    """Creates the failed executions of calls stopped from outside of their
+    sandbox for exceeding their limits. Storage is left unchanged.
+
+    :param storage_vars: The storage vars the calls started from.
+    :type storage_vars: list[Variable]
+    :param calls: Ordered couples of endpoint names and named arguments.
+    :type calls: list[tuple[str,list[Variable]]]
+    :param error: Description of the breach.
+    :type error: str
+    :rtype: list[ExecutionInfo]
+    """
+    return [
+        ExecutionInfo(
+            storage_vars,
+            CallInfo(endpoint, kwargs, success_info=SuccessInfo(
+                error, ERROR_CATEGORY_LIMIT)),
+            storage_after=storage_vars, storage_delta=[]
+        )
+        for endpoint, kwargs in calls
+    ]
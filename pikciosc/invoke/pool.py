@@ -0,0 +1,423 @@
+"""This module maintains pools of warm sandbox workers.
+
+Starting a container for each call dominates invocation latency. A pool keeps
+several workers alive and hands jobs to them over their standard streams.
+Workers are recycled after a given number of calls or as soon as something
+goes wrong with them.
+"""
+import atexit
+import logging
+import os
+import queue
+import select
+import signal
+import subprocess
+import threading
+import time
+import uuid
+
+from pikciosc.invoke.limits import ExecutionLimits, SandboxKilledError, \
+    WallTimeExceededError, limit_exceeded_executions
+from pikciosc.invoke.protocol import decode_response, encode_job, \
+    read_frame, write_frame, WorkerError
+from pikciosc.invoke.runner import DockerRunner, LocalRunner
+from pikciosc.invoke.worker import OP_EXECUTE, OP_EXECUTE_BATCH, OP_PING
+from pikciosc.models import ExecutionInfo
+
+ENV_SANDBOX_POOL_SIZE = 'SANDBOX_POOL_SIZE'
+ENV_SANDBOX_POOL_MAX_CALLS = 'SANDBOX_POOL_MAX_CALLS'
+ENV_SANDBOX_POOL_RUNNER = 'SANDBOX_POOL_RUNNER'
+ENV_SANDBOX_POOL_ACQUIRE_TIMEOUT = 'SANDBOX_POOL_ACQUIRE_TIMEOUT'
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+class _DeadlineReader(object):
+    """Reads a file descriptor until a deadline.
+
+    Reads bypass any buffer, so that select tells if data is available.
+    """
+
+    def __init__(self, fd, timeout=None):
+        """Creates a new _DeadlineReader.
+
+        :param fd: The file descriptor to read from.
+        :type fd: int
+        :param timeout: Number of seconds after which reads fail. None waits
+            forever.
+        :type timeout: float
+        """
+        self.fd = fd
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+    def read(self, size):
+        """Reads at most size bytes, as soon as some are available.
+
+        :return: The bytes read, empty at the end of the stream.
+        :rtype: bytes
+        :raise WallTimeExceededError: If nothing could be read before the
+            deadline.
+        """
+        if self.deadline is not None:
+            delay = self.deadline - time.monotonic()
+            if delay <= 0 or not select.select([self.fd], [], [], delay)[0]:
+                raise WallTimeExceededError(self.timeout)
+        return os.read(self.fd, size)
+
+
+class _Worker(object):
+    """Handle on a single running worker process."""
+
+    def __init__(self, runner):
+        """Starts a new worker using provided runner.
+
+        :param runner: The runner used to start the worker.
+        :type runner: WorkerRunner
+        """
+        self.runner = runner
+        self.name = f'pikciosc-worker-{uuid.uuid4().hex[:12]}'
+        self.calls = 0
+        self.last_used = time.monotonic()
+        self._process = subprocess.Popen(
+            runner.command(self.name), env=runner.environ(),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    @property
+    def is_alive(self):
+        """Tells if the worker process is still running."""
+        return self._process.poll() is None
+
+    def request(self, job, timeout=None):
+        """Sends a job to the worker and waits for its result.
+
+        :param job: The job to send.
+        :type job: dict
+        :param timeout: Optional number of seconds to wait for the whole
+            result.
+        :type timeout: float
+        :return: The job result.
+        :raise WallTimeExceededError: If the worker did not answer in time.
+        """
+        self.last_used = time.monotonic()
+        try:
+            write_frame(self._process.stdin, encode_job(job))
+            self._process.stdin.flush()
+        except OSError as e:
+            raise WorkerError(f"Worker '{self.name}' is unreachable: {e}")
+
+        return decode_response(read_frame(
+            _DeadlineReader(self._process.stdout.fileno(), timeout)))
+
+    def ping(self, timeout):
+        """Tells if the worker answers a health check in time.
+
+        :param timeout: Number of seconds to wait for the answer.
+        :type timeout: float
+        :rtype: bool
+        """
+        try:
+            self.request({'op': OP_PING}, timeout)
+            return True
+        except (WorkerError, WallTimeExceededError):
+            return False
+
+    def was_killed_by(self, signum, timeout=1.0):
+        """Tells if the worker process has been killed by provided signal.
+
+        :param signum: The signal to check.
+        :type signum: int
+        :param timeout: Number of seconds to wait for the process to exit.
+        :type timeout: float
+        :rtype: bool
+        """
+        try:
+            return self._process.wait(timeout) == -signum
+        except subprocess.TimeoutExpired:
+            return False
+
+    def close(self, timeout=5.0):
+        """Stops the worker, killing it if it does not exit by itself.
+
+        :param timeout: Number of seconds to wait for a clean exit.
+        :type timeout: float
+        """
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+            self._process.wait()
+        finally:
+            self._process.stdout.close()
+            self.runner.kill(self.name)
+
+
+class _DeadWorker(object):
+    """Placeholder of a worker which could not be started.
+
+    It holds the slot of the worker in the pool, so that starting a worker is
+    tried again the next time the slot is acquired.
+    """
+
+    is_alive = False
+
+    def __init__(self, error):
+        """Creates a new _DeadWorker.
+
+        :param error: The error raised while starting the worker.
+        :type error: Exception
+        """
+        self.name = 'dead worker'
+        self.error = error
+        self.calls = 0
+        self.last_used = time.monotonic()
+
+    def ping(self, _timeout):
+        return False
+
+    def close(self, timeout=None):
+        pass
+
+
+class SandboxPool(object):
+    """Pool of pre-started workers executing contracts."""
+
+    def __init__(self, runner, size=2, max_calls=100, health_check_delay=30.0,
+                 health_check_timeout=5.0, acquire_timeout=60.0):
+        """Creates a new pool and starts its workers.
+
+        :param runner: Runner used to start the workers.
+        :type runner: WorkerRunner
+        :param size: Number of workers kept alive.
+        :type size: int
+        :param max_calls: Number of calls after which a worker is recycled.
+        :type max_calls: int
+        :param health_check_delay: Idle duration, in seconds, after which a
+            worker is checked before being handed a job.
+        :type health_check_delay: float
+        :param health_check_timeout: Delay, in seconds, given to a worker to
+            answer a health check.
+        :type health_check_timeout: float
+        :param acquire_timeout: Maximum delay, in seconds, to wait for an
+            idle worker. None waits forever.
+        :type acquire_timeout: float
+        """
+        if size < 1:
+            raise ValueError('A sandbox pool needs at least one worker.')
+        self.runner = runner
+        self.size = size
+        self.max_calls = max_calls
+        self.health_check_delay = health_check_delay
+        self.health_check_timeout = health_check_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        """Starts a new worker.
+
+        :return: The new worker, or a _DeadWorker if it could not be started.
+        :rtype: _Worker|_DeadWorker
+        """
+        try:
+            return _Worker(self.runner)
+        except Exception as e:
+            logging.warning(f'Could not start a sandbox worker: {e}')
+            return _DeadWorker(e)
+
+    def _replace(self, worker):
+        """Stops provided worker and starts a new one in its place.
+
+        :param worker: The worker to recycle.
+        :type worker: _Worker
+        :return: The new worker, or a _DeadWorker if it could not be started.
+        :rtype: _Worker|_DeadWorker
+        """
+        logging.debug(f'Recycling sandbox worker {worker.name}.')
+        worker.close()
+        return self._start_worker()
+
+    def _acquire(self):
+        """Takes an idle and healthy worker, waiting for one if necessary.
+
+        :rtype: _Worker
+        :raise WorkerError: If no worker is idle after acquire_timeout, or if
+            no healthy worker can be started.
+        """
+        if self._closed:
+            raise RuntimeError('Sandbox pool is closed.')
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise WorkerError(f'No sandbox worker available after '
+                              f'{self.acquire_timeout}s.')
+        idle_time = time.monotonic() - worker.last_used
+        if not worker.is_alive or (
+                idle_time > self.health_check_delay and
+                not worker.ping(self.health_check_timeout)):
+            worker = self._replace(worker)
+        if isinstance(worker, _DeadWorker):
+            self._idle.put(worker)
+            raise WorkerError(
+                f'Could not start a sandbox worker: {worker.error}')
+        return worker
+
+    def _release(self, worker, recycle=False):
+        """Hands a worker back to the pool once its job is over.
+
+        :param worker: The worker to release.
+        :type worker: _Worker
+        :param recycle: Forces the replacement of the worker.
+        :type recycle: bool
+        """
+        if self._closed:
+            worker.close()
+            return
+        if recycle or worker.calls >= self.max_calls:
+            worker = self._replace(worker)
+        self._idle.put(worker)
+
+    def check_health(self):
+        """Pings every idle worker and replaces the ones not answering."""
+        for _ in range(self._idle.qsize()):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if not worker.ping(self.health_check_timeout):
+                worker = self._replace(worker)
+            self._idle.put(worker)
+
+    def execute(self, script_path, storage_vars, endpoint, kwargs):
+        """Executes an endpoint in one of the pool workers.
+
+        :param script_path: Full path to the script to execute.
+        :type script_path: str
+        :param storage_vars: The list of storage vars to restore.
+        :type storage_vars: list[Variable]
+        :param endpoint: Name of endpoint to execute.
+        :type endpoint: str
+        :param kwargs: List of named arguments to pass to the endpoint.
+        :type kwargs: list[Variable]
+        :return: The resulting execution info.
+        :rtype: ExecutionInfo
+        """
+        return self._run({
+            'op': OP_EXECUTE,
+            'script': self.runner.script_path(script_path),
+            'storage': storage_vars,
+            'endpoint': endpoint,
+            'kwargs': kwargs,
+        })[0]
+
+    def execute_batch(self, script_path, storage_vars, calls):
+        """Executes several endpoints in a row in one of the pool workers.
+
+        :param script_path: Full path to the script to execute.
+        :type script_path: str
+        :param storage_vars: The list of storage vars to restore before the
+            first call.
+        :type storage_vars: list[Variable]
+        :param calls: Ordered couples of endpoint names and named arguments.
+        :type calls: list[tuple[str,list[Variable]]]
+        :return: The resulting execution info of each call.
+        :rtype: list[ExecutionInfo]
+        """
+        return self._run({
+            'op': OP_EXECUTE_BATCH,
+            'script': self.runner.script_path(script_path),
+            'storage': storage_vars,
+            'calls': calls,
+        })
+
+    def _run(self, job):
+        """Sends an execution job to a worker and collects its executions.
+
+        :param job: The job to run.
+        :type job: dict
+        :return: The resulting execution info, one per executed call.
+        :rtype: list[ExecutionInfo]
+        """
+        calls = job.get('calls') or [(job['endpoint'], job['kwargs'])]
+        limits = ExecutionLimits.from_env()
+        worker = self._acquire()
+        try:
+            worker.calls += 1
+            result = worker.request(job, limits.host_timeout(len(calls)))
+            executions = ExecutionInfo.from_dicts(
+                result if isinstance(result, list) else [result],
+                job['storage'])
+        except WallTimeExceededError:
+            worker.close(timeout=0)
+            self._release(worker, recycle=True)
+            return limit_exceeded_executions(
+                job['storage'], calls, str(WallTimeExceededError(
+                    limits.wall_time)))
+        except WorkerError:
+            killed_by_limit = (limits.max_time is not None and
+                               worker.was_killed_by(signal.SIGXCPU))
+            self._release(worker, recycle=True)
+            if killed_by_limit:
+                return limit_exceeded_executions(
+                    job['storage'], calls,
+                    str(SandboxKilledError()))
+            raise
+        except Exception:
+            self._release(worker, recycle=True)
+            raise
+        recycle = not all(info.is_success for info in executions)
+        self._release(worker, recycle)
+        return executions
+
+    def close(self):
+        """Stops all the idle workers. Busy ones stop once released."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def get_pool(script_dir):
+    """Gets the shared pool serving scripts from provided folder, creating it
+    if necessary.
+
+    Pool configuration is read from the environment variables
+    SANDBOX_POOL_SIZE, SANDBOX_POOL_MAX_CALLS, SANDBOX_POOL_ACQUIRE_TIMEOUT
+    and SANDBOX_POOL_RUNNER (either 'docker', the default, or 'local').
+
+    :param script_dir: Folder containing the scripts to execute.
+    :type script_dir: str
+    :rtype: SandboxPool
+    """
+    script_dir = os.path.abspath(script_dir)
+    with _POOLS_LOCK:
+        if script_dir not in _POOLS:
+            runner_name = os.environ.get(ENV_SANDBOX_POOL_RUNNER, 'docker')
+            runner = (
+                LocalRunner() if runner_name.lower() == 'local' else
+                DockerRunner(script_dir)
+            )
+            _POOLS[script_dir] = SandboxPool(
+                runner,
+                int(os.environ.get(ENV_SANDBOX_POOL_SIZE, 2)),
+                int(os.environ.get(ENV_SANDBOX_POOL_MAX_CALLS, 100)),
+                acquire_timeout=float(
+                    os.environ.get(ENV_SANDBOX_POOL_ACQUIRE_TIMEOUT, 60)),
+            )
+        return _POOLS[script_dir]
+
+
+@atexit.register
+def close_pools():
+    """Stops all the shared pools."""
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
@@ -0,0 +1,141 @@
+"""This module defines the binary protocol spoken between invokers and
+sandbox workers.
+
+Messages are exchanged as frames: a 4 bytes big-endian payload length followed
+by the payload itself. Jobs are pickled, as they come from the trusted
+invoker. Responses are compact JSON, as they come out of the sandbox and must
+never be unpickled by the invoker.
+"""
+import io
+import json
+import pickle
+import struct
+
+_HEADER = struct.Struct('>I')
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker fails to answer a job properly."""
+
+
+def write_frame(stream, payload):
+    """Writes a frame holding provided payload. The stream is not flushed.
+
+    :param stream: Binary stream to write to.
+    :param payload: The payload of the frame.
+    :type payload: bytes
+    """
+    stream.write(_HEADER.pack(len(payload)))
+    stream.write(payload)
+
+
+def _read_exactly(stream, size):
+    """Reads exactly size bytes from provided stream.
+
+    :return: The bytes read, or an empty bytes string if the stream was at its
+        end from the start.
+    :rtype: bytes
+    """
+    data = stream.read(size)
+    if data and len(data) < size:
+        chunks = [data]
+        while size > len(data):
+            chunk = stream.read(size - len(data))
+            if not chunk:
+                raise WorkerError('Truncated frame.')
+            chunks.append(chunk)
+            data = b''.join(chunks)
+    return data
+
+
+def read_frame(stream):
+    """Reads the next frame from provided stream.
+
+    :param stream: Binary stream to read from.
+    :return: The payload of the frame, or None if the stream has ended.
+    :rtype: bytes
+    """
+    header = _read_exactly(stream, _HEADER.size)
+    if not header:
+        return None
+    size, = _HEADER.unpack(header)
+    payload = _read_exactly(stream, size)
+    if len(payload) < size:
+        raise WorkerError('Truncated frame.')
+    return payload
+
+
+def pack_frame(payload):
+    """Creates a frame holding provided payload.
+
+    :param payload: The payload of the frame.
+    :type payload: bytes
+    :return: The whole frame.
+    :rtype: bytes
+    """
+    return _HEADER.pack(len(payload)) + payload
+
+
+def unpack_frame(data):
+    """Extracts the payload of the frame at the beginning of provided data.
+
+    :param data: Bytes starting with a frame.
+    :type data: bytes
+    :return: The payload of the frame, or None if data is empty.
+    :rtype: bytes
+    """
+    return read_frame(io.BytesIO(data))
+
+
+def encode_job(job):
+    """Encodes a job to send to a worker.
+
+    :param job: The job to encode.
+    :type job: dict
+    :rtype: bytes
+    """
+    return pickle.dumps(job, pickle.HIGHEST_PROTOCOL)
+
+
+def decode_job(payload):
+    """Decodes a job received by a worker.
+
+    :param payload: The encoded job.
+    :type payload: bytes
+    :rtype: dict
+    """
+    return pickle.loads(payload)
+
+
+def encode_response(status, value):
+    """Encodes a worker response.
+
+    :param status: Either STATUS_OK or STATUS_ERROR.
+    :type status: str
+    :param value: The result of the job if it succeeded, or the error message.
+        Must be JSON serialisable.
+    :rtype: bytes
+    """
+    return json.dumps([status, value], separators=(',', ':')).encode()
+
+
+def decode_response(payload):
+    """Decodes a worker response.
+
+    :param payload: The encoded response, as returned by encode_response.
+    :type payload: bytes
+    :return: The result of the job.
+    :raise WorkerError: If the worker reported an error.
+    """
+    if payload is None:
+        raise WorkerError('Worker closed the channel without answering.')
+    try:
+        status, value = json.loads(payload.decode())
+    except ValueError:
+        raise WorkerError(f'Invalid worker response: {payload[:256]}')
+    if status != STATUS_OK:
+        raise WorkerError(value)
+    return value
@@ -0,0 +1,168 @@
+"""This module keeps an in-memory index of the contracts available for
+invocation.
+
+Looking for a contract script and parsing its interface on each invocation
+is costly. A registry indexes the binaries and interfaces folders once and
+keeps parsed interfaces in memory. Changes on disk are detected by polling
+the modification time of the folders and of the loaded files.
+"""
+import os
+import threading
+import time
+
+from pikciosc.models import ContractInterface
+
+_SCRIPT_EXTENSIONS = ('pyc', 'py')
+"""Supported script extensions, by order of preference."""
+
+
+class ContractRegistry(object):
+    """Index of contract scripts and interfaces."""
+
+    def __init__(self, bin_folder, interface_folder, poll_interval=1.0,
+                 store=None):
+        """Creates a new ContractRegistry and indexes provided folders.
+
+        :param bin_folder: Path to the folder containing contract compiled
+            scripts.
+        :type bin_folder: str
+        :param interface_folder: Path to the folder containing contract
+            interfaces.
+        :type interface_folder: str
+        :param poll_interval: Minimum delay, in seconds, between two checks
+            for changes on disk. 0 checks on every lookup.
+        :type poll_interval: float
+        :param store: Optional artifact store, looked up before the binaries
+            folder.
+        :type store: ArtifactStore
+        """
+        self.bin_folder = bin_folder
+        self.store = store
+        self.interface_folder = interface_folder
+        self.poll_interval = poll_interval
+        self._lock = threading.RLock()
+        self._scripts = {}
+        self._interfaces = {}
+        self._folders_stamp = None
+        self._last_poll = None
+        self.refresh()
+
+    @staticmethod
+    def _stamp(path):
+        """Gets a value changing each time provided path is modified.
+
+        :param path: Path to a file or a folder.
+        :type path: str
+        :return: The stamp, or None if the path does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _index_scripts(self):
+        """Lists the scripts of the binaries folder.
+
+        :return: A dictionary mapping contract names to script paths.
+        :rtype: dict[str,str]
+        """
+        scripts = {}
+        try:
+            file_names = os.listdir(self.bin_folder)
+        except FileNotFoundError:
+            return scripts
+        for ext in reversed(_SCRIPT_EXTENSIONS):
+            for file_name in file_names:
+                name, _, file_ext = file_name.rpartition('.')
+                if file_ext == ext:
+                    scripts[name] = os.path.join(self.bin_folder, file_name)
+        return scripts
+
+    def refresh(self):
+        """Indexes the folders again and drops outdated interfaces."""
+        with self._lock:
+            self._folders_stamp = (
+                self._stamp(self.bin_folder),
+                self._stamp(self.interface_folder),
+            )
+            self._scripts = self._index_scripts()
+            self._interfaces = {
+                name: (stamp, interface)
+                for name, (stamp, interface) in self._interfaces.items()
+                if stamp == self._stamp(self._interface_path(name))
+            }
+            self._last_poll = time.monotonic()
+
+    def _poll(self):
+        """Refreshes the registry if something changed on disk since last
+        check and if the poll interval has elapsed."""
+        with self._lock:
+            if time.monotonic() - self._last_poll < self.poll_interval:
+                return
+            folders_stamp = (
+                self._stamp(self.bin_folder),
+                self._stamp(self.interface_folder),
+            )
+            interfaces_changed = any(
+                stamp != self._stamp(self._interface_path(name))
+                for name, (stamp, _) in self._interfaces.items()
+            )
+            if folders_stamp != self._folders_stamp or interfaces_changed:
+                self.refresh()
+            self._last_poll = time.monotonic()
+
+    def _interface_path(self, contract_name):
+        """Gets the path to the interface file of a contract.
+
+        :param contract_name: Name of contract.
+        :type contract_name: str
+        :rtype: str
+        """
+        return os.path.join(self.interface_folder, f'{contract_name}.json')
+
+    @property
+    def contract_names(self):
+        """Gets the names of the contracts having a script."""
+        self._poll()
+        with self._lock:
+            names = tuple(self._scripts)
+        if self.store is None:
+            return names
+        return tuple(sorted(set(names) | set(self.store.contract_names)))
+
+    def find_script(self, contract_name):
+        """Finds the script to execute based on the contract name.
+
+        :param contract_name: Name of the contract to execute.
+        :type contract_name: str
+        :return: Path to the script to execute, or None if nothing found.
+        """
+        if self.store is not None:
+            script_path = self.store.find_script(contract_name)
+            if script_path:
+                return script_path
+        self._poll()
+        with self._lock:
+            return self._scripts.get(contract_name)
+
+    def get_interface(self, contract_name):
+        """Gets the interface of a contract, parsing it if not already done.
+
+        :param contract_name: Name of contract.
+        :type contract_name: str
+        :rtype: ContractInterface
+        """
+        self._poll()
+        with self._lock:
+            if contract_name in self._interfaces:
+                return self._interfaces[contract_name][1]
+
+            file_path = self._interface_path(contract_name)
+            stamp = self._stamp(file_path)
+            contract_interface = ContractInterface.from_file(file_path)
+            if not contract_interface:
+                raise FileNotFoundError(
+                    f"No interface for '{contract_name}'.")
+            self._interfaces[contract_name] = (stamp, contract_interface)
+            return contract_interface
@@ -0,0 +1,132 @@
+"""This module describes how sandbox worker processes are started.
+
+A runner builds the command line of a long-lived worker (see `worker.py`) and
+knows how to translate host script paths into paths visible by that worker.
+"""
+import os
+import subprocess
+import sys
+
+from pikciosc.invoke.gas import (
+    ENV_PKC_SC_GAS_GRANULARITY, ENV_PKC_SC_GAS_LIMIT
+)
+from pikciosc.invoke.limits import ExecutionLimits, LIMITS_ENV_VARS
+
+_CURRENT_DIR = os.path.dirname(__file__)
+_PICKIO_DIR = os.path.dirname(_CURRENT_DIR)
+
+_DOCKER_MEMORY_OVERHEAD = 128 * 1024 * 1024
+"""Memory given to containers on top of the calls memory limit, for the
+interpreter itself."""
+
+
+class WorkerRunner(object):
+    """Base class of objects starting sandbox workers."""
+
+    def command(self, name):
+        """Gets the command line starting a new worker.
+
+        :param name: Unique name given to the worker.
+        :type name: str
+        :rtype: list[str]
+        """
+        raise NotImplementedError()
+
+    def environ(self):
+        """Gets the environment variables the command must be run with.
+
+        :return: The environment, or None to inherit the current one.
+        :rtype: dict|None
+        """
+        return None
+
+    def script_path(self, script_path):
+        """Translates a host script path into a path seen by the worker.
+
+        :param script_path: Full path to the script on the host.
+        :type script_path: str
+        :rtype: str
+        """
+        return script_path
+
+    def kill(self, name):
+        """Makes sure the named worker and its resources are released.
+
+        :param name: Name of the worker to kill.
+        :type name: str
+        """
+
+
+class DockerRunner(WorkerRunner):
+    """Starts workers inside docker containers."""
+
+    def __init__(self, script_dir, image='python:3.6'):
+        """Creates a new DockerRunner.
+
+        :param script_dir: Host folder containing the scripts to execute,
+            possibly in sub-folders. It is mounted in each container.
+        :type script_dir: str
+        :param image: Docker image to run the workers in.
+        :type image: str
+        """
+        self.script_dir = os.path.abspath(script_dir)
+        self.image = image
+
+    def command(self, name):
+        memory_args = []
+        memory_limit = ExecutionLimits.from_env().memory
+        if memory_limit is not None:
+            # Hard cap of the container, in case the worker limits fail.
+            memory = memory_limit + _DOCKER_MEMORY_OVERHEAD
+            memory_args = ['--memory', str(memory),
+                           '--memory-swap', str(memory)]
+        forwarded_env_args = [
+            arg
+            for env_var in (ENV_PKC_SC_GAS_LIMIT, ENV_PKC_SC_GAS_GRANULARITY,
+                            *LIMITS_ENV_VARS)
+            for arg in ('-e', env_var)
+        ]
+        return [
+            'docker', 'run',
+            '-i', '--rm',
+            '--name', name,
+            *memory_args,
+            '-e', 'PYTHONPATH=.',                       # worker uses pikciosc
+            *forwarded_env_args,                        # gas and limits
+            '-v', f'{_PICKIO_DIR}:/usr/src/pikciosc',   # mount pikciosc
+            '-v', f'{self.script_dir}:/usr/src/scripts',  # mount scripts
+            '-w', '/usr/src',
+            self.image, 'python', '/usr/src/pikciosc/invoke/worker.py',
+        ]
+
+    def script_path(self, script_path):
+        relative_path = os.path.relpath(script_path, self.script_dir)
+        if relative_path.startswith(os.pardir):
+            raise ValueError(f"Script '{script_path}' is not in the mounted "
+                             f"folder '{self.script_dir}'.")
+        return '/usr/src/scripts/' + relative_path.replace(os.sep, '/')
+
+    def kill(self, name):
+        subprocess.call(['docker', 'rm', '-f', name],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class LocalRunner(WorkerRunner):
+    """Starts workers as plain local processes.
+
+    This runner offers no isolation at all. It is meant for tests and for
+    setups where docker is not available.
+    """
+
+    def command(self, name):
+        return [sys.executable, os.path.join(_CURRENT_DIR, 'worker.py')]
+
+    def environ(self):
+        env = dict(os.environ)
+        python_path = env.get('PYTHONPATH')
+        root_dir = os.path.dirname(_PICKIO_DIR)
+        env['PYTHONPATH'] = (
+            os.pathsep.join((root_dir, python_path)) if python_path else
+            root_dir
+        )
+        return env
@@ -1,17 +1,81 @@
 """This module encapsulates features to invoke the shell script in a sandbox.
 """
-import json
 import logging
 import os
+import signal
 import subprocess
-from tempfile import TemporaryFile
+import uuid
 
-from pikciosc.invoke import shell
-from pikciosc.invoke.utils import flatten_vars_for_cli, serialise_vars
+from pikciosc.invoke import forkserver, pool, shell
+from pikciosc.invoke.limits import ExecutionLimits, LimitExceededError, \
+    SandboxKilledError, WallTimeExceededError, limit_exceeded_executions
+from pikciosc.invoke.protocol import decode_response, encode_job, \
+    pack_frame, unpack_frame, WorkerError
+from pikciosc.invoke.runner import DockerRunner
+from pikciosc.invoke.worker import OP_EXECUTE, OP_EXECUTE_BATCH
 from pikciosc.models import ExecutionInfo
+from pikciosc.store import get_objects_folder
 
-_CURRENT_DIR = os.path.dirname(__file__)
-_PICKIO_DIR = os.path.dirname(_CURRENT_DIR)
+_DOCKER_START_DELAY = 10.0
+"""Delay, in seconds, given to a container to start on top of its calls wall
+time limit."""
+_KILLED_EXIT_CODES = (128 + signal.SIGKILL, 128 + signal.SIGXCPU)
+"""Exit codes of containers killed for exceeding their memory or CPU time."""
+
+
+def _get_pool_folder(script_path):
+    """Gets the folder served by the pool executing a script. Contracts of an
+    artifact store share a pool, whatever their shard.
+
+    :param script_path: Full path to the script to execute.
+    :type script_path: str
+    :rtype: str
+    """
+    return get_objects_folder(script_path) or os.path.dirname(
+        os.path.abspath(script_path))
+
+
+def _docker_run_job(script_path, name, job):
+    """Runs a single job in a new docker container and returns its result.
+
+    The job is sent to the worker on its standard input and the result read
+    back from its standard output, without any temporary file.
+
+    :param script_path: Full path to the script to execute.
+    :type script_path: str
+    :param name: Name of the container.
+    :type name: str
+    :param job: The job to run, without the script path.
+    :type job: dict
+    :return: The job result.
+    :raise LimitExceededError: If the container has been stopped for
+        exceeding its limits.
+    """
+    script_path = os.path.abspath(script_path)
+    runner = DockerRunner(os.path.dirname(script_path))
+    job['script'] = runner.script_path(script_path)
+    limits = ExecutionLimits.from_env()
+    calls = len(job['calls']) if 'calls' in job else 1
+
+    container_name = f'{name}-{uuid.uuid4().hex[:8]}'
+    docker_args = runner.command(container_name)
+    logging.debug(docker_args)
+
+    try:
+        process = subprocess.run(
+            docker_args, input=pack_frame(encode_job(job)),
+            env=runner.environ(), stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=limits.host_timeout(calls, _DOCKER_START_DELAY))
+    except subprocess.TimeoutExpired:
+        runner.kill(container_name)
+        raise WallTimeExceededError(limits.wall_time)
+    try:
+        return decode_response(unpack_frame(process.stdout))
+    except WorkerError as e:
+        if limits.is_limited and process.returncode in _KILLED_EXIT_CODES:
+            raise SandboxKilledError()
+        raise RuntimeError(process.stderr.decode() or str(e))
 
 
 def _docker_execute(script_path, storage_vars, endpoint, kwargs):
@@ -28,40 +92,58 @@ def _docker_execute(script_path, storage_vars, endpoint, kwargs):
     :return: The resulting execution info.
     :rtype: ExecutionInfo
     """
-    if not os.path.isabs(script_path):
-        script_path = os.path.abspath(script_path)
-
-    script_dir, script_name = os.path.split(script_path)
-
-    docker_args = [
-        'docker', 'run',
-        '--rm',
-        '--name', f'{script_name.split(".")[0]}-{endpoint}',
-        '-e', 'PYTHONPATH=.',                      # shell.py uses pikciosc
-        '-v', f'{_PICKIO_DIR}:/usr/src/pikciosc',  # mount pikciosc
-        '-v', f'{script_dir}:/usr/src/scripts',    # mount script folder
-        '-w', '/usr/src',
-        'python:3.6', 'python', '/usr/src/pikciosc/invoke/shell.py',
-        f'/usr/src/scripts/{script_name}', endpoint,
-        '--storage', serialise_vars(storage_vars),
-        '--kwargs', *flatten_vars_for_cli(kwargs),
-        '--indent', '4'
-    ]
-    logging.debug(docker_args)
+    script_name = os.path.basename(script_path)
+    try:
+        result = _docker_run_job(
+            script_path, f'{script_name.split(".")[0]}-{endpoint}', {
+                'op': OP_EXECUTE,
+                'storage': storage_vars,
+                'endpoint': endpoint,
+                'kwargs': kwargs,
+            }
+        )
+    except LimitExceededError as e:
+        return limit_exceeded_executions(
+            storage_vars, [(endpoint, kwargs)], str(e))[0]
+    return ExecutionInfo.from_dict(result).materialise(storage_vars)
 
-    with TemporaryFile(mode='w+') as stdout:
-        subprocess.call(docker_args, stdout=stdout, stderr=stdout)
-        stdout.seek(0)
-        try:
-            return ExecutionInfo.from_dict(json.load(stdout))
-        except ValueError:
-            stdout.seek(0)
-            raise RuntimeError(stdout.read())
+
+def _docker_execute_batch(script_path, storage_vars, calls):
+    """Executes several endpoints in a row inside a single docker container
+    and collects their output.
+
+    :param script_path: Full path to the script to execute.
+    :type script_path: str
+    :param storage_vars: The list of storage vars to restore before the first
+        call.
+    :type storage_vars: list[Variable]
+    :param calls: Ordered couples of endpoint names and named arguments.
+    :type calls: list[tuple[str,list[Variable]]]
+    :return: The resulting execution info of each call.
+    :rtype: list[ExecutionInfo]
+    """
+    script_name = os.path.basename(script_path)
+    try:
+        result = _docker_run_job(
+            script_path, f'{script_name.split(".")[0]}-batch', {
+                'op': OP_EXECUTE_BATCH,
+                'storage': storage_vars,
+                'calls': calls,
+            }
+        )
+    except LimitExceededError as e:
+        return limit_exceeded_executions(storage_vars, calls, str(e))
+    return ExecutionInfo.from_dicts(result, storage_vars)
 
 
 def execute_sandbox(script_path, storage_vars, endpoint, kwargs):
     """Executes provided script and endpoint in a sandbox. The behavior of this
-    function depends on the value of the environment variable SANDBOX.
+    function depends on the value of the environment variable SANDBOX:
+
+    - 'none' executes the script in the current process, without sandbox.
+    - 'fork' executes the script in a process forked from a fork-server.
+    - 'pool' hands the execution to a pool of warm workers.
+    - anything else starts a new docker container for the execution.
 
     :param script_path: Full path to the script to execute.
     :param storage_vars: The list of storage vars to restore.
@@ -73,6 +155,43 @@ def execute_sandbox(script_path, storage_vars, endpoint, kwargs):
     :return: The resulting execution info.
     :rtype: ExecutionInfo
     """
-    if os.environ.get('SANDBOX', '').lower() == 'none':
+    sandbox = os.environ.get('SANDBOX', '').lower()
+    if sandbox == 'none':
         return shell.execute(script_path, storage_vars, endpoint, kwargs)
+    if sandbox == 'fork':
+        return forkserver.get_fork_server().execute(script_path, storage_vars,
+                                                    endpoint, kwargs)
+    if sandbox == 'pool':
+        return pool.get_pool(_get_pool_folder(script_path)).execute(
+            script_path, storage_vars, endpoint, kwargs)
     return _docker_execute(script_path, storage_vars, endpoint, kwargs)
+
+
+def execute_sandbox_batch(script_path, storage_vars, calls):
+    """Executes several endpoints of provided script in a row, in a single
+    sandbox session. Storage vars are threaded from one call to the next, a
+    failed call leaving them unchanged.
+
+    The sandbox used depends on the environment variable SANDBOX, as for
+    execute_sandbox.
+
+    :param script_path: Full path to the script to execute.
+    :type script_path: str
+    :param storage_vars: The list of storage vars to restore before the first
+        call.
+    :type storage_vars: list[Variable]
+    :param calls: Ordered couples of endpoint names and named arguments.
+    :type calls: list[tuple[str,list[Variable]]]
+    :return: The resulting execution info of each call.
+    :rtype: list[ExecutionInfo]
+    """
+    sandbox = os.environ.get('SANDBOX', '').lower()
+    if sandbox == 'none':
+        return shell.execute_batch(script_path, storage_vars, calls)
+    if sandbox == 'fork':
+        return forkserver.get_fork_server().execute_batch(
+            script_path, storage_vars, calls)
+    if sandbox == 'pool':
+        return pool.get_pool(_get_pool_folder(script_path)).execute_batch(
+            script_path, storage_vars, calls)
+    return _docker_execute_batch(script_path, storage_vars, calls)
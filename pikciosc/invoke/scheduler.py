@@ -0,0 +1,251 @@
+"""This module schedules contract invocations over a pool of workers.
+
+Calls to a same contract must be applied in order, since each call starts
+from the storage left by the previous one. Calls to different contracts are
+independent though. The scheduler keeps an ordered queue per contract and
+runs the heads of these queues in parallel.
+
+Workers are threads waiting on the sandbox, so the actual parallelism is
+provided by the sandbox backend (docker, pool or fork-server). With
+SANDBOX=none, contracts run in the scheduler process and share its GIL.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pikciosc.invoke.invoke import invoke
+
+
+class _Request(object):
+    """An invocation waiting in a contract queue."""
+
+    def __init__(self, endpoint, kwargs):
+        self.endpoint = endpoint
+        self.kwargs = kwargs
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+    def cancel(self):
+        """Cancels the call, notifying the threads waiting for it."""
+        if self.future.cancel():
+            self.future.set_running_or_notify_cancel()
+
+
+class _LatencyStats(object):
+    """Aggregates durations, in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        """Records a new duration.
+
+        :param duration: The duration to record, in seconds.
+        :type duration: float
+        """
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def to_dict(self):
+        """Gets a dictionary standing for this object.
+
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else float('nan'),
+            'max': self.max,
+        }
+
+
+class InvocationScheduler(object):
+    """Runs invocations serialised per contract and parallel across
+    contracts."""
+
+    def __init__(self, bin_folder, interface_folder, max_workers=None,
+                 registry=None):
+        """Creates a new InvocationScheduler.
+
+        :param bin_folder: Path to the folder containing contract compiled
+            scripts.
+        :type bin_folder: str
+        :param interface_folder: Path to the folder containing contract
+            interfaces.
+        :type interface_folder: str
+        :param max_workers: Maximum number of invocations running at the same
+            time. Defaults to the number of CPUs.
+        :type max_workers: int
+        :param registry: Optional registry to look contracts up in. When
+            provided, bin_folder and interface_folder are ignored.
+        :type registry: ContractRegistry
+        """
+        self.bin_folder = bin_folder
+        self.interface_folder = interface_folder
+        self.registry = registry
+        self._executor = ThreadPoolExecutor(max_workers or os.cpu_count())
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._running = set()
+        self._last_exec_infos = {}
+        self._wait_stats = _LatencyStats()
+        self._exec_stats = _LatencyStats()
+        self._failures = 0
+        self._closed = False
+        self._cancel_pending = False
+
+    def set_last_exec_info(self, contract_name, last_exec_info):
+        """Defines the execution the next call to a contract starts from.
+
+        Must be called before submitting calls to that contract.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :param last_exec_info: Result of previous execution, if any.
+        :type last_exec_info: ExecutionInfo
+        """
+        with self._lock:
+            self._last_exec_infos[contract_name] = last_exec_info
+
+    def get_last_exec_info(self, contract_name):
+        """Gets the last successful execution of a contract, if any.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :rtype: ExecutionInfo
+        """
+        with self._lock:
+            return self._last_exec_infos.get(contract_name)
+
+    def submit(self, contract_name, endpoint, kwargs):
+        """Queues a call to a contract endpoint.
+
+        :param contract_name: Name of the contract to execute.
+        :type contract_name: str
+        :param endpoint: Name of endpoint to execute.
+        :type endpoint: str
+        :param kwargs: List of named arguments to pass to the endpoint.
+        :type kwargs: list[Variable]
+        :return: A future resolved with the execution details.
+        :rtype: concurrent.futures.Future
+        :raise RuntimeError: If the scheduler has been shut down.
+        """
+        request = _Request(endpoint, kwargs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Invocation scheduler is shut down.')
+            self._queues.setdefault(contract_name, deque()).append(request)
+            self._dispatch(contract_name)
+        return request.future
+
+    def _dispatch(self, contract_name):
+        """Hands the next call to a contract to the workers, unless a call to
+        that contract is already running. Lock must be held.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        """
+        queue = self._queues.get(contract_name)
+        if contract_name in self._running or not queue:
+            return
+        request = queue.popleft()
+        if not queue:
+            del self._queues[contract_name]
+        try:
+            self._executor.submit(self._run, contract_name, request)
+        except RuntimeError:
+            # The workers have been released: the call will never run.
+            request.cancel()
+            self._cancel_queue(contract_name)
+            return
+        self._running.add(contract_name)
+
+    def _cancel_queue(self, contract_name):
+        """Cancels the calls waiting in the queue of a contract. Lock must be
+        held.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        """
+        for request in self._queues.pop(contract_name, ()):
+            request.cancel()
+
+    def _run(self, contract_name, request):
+        """Executes a call and dispatches the next one to the same contract.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :param request: The call to execute.
+        :type request: _Request
+        """
+        started = time.monotonic()
+        try:
+            if self._cancel_pending:
+                request.cancel()
+            elif request.future.set_running_or_notify_cancel():
+                exec_info = invoke(
+                    self.bin_folder, self.interface_folder,
+                    self.get_last_exec_info(contract_name), contract_name,
+                    request.endpoint, request.kwargs, self.registry
+                )
+                with self._lock:
+                    if exec_info.is_success:
+                        self._last_exec_infos[contract_name] = exec_info
+                    else:
+                        self._failures += 1
+                request.future.set_result(exec_info)
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+            request.future.set_exception(e)
+        finally:
+            with self._lock:
+                self._wait_stats.add(started - request.submitted)
+                self._exec_stats.add(time.monotonic() - started)
+                self._running.discard(contract_name)
+                self._dispatch(contract_name)
+
+    def stats(self):
+        """Gets a snapshot of the scheduler queues and latencies.
+
+        :return: A dictionary with the number of queued and running calls,
+            the queue depth of each contract, the number of failed calls and
+            the waiting and execution durations, in seconds.
+        :rtype: dict
+        """
+        with self._lock:
+            depths = {name: len(queue) for name, queue in self._queues.items()}
+            return {
+                'queued': sum(depths.values()),
+                'running': len(self._running),
+                'queue_depths': depths,
+                'failures': self._failures,
+                'wait': self._wait_stats.to_dict(),
+                'execution': self._exec_stats.to_dict(),
+            }
+
+    def shutdown(self, wait=True):
+        """Stops accepting calls and releases the workers.
+
+        :param wait: Whether to wait for queued calls to complete. If False,
+            calls which did not start are cancelled and running ones complete
+            in the background.
+        :type wait: bool
+        """
+        with self._lock:
+            self._closed = True
+            if not wait:
+                self._cancel_pending = True
+                for contract_name in list(self._queues):
+                    self._cancel_queue(contract_name)
+        if wait:
+            while True:
+                with self._lock:
+                    if not self._queues and not self._running:
+                        break
+                time.sleep(0.01)
+        self._executor.shutdown(wait)
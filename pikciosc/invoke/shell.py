@@ -2,17 +2,89 @@
 endpoint.
 """
 import os
+import sys
+import copy
 import json
+import marshal
+import pickle
+import threading
+import types
 import importlib.util
-from argparse import ArgumentParser
+from collections import OrderedDict
 
+from pikciosc.invoke.gas import GasMeter, OutOfGasError, get_gas_limit
+from pikciosc.invoke.limits import ExecutionLimits, LimitExceededError
 from pikciosc.invoke.utils import inflate_cli_arguments, unserialise_vars
-from pikciosc.models import CallInfo, ExecutionInfo, Variable
+from pikciosc.models import CallInfo, ExecutionInfo, SuccessInfo, Variable, \
+    ERROR_CATEGORY_LIMIT
+
+ENV_PKC_SC_CODE_CACHE_SIZE = 'PKC_SC_CODE_CACHE_SIZE'
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes,
+                    frozenset)
+"""Types whose values can only be changed by reassignment."""
+_UNKNOWN = object()
+"""Fingerprint of values which cannot be fingerprinted."""
+
+_PYC_HEADER_SIZE = 16 if sys.version_info >= (3, 7) else 12
+
+_CODE_CACHE = OrderedDict()
+"""Maps modules paths to their (stamp, code object) couple, least recently
+used first."""
+_CODE_CACHE_LOCK = threading.Lock()
+
+
+def _read_code(module_path):
+    """Reads the code object of the module at specified path.
+
+    :param module_path: Path to the module source or bytecode.
+    :type module_path: str
+    :rtype: CodeType
+    """
+    with open(module_path, 'rb') as fd:
+        data = fd.read()
+    if not module_path.endswith('.pyc'):
+        return compile(data, module_path, 'exec', dont_inherit=True)
+    if data[:4] != importlib.util.MAGIC_NUMBER:
+        raise ImportError(f"Bad magic number in '{module_path}'.")
+    return marshal.loads(data[_PYC_HEADER_SIZE:])
+
+
+def _get_code(module_path):
+    """Gets the code object of the module at specified path, from the process
+    cache if the file did not change since it was last read.
+
+    The cache size is bounded by PKC_SC_CODE_CACHE_SIZE (128 by default), least
+    recently used modules being evicted first.
+
+    :param module_path: Path to the module source or bytecode.
+    :type module_path: str
+    :rtype: CodeType
+    """
+    stat = os.stat(module_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _CODE_CACHE_LOCK:
+        cached = _CODE_CACHE.get(module_path)
+        if cached and cached[0] == stamp:
+            _CODE_CACHE.move_to_end(module_path)
+            return cached[1]
+
+    code = _read_code(module_path)
+    max_size = int(os.environ.get(ENV_PKC_SC_CODE_CACHE_SIZE, 128))
+    with _CODE_CACHE_LOCK:
+        _CODE_CACHE[module_path] = (stamp, code)
+        _CODE_CACHE.move_to_end(module_path)
+        while len(_CODE_CACHE) > max_size:
+            _CODE_CACHE.popitem(last=False)
+    return code
 
 
 def _load_module(module_path):
     """Loads the module at specified path and returns it.
 
+    The module code is cached, but each call returns a new module whose top
+    level has been executed in a fresh namespace.
+
     :param module_path: The path to the module to load. The module is loaded in
         current context.
     :type: module_path :str
@@ -23,45 +95,93 @@ def _load_module(module_path):
     if not os.path.exists(module_path):
         raise FileNotFoundError(f"Module '{module_name}' could not be found in"
                                 f" path.")
-    spec = importlib.util.spec_from_file_location(module_name, module_path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    module = types.ModuleType(module_name)
+    module.__file__ = module_path
+    exec(_get_code(module_path), module.__dict__)
     return module
 
 
+def _fingerprint(value):
+    """Computes a fingerprint of a storage value, used to detect in-place
+    changes of that value.
+
+    :param value: The value to fingerprint.
+    :return: None for immutable values, whose changes are detected by
+        identity. The pickled value otherwise, or _UNKNOWN if the value
+        cannot be pickled.
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return None
+    try:
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return _UNKNOWN
+
+
 def _restore_storage(module, storage_vars):
     """Updates the module storage vars using the provided values.
 
+    Mutable values are pickled once: the pickle is their fingerprint, used to
+    detect in-place changes after the call, and the value restored in the
+    module is unpickled from it. In-place changes made by the contract thus
+    never alter provided storage vars, which callers such as registries may
+    keep and use again.
+
     :param module: The module whose storage vars have to be updated.
     :type module: module
     :param storage_vars: The list of storage vars to restore.
     :type storage_vars: list[Variable]
+    :return: The storage vars as restored in the module, and their
+        fingerprints.
+    :rtype: tuple[list[Variable],list]
     """
+    restored_vars = []
+    fingerprints = []
     for storage_var in storage_vars:
+        fingerprint = _fingerprint(storage_var.value)
+        if fingerprint is not None:
+            value = (
+                copy.deepcopy(storage_var.value) if fingerprint is _UNKNOWN
+                else pickle.loads(fingerprint)
+            )
+            storage_var = Variable(storage_var.name, storage_var.type, value)
         setattr(module, storage_var.name, storage_var.value)
+        restored_vars.append(storage_var)
+        fingerprints.append(fingerprint)
+    return restored_vars, fingerprints
+
 
+def _collect_storage_delta(module, storage_vars, fingerprints):
+    """Collects the storage vars changed since they were restored.
 
-def _collect_storage(module, storage_vars):
-    """Collects the current values for the provided storage_vars and returns
-    them.
+    A variable is changed if it has been reassigned to a different value or if
+    its value has been altered in place.
 
     :param module: The module to inspect.
-    :param storage_vars: The storage vars to collect.
+    :param storage_vars: The storage vars restored before the call.
     :type storage_vars: list[Variable]
-    :return: A dictionary of the new storage vars states.
+    :param fingerprints: Fingerprints of the storage vars, taken before the
+        call.
+    :type fingerprints: list
+    :return: The new states of the changed storage vars.
     :rtype: list[Variable]
     """
-    return [
-        Variable(
-            var.name,
-            type(getattr(module, var.name)),
-            getattr(module, var.name),
-        )
-        for var in storage_vars
-    ]
+    delta = []
+    for var, fingerprint in zip(storage_vars, fingerprints):
+        value = getattr(module, var.name)
+        if value is var.value:
+            if fingerprint is None or (
+                    fingerprint is not _UNKNOWN and
+                    fingerprint == _fingerprint(value)):
+                continue
+        elif (isinstance(value, _IMMUTABLE_TYPES) and
+              type(value) is type(var.value) and value == var.value):
+            continue
+        delta.append(Variable(var.name, type(value), value))
+    return delta
 
 
-def _call(module, endpoint_name, args):
+def _call(module, endpoint_name, args, gas_limit=None):
     """Calls provided endpoint with some named arguments and return an object
     containing call info and result.
 
@@ -70,22 +190,47 @@ def _call(module, endpoint_name, args):
     :type: endpoint_name: str
     :param args: Named arguments to pass to the endpoint
     :type args: list[Variable]
+    :param gas_limit: If provided, the call is metered and fails once it
+        consumes more gas than this limit.
+    :type gas_limit: int
     :return: Call details and result.
     :rtype: CallInfo
     """
     endpoint = getattr(module, endpoint_name)
     call_info = CallInfo(endpoint_name, args)
+    meter = (
+        GasMeter(module.__dict__, gas_limit) if gas_limit is not None else
+        None
+    )
     call_info.stop_watch.set_start()
     try:
         kwargs = {arg.name: arg.value for arg in args}
-        call_info.ret_val = endpoint(**kwargs)
+        if meter is not None:
+            with meter:
+                call_info.ret_val = endpoint(**kwargs)
+        else:
+            call_info.ret_val = endpoint(**kwargs)
+    except LimitExceededError as e:
+        call_info.success_info = SuccessInfo(str(e), ERROR_CATEGORY_LIMIT)
+    except MemoryError:
+        call_info.success_info = SuccessInfo('Memory limit exceeded.',
+                                             ERROR_CATEGORY_LIMIT)
     except Exception as e:
         call_info.success_info.error = str(e)
     call_info.stop_watch.set_end()
+
+    if meter is not None:
+        # The contract may have caught the out of gas error.
+        if meter.exhausted:
+            call_info.ret_val = None
+            call_info.success_info = SuccessInfo(
+                str(OutOfGasError(gas_limit)), ERROR_CATEGORY_LIMIT)
+        call_info.gas_used = min(meter.gas_used, gas_limit)
     return call_info
 
 
-def execute(module_path, storage_vars, endpoint_name, kwargs):
+def execute(module_path, storage_vars, endpoint_name, kwargs, module=None,
+            gas_limit=None, limits=None):
     """Calls a module endpoint after restoring storage vars.
 
     :param module_path: Path to module to call endpoint in.
@@ -96,17 +241,40 @@ def execute(module_path, storage_vars, endpoint_name, kwargs):
     :type: endpoint_name: str
     :param kwargs: Named arguments to pass to the endpoint
     :type kwargs: list[Variable]
+    :param module: Optional module already loaded from module_path. When
+        provided, it is used as is instead of loading the module again.
+    :type module: module
+    :param gas_limit: Maximum gas the call can consume. Defaults to the
+        PKC_SC_GAS_LIMIT environment variable. Calls are not metered if no
+        limit is set.
+    :type gas_limit: int
+    :param limits: Limits applied to the loading of the module and to the
+        call. Defaults to the PKC_SC_*_LIMIT environment variables.
+    :type limits: ExecutionLimits
     :return: Execution details and result.
     :rtype: ExecutionInfo
     """
-    execution_info = ExecutionInfo(storage_vars)
+    execution_info = ExecutionInfo(storage_vars, storage_delta=[])
     execution_info.stop_watch.set_start()
+    if gas_limit is None:
+        gas_limit = get_gas_limit()
+    if limits is None:
+        limits = ExecutionLimits.from_env()
 
     try:
-        module = _load_module(module_path)
-        _restore_storage(module, storage_vars)
-        execution_info.call_info = _call(module, endpoint_name, kwargs)
-        execution_info.storage_after = _collect_storage(module, storage_vars)
+        with limits:
+            module = module or _load_module(module_path)
+            restored_vars, fingerprints = _restore_storage(module,
+                                                           storage_vars)
+            execution_info.call_info = _call(module, endpoint_name, kwargs,
+                                             gas_limit)
+        execution_info.storage_delta = _collect_storage_delta(
+            module, restored_vars, fingerprints)
+        execution_info.storage_after = execution_info.apply_delta(
+            storage_vars)
+    except (LimitExceededError, MemoryError) as e:
+        execution_info.success_info = SuccessInfo(
+            str(e) or 'Memory limit exceeded.', ERROR_CATEGORY_LIMIT)
     except Exception as e:
         execution_info.success_info.error = str(e)
 
@@ -114,7 +282,48 @@ def execute(module_path, storage_vars, endpoint_name, kwargs):
     return execution_info
 
 
-def execute_cli(module_path, storage_file, endpoint_name, flat_args):
+def execute_batch(module_path, storage_vars, calls, gas_limit=None,
+                  limits=None):
+    """Calls several module endpoints in a row, threading storage vars from
+    one call to the next.
+
+    Each call starts from a fresh module. A failed call leaves the storage as
+    it was before that call.
+
+    :param module_path: Path to module to call endpoints in.
+    :type module_path: str
+    :param storage_vars: The list of storage vars to restore before the first
+        call.
+    :type storage_vars: list[Variable]
+    :param calls: Ordered couples of endpoint names and named arguments.
+    :type calls: list[tuple[str,list[Variable]]]
+    :param gas_limit: Maximum gas each call can consume. Defaults to the
+        PKC_SC_GAS_LIMIT environment variable.
+    :type gas_limit: int
+    :param limits: Limits applied to each call. Defaults to the
+        PKC_SC_*_LIMIT environment variables.
+    :type limits: ExecutionLimits
+    :return: Execution details and result of each call.
+    :rtype: list[ExecutionInfo]
+    """
+    executions = []
+    for endpoint_name, kwargs in calls:
+        # In-place changes of a failed call are lost, as execute works on a
+        # copy of the storage.
+        execution_info = execute(module_path, storage_vars, endpoint_name,
+                                 kwargs, gas_limit=gas_limit, limits=limits)
+        execution_info.storage_before = storage_vars
+        if execution_info.is_success:
+            storage_vars = execution_info.storage_after
+        else:
+            execution_info.storage_after = storage_vars
+            execution_info.storage_delta = []
+        executions.append(execution_info)
+    return executions
+
+
+def execute_cli(module_path, storage_file, endpoint_name, flat_args,
+                gas_limit=None):
     """Calls a module endpoint after restoring storage vars.
 
     :param module_path: Path to module to call endpoint in.
@@ -125,17 +334,26 @@ def execute_cli(module_path, storage_file, endpoint_name, flat_args):
     :type: endpoint_name: str
     :param flat_args: Named arguments to pass to the endpoint
     :type flat_args: list
+    :param gas_limit: Maximum gas the call can consume, if metered.
+    :type gas_limit: int
     :return: Execution details and result.
     :rtype: dict
     """
     args = inflate_cli_arguments(flat_args)
     storage_vars = unserialise_vars(storage_file)
-    execution_info = execute(module_path, storage_vars, endpoint_name, args)
+    execution_info = execute(module_path, storage_vars, endpoint_name, args,
+                             gas_limit=gas_limit)
     return execution_info.to_dict()
 
 
 def _parse_args():
-    """Loads the arguments from the command line."""
+    """Loads the arguments from the command line.
+
+    argparse is only imported here, as the workers running the shell do not
+    need it.
+    """
+    from argparse import ArgumentParser
+
     parser = ArgumentParser(description='Pikcio Smart Contract Shell')
     parser.add_argument("script", type=str,
                         help='python script to import')
@@ -145,6 +363,9 @@ def _parse_args():
                         help='Path to serialised storage vars')
     parser.add_argument("--kwargs", "-kw", dest="kwargs", nargs='*',
                         help='List of args names and values')
+    parser.add_argument("--gas-limit", "-g", type=int, dest="gas_limit",
+                        help='Meter the call and abort it once it consumes '
+                             'more gas than this limit')
     parser.add_argument("-i", "--indent", type=int,
                         help='If positive, prettify the output json with tabs')
     parser.add_argument("-o", "--output", type=str, dest='output',
@@ -152,7 +373,8 @@ def _parse_args():
     known_args, _ = parser.parse_known_args()
     return (
         known_args.script, known_args.storage, known_args.endpoint,
-        known_args.kwargs, known_args.indent, known_args.output
+        known_args.kwargs, known_args.gas_limit, known_args.indent,
+        known_args.output
     )
 
 
@@ -1,8 +1,6 @@
 import itertools
 import os
 import pickle
-import tempfile
-import uuid
 
 from pikciosc.models import Variable
 
@@ -12,6 +10,10 @@ def _get_temp_filename():
 
     :rtype: str
     """
+    # Imported here as they are slow to load, and the shell seldom needs
+    # them.
+    import tempfile
+    import uuid
     return os.path.join(tempfile.gettempdir(), f'{str(uuid.uuid4())}.storage')
 
 
@@ -68,7 +70,7 @@ def serialise_vars(variables):
     :rtype: str
     """
     filename = _get_temp_filename()
-    with open(filename, 'w') as fd:
+    with open(filename, 'wb') as fd:
         pickle.dump(variables, fd)
     return filename
 
@@ -81,5 +83,5 @@ def unserialise_vars(variables_path):
     :return: The inflated variables. Should be a list of variables.
     :rtype: list[Variable]
     """
-    with open(variables_path, 'r') as fd:
+    with open(variables_path, 'rb') as fd:
         return pickle.load(fd)
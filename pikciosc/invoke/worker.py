@@ -0,0 +1,70 @@
+"""This script runs a long-lived sandbox worker.
+
+The worker reads jobs from its standard input, one after the other, and
+answers each of them on its standard output. See `protocol.py` for the format
+of the messages.
+"""
+import os
+import sys
+
+from pikciosc.invoke import shell
+from pikciosc.invoke.limits import ExecutionLimits
+from pikciosc.invoke.protocol import decode_job, encode_response, \
+    read_frame, write_frame, STATUS_ERROR, STATUS_OK
+
+OP_PING = 'ping'
+OP_EXECUTE = 'execute'
+OP_EXECUTE_BATCH = 'execute_batch'
+
+
+def _handle(job):
+    """Processes a single job and returns its result.
+
+    :param job: The job to process. Must at least have an 'op' key.
+    :type job: dict
+    :return: A JSON serialisable result.
+    """
+    op = job.get('op')
+    if op == OP_PING:
+        return os.getpid()
+    # The worker is disposable: it is killed if a call does not stop after
+    # exceeding its CPU time.
+    limits = ExecutionLimits.from_env(kill_on_breach=True)
+    if op == OP_EXECUTE:
+        return shell.execute(
+            job['script'], job['storage'], job['endpoint'], job['kwargs'],
+            limits=limits
+        ).to_dict(delta=True)
+    if op == OP_EXECUTE_BATCH:
+        return [
+            execution_info.to_dict(delta=True)
+            for execution_info in shell.execute_batch(
+                job['script'], job['storage'], job['calls'], limits=limits)
+        ]
+    raise ValueError(f"Unsupported job operation '{op}'.")
+
+
+def serve(channel_in, channel_out):
+    """Processes jobs until the input channel is closed.
+
+    :param channel_in: Binary stream to read jobs from.
+    :param channel_out: Binary stream to write results to.
+    """
+    while True:
+        payload = read_frame(channel_in)
+        if payload is None:
+            return
+        try:
+            response = encode_response(STATUS_OK, _handle(decode_job(payload)))
+        except Exception as e:
+            response = encode_response(STATUS_ERROR, str(e))
+        write_frame(channel_out, response)
+        channel_out.flush()
+
+
+if __name__ == '__main__':
+    # Keep a private handle on stdout for the results and redirect the
+    # descriptor to stderr so that contracts can't corrupt the channel.
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    serve(sys.stdin.buffer, out)
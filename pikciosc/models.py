@@ -1,11 +1,27 @@
 """Contains model objects being used as input/output of modules endpoints.
 """
+import functools
 import os
 import json
-import pydoc
 
 from datetime import datetime
 
+ERROR_CATEGORY_LIMIT = 'limit_exceeded'
+"""Category of the errors of calls stopped for exceeding their limits."""
+
+
+@functools.lru_cache(maxsize=256)
+def _locate_type(type_name):
+    """Finds a type from its name, once per name as lookups try to import
+    it first.
+
+    pydoc is imported on first use, as it is slow to load.
+
+    :rtype: type|None
+    """
+    import pydoc
+    return pydoc.locate(type_name)
+
 
 class _JSONFileSerializable(object):
     """Base class providing serialisation to file features."""
@@ -61,7 +77,7 @@ class TypedNamed(object):
         :type typ: Union[type|str]
         """
         self.name = name
-        self.type = pydoc.locate(typ) if isinstance(typ, str) else typ
+        self.type = _locate_type(typ) if isinstance(typ, str) else typ
 
     def to_dict(self):
         """Gets a dictionary standing for this object.
@@ -113,10 +129,79 @@ class Variable(TypedNamed):
         return cls(json_dct['name'], json_dct['type'], json_dct['value'])
 
 
+class CostProfile(object):
+    """Stands for the static cost of an endpoint, computed from its source.
+
+    The profile covers the endpoint and the module functions it calls,
+    transitively. The cost of builtins and libraries is not known.
+    """
+
+    def __init__(self, statements, nodes, max_loop_depth, calls=None,
+                 recursive=False, upper_bound=None):
+        """Creates a new CostProfile from provided measures.
+
+        :param statements: Number of statements of the endpoint and of the
+            module functions it reaches.
+        :type statements: int
+        :param nodes: Number of syntax nodes of the endpoint and of the module
+            functions it reaches.
+        :type nodes: int
+        :param max_loop_depth: Deepest nesting of loops, including the loops
+            of called functions.
+        :type max_loop_depth: int
+        :param calls: Names of the module functions reached by the endpoint.
+        :type calls: list[str]
+        :param recursive: Tells if the endpoint reaches a recursive call.
+        :type recursive: bool
+        :param upper_bound: Maximum number of nodes evaluated by a call, if it
+            can be derived. It can't with loops or recursion.
+        :type upper_bound: int
+        """
+        self.statements = statements
+        self.nodes = nodes
+        self.max_loop_depth = max_loop_depth
+        self.calls = calls or []
+        self.recursive = recursive
+        self.upper_bound = upper_bound
+
+    def to_dict(self):
+        """Gets a dictionary standing for this object.
+
+        :rtype: dict
+        """
+        return {
+            'statements': self.statements,
+            'nodes': self.nodes,
+            'max_loop_depth': self.max_loop_depth,
+            'calls': self.calls,
+            'recursive': self.recursive,
+            'upper_bound': self.upper_bound,
+        }
+
+    @classmethod
+    def from_dict(cls, json_dct):
+        """Creates a new object from its dictionary representation.
+
+        :param json_dct: Dictionary that must contain each attribute.
+        :type json_dct: dict
+        """
+        if json_dct is None:
+            return None
+        return cls(
+            json_dct['statements'],
+            json_dct['nodes'],
+            json_dct['max_loop_depth'],
+            json_dct['calls'],
+            json_dct['recursive'],
+            json_dct['upper_bound'],
+        )
+
+
 class EndPointDef(TypedNamed):
     """Stands for the definition of and enpoint in a Smart Contract."""
 
-    def __init__(self, name, typ, params=None, doc=None):
+    def __init__(self, name, typ, params=None, doc=None, cost=None,
+                 selector=None):
         """Creates a new EndPointDef from provided arguments.
 
         :param name: The object name.
@@ -127,10 +212,26 @@ class EndPointDef(TypedNamed):
         :type params: list[TypedNamed]
         :param doc: Optional documentation string for the endpoint.
         :type doc: str
+        :param cost: Optional static cost profile of the endpoint.
+        :type cost: CostProfile
+        :param selector: Optional selector of the endpoint in encoded calls,
+            as an hexadecimal string.
+        :type selector: str
         """
         super().__init__(name, typ)
         self.params = params
         self.doc = doc
+        self.cost = cost
+        self.selector = selector
+
+    @property
+    def canonical_signature(self):
+        """Gets the canonical signature of this endpoint.
+
+        :rtype: str
+        """
+        params_part = ','.join(param.type.__name__ for param in self.params)
+        return f'{self.name}({params_part})'
 
     def to_dict(self):
         """Gets a dictionary standing for this object.
@@ -138,7 +239,10 @@ class EndPointDef(TypedNamed):
         :rtype: dict
         """
         params = [arg.to_dict() for arg in self.params]
-        return dict(super().to_dict(), **{'params': params, 'doc': self.doc})
+        cost = self.cost.to_dict() if self.cost else None
+        return dict(super().to_dict(),
+                    **{'params': params, 'doc': self.doc, 'cost': cost,
+                       'selector': self.selector})
 
     @classmethod
     def from_dict(cls, json_dct):
@@ -152,6 +256,8 @@ class EndPointDef(TypedNamed):
             json_dct['type'],
             [TypedNamed.from_dict(arg) for arg in json_dct.get('params', [])],
             json_dct['doc'],
+            CostProfile.from_dict(json_dct.get('cost')),
+            json_dct.get('selector'),
         )
 
 
@@ -160,7 +266,8 @@ class ContractInterface(_JSONFileSerializable):
     Contract.
     """
 
-    def __init__(self, name=None, storage_vars=None, endpoints=None):
+    def __init__(self, name=None, storage_vars=None, endpoints=None,
+                 selectors_fingerprint=None):
         """Creates a new ContractInterface from its specifications.
 
         :param name: The name of the contract.
@@ -172,10 +279,14 @@ class ContractInterface(_JSONFileSerializable):
         :param endpoints: The list of endpoints that can be called directly by
             an user.
         :type endpoints: list[EndpointDef]
+        :param selectors_fingerprint: Fingerprint of the interface the
+            selectors of the endpoints were persisted with, if any.
+        :type selectors_fingerprint: str
         """
         self.name = name or 'unnamed'
         self.storage_vars = storage_vars or []
         self.endpoints = endpoints or []
+        self.selectors_fingerprint = selectors_fingerprint
 
     @property
     def endpoints_names(self):
@@ -195,9 +306,7 @@ class ContractInterface(_JSONFileSerializable):
         :return: The canonical signature of that endpoint.
         :rtype: str
         """
-        ep = self.get_endpoint(endpoint_name)
-        params_part = ','.join(param.type.__name__ for param in ep.params)
-        return f'{endpoint_name}({params_part})'
+        return self.get_endpoint(endpoint_name).canonical_signature
 
     def is_supported_endpoint(self, endpoint_name):
         """Tells if provided endpoint name is supported by this contract.
@@ -216,7 +325,8 @@ class ContractInterface(_JSONFileSerializable):
         return {
             'name': self.name,
             'storage': [var.to_dict() for var in self.storage_vars],
-            'endpoints': [endpoint.to_dict() for endpoint in self.endpoints]
+            'endpoints': [endpoint.to_dict() for endpoint in self.endpoints],
+            'selectors_fingerprint': self.selectors_fingerprint
         }
 
     @classmethod
@@ -229,7 +339,8 @@ class ContractInterface(_JSONFileSerializable):
         return cls(
             json_dct['name'],
             [Variable.from_dict(var) for var in json_dct.get('storage', [])],
-            [EndPointDef.from_dict(ep) for ep in json_dct.get('endpoints', [])]
+            [EndPointDef.from_dict(ep) for ep in json_dct.get('endpoints', [])],
+            json_dct.get('selectors_fingerprint')
         )
 
 
@@ -295,15 +406,19 @@ class StopWatch(object):
 class SuccessInfo(object):
     """Contains details about the completion state of an event."""
 
-    def __init__(self, error=None):
+    def __init__(self, error=None, category=None):
         """Creates a new SuccessInfo. If an error is provided, the state is
         considered unsuccessful.
 
         :param error: Optional error to provide in case operation wasn't
             successful.
         :type error: str
+        :param category: Optional category of the error, like
+            ERROR_CATEGORY_LIMIT.
+        :type category: str
         """
         self.error = error
+        self.category = category
 
     @property
     def is_success(self):
@@ -315,7 +430,11 @@ class SuccessInfo(object):
 
         :rtype: dict
         """
-        return {"is_success": self.is_success, "error": self.error}
+        return {
+            "is_success": self.is_success,
+            "error": self.error,
+            "error_category": self.category,
+        }
 
     @classmethod
     def from_dict(cls, json_dct):
@@ -324,14 +443,14 @@ class SuccessInfo(object):
         :param json_dct: Dictionary that must contain each attribute.
         :type json_dct: dict
         """
-        return cls(json_dct['error'])
+        return cls(json_dct['error'], json_dct.get('error_category'))
 
 
 class CallInfo(object):
     """Contains details about a call made to an endpoint."""
 
     def __init__(self, endpoint_name, kwargs, stop_watch=None,
-                 success_info=None, ret_val=None):
+                 success_info=None, ret_val=None, gas_used=None):
         """Creates a new CallInfo from provided details.
 
         :param endpoint_name: The name of the endpoint called.
@@ -343,12 +462,15 @@ class CallInfo(object):
         :param success_info: Details about call completion.
         :type success_info: SuccessInfo
         :param ret_val: The value returned by the call, if any.
+        :param gas_used: The gas consumed by the call, if it was metered.
+        :type gas_used: int
         """
         self.stop_watch = stop_watch or StopWatch()
         self.success_info = success_info or SuccessInfo()
         self.endpoint_name = endpoint_name
         self.kwargs = kwargs
         self.ret_val = ret_val
+        self.gas_used = gas_used
 
     def to_dict(self):
         """Gets a dictionary standing for this object.
@@ -360,6 +482,7 @@ class CallInfo(object):
                 "endpoint": self.endpoint_name,
                 "args": [var.to_dict() for var in self.kwargs],
                 "ret_val": self.ret_val,
+                "gas_used": self.gas_used,
             },
             **self.success_info.to_dict(),
             **self.stop_watch.to_dict(),
@@ -379,15 +502,22 @@ class CallInfo(object):
             [Variable.from_dict(var) for var in json_dct['args']],
             StopWatch.from_dict(json_dct),
             SuccessInfo.from_dict(json_dct),
-            json_dct['ret_val']
+            json_dct['ret_val'],
+            json_dct.get('gas_used')
         )
 
 
 class ExecutionInfo(_JSONFileSerializable):
-    """Contains broader details about an endpoint invocation."""
+    """Contains broader details about an endpoint invocation.
+
+    Besides full storage states, an execution can carry the storage delta,
+    made of the sole storage variables changed by the call. An execution
+    created from its delta form has no full state until it is materialised
+    from the state it started from.
+    """
 
     def __init__(self, storage_before, call_info=None, stop_watch=None,
-                 success_info=None, storage_after=None):
+                 success_info=None, storage_after=None, storage_delta=None):
         """Creates a new ExecutionInfo from specified parameters.
 
         :param storage_before: State of storage variables before call.
@@ -400,6 +530,8 @@ class ExecutionInfo(_JSONFileSerializable):
         :type success_info: SuccessInfo
         :param storage_after: State of storage variables after call.
         :type storage_after: list[Variable]
+        :param storage_delta: Storage variables changed by the call, if known.
+        :type storage_delta: list[Variable]
         """
         super().__init__()
         self.call_info = call_info or None
@@ -407,19 +539,62 @@ class ExecutionInfo(_JSONFileSerializable):
         self.success_info = success_info or SuccessInfo()
         self.storage_before = storage_before
         self.storage_after = storage_after or storage_before
+        self.storage_delta = storage_delta
 
-    def to_dict(self):
+    @property
+    def is_success(self):
+        """Tells if both the execution and the call it wraps succeeded."""
+        return self.success_info.is_success and (
+            self.call_info is None or self.call_info.success_info.is_success
+        )
+
+    def apply_delta(self, storage_vars):
+        """Applies the storage delta of this execution to provided storage.
+
+        :param storage_vars: The storage to update.
+        :type storage_vars: list[Variable]
+        :return: The updated storage. Unchanged variables are not copied.
+        :rtype: list[Variable]
+        """
+        changes = {var.name: var for var in self.storage_delta or ()}
+        return [changes.get(var.name, var) for var in storage_vars]
+
+    def materialise(self, storage_before):
+        """Rebuilds the full storage states of an execution created from its
+        delta form. Executions already holding full states are left as is.
+
+        :param storage_before: State of storage variables before call.
+        :type storage_before: list[Variable]
+        :return: This execution.
+        :rtype: ExecutionInfo
+        """
+        if self.storage_before is None:
+            self.storage_before = storage_before
+            self.storage_after = self.apply_delta(storage_before)
+        return self
+
+    def to_dict(self, delta=False):
         """Gets a dictionary standing for this object.
 
+        :param delta: If True and the storage delta is known, storage is
+            described by its delta only, instead of its full states.
+        :type delta: bool
         :rtype: dict
         """
+        if self.storage_before is None or (
+                delta and self.storage_delta is not None):
+            storage = {
+                "delta": [var.to_dict() for var in self.storage_delta]
+            }
+        else:
+            storage = {
+                "before": [var.to_dict() for var in self.storage_before],
+                "after": [var.to_dict() for var in self.storage_after]
+            }
         return dict(
             {
                 "call": self.call_info.to_dict() if self.call_info else None,
-                "storage": {
-                    "before": [var.to_dict() for var in self.storage_before],
-                    "after": [var.to_dict() for var in self.storage_after]
-                }
+                "storage": storage
             },
             **self.success_info.to_dict(),
             **self.stop_watch.to_dict(),
@@ -429,13 +604,48 @@ class ExecutionInfo(_JSONFileSerializable):
     def from_dict(cls, json_dct):
         """Creates a new object from its dictionary representation.
 
+        If the storage is described by its delta, the created object must be
+        materialised to get its full states.
+
         :param json_dct: Dictionary that must contain each attribute.
         :type json_dct: dict
         """
+        storage = json_dct['storage']
+        if 'delta' in storage:
+            return cls(
+                None,
+                CallInfo.from_dict(json_dct['call']),
+                StopWatch.from_dict(json_dct),
+                SuccessInfo.from_dict(json_dct),
+                storage_delta=[
+                    Variable.from_dict(var) for var in storage['delta']
+                ]
+            )
         return cls(
-            [Variable.from_dict(var) for var in json_dct['storage']['before']],
+            [Variable.from_dict(var) for var in storage['before']],
             CallInfo.from_dict(json_dct['call']),
             StopWatch.from_dict(json_dct),
             SuccessInfo.from_dict(json_dct),
-            [Variable.from_dict(var) for var in json_dct['storage']['after']]
+            [Variable.from_dict(var) for var in storage['after']]
         )
+
+    @classmethod
+    def from_dicts(cls, json_dcts, storage_before):
+        """Creates the executions of consecutive calls from their dictionary
+        representations, materialising them one after the other. A failed call
+        does not alter the storage seen by the next one.
+
+        :param json_dcts: Dictionaries of the consecutive executions.
+        :type json_dcts: list[dict]
+        :param storage_before: State of storage variables before first call.
+        :type storage_before: list[Variable]
+        :rtype: list[ExecutionInfo]
+        """
+        executions = []
+        for json_dct in json_dcts:
+            execution_info = cls.from_dict(json_dct).materialise(
+                storage_before)
+            if execution_info.is_success:
+                storage_before = execution_info.storage_after
+            executions.append(execution_info)
+        return executions
@@ -1,4 +1,4 @@
-from pikciosc.parse.parser import parse_file_cli, parse_string, \
-    parse_string_cli
+from pikciosc.parse.cache import ParseError
+from pikciosc.parse.parser import parse_file_cli, parse_string
 
-__all__ = [parse_file_cli, parse_string, parse_string_cli]
+__all__ = [ParseError, parse_file_cli, parse_string]
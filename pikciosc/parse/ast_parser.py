@@ -0,0 +1,742 @@
+"""This module parses Smart Contracts (SC) with the `ast` module of the
+standard library, a fast alternative to mypy.
+
+It generates the same interfaces and errors as the mypy backend, cost profiles
+included, by mirroring how mypy converts and walks the syntax tree. Contracts
+using a construct that cannot be mirrored exactly, or that mypy rejects, raise
+an UnsupportedSyntax error, so that they can be parsed by mypy instead.
+"""
+import ast
+import io
+import re
+import sys
+import tokenize
+from collections import namedtuple
+
+from pikciosc.models import ContractInterface, EndPointDef, TypedNamed, \
+    Variable
+from pikciosc.parse.cost import CostAnalyser, FunctionCost
+
+_TYPE_COMMENTS = sys.version_info >= (3, 8)
+"""Tells if the ast module can read type comments."""
+
+_TYPE_COMMENT_PATTERN = re.compile(r'#\s*type:(?!\s*ignore\b)\s*(.*)')
+"""Matches type comments, other than `# type: ignore`."""
+
+_FuncType = namedtuple('_FuncType', 'argtypes returns')
+"""Parsed type comment of a function, before Python 3.8."""
+
+_OPERATORS = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop,
+              ast.cmpop)
+"""Nodes which mypy does not convert to nodes of their own."""
+
+_CONSTANTS = ('Constant', 'Num', 'Str', 'Bytes', 'NameConstant', 'Ellipsis')
+"""Literal nodes, depending on the Python version."""
+
+_EMPTY_CONTAINERS = {'List': list, 'Tuple': tuple, 'Set': set, 'Dict': dict}
+"""Maps a container node to the type of the storage variables it
+initializes, when empty."""
+
+_NAME_INITIALIZER_ERROR = "'{}' is a name expression and cannot be used as " \
+                          "a storage var initializer."
+
+_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class UnsupportedSyntax(Exception):
+    """Raised when a contract must be parsed by mypy instead."""
+
+
+def _constant_value(node):
+    """Gets the value of a literal node.
+
+    :param node: Any of the literal nodes of _CONSTANTS.
+    :type node: ast.expr
+    """
+    if type(node).__name__ == 'Ellipsis':
+        return Ellipsis
+    return getattr(node, node._fields[0])
+
+
+def _is_constant(node, *values):
+    return type(node).__name__ in _CONSTANTS and \
+        any(_constant_value(node) is value for value in values)
+
+
+def _str_value(node):
+    """Gets the value of a string literal.
+
+    Like mypy, f-strings without replacement fields are string literals.
+
+    :rtype: str|None
+    """
+    if isinstance(node, ast.JoinedStr):
+        if all(_str_value(value) is not None for value in node.values):
+            return ''.join(_str_value(value) for value in node.values)
+    elif type(node).__name__ in ('Constant', 'Str'):
+        value = _constant_value(node)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+def _dotted_name(node):
+    """Gets the dotted name of a Name or Attribute node.
+
+    :rtype: str|None
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        prefix = _dotted_name(node.value)
+        if prefix is not None:
+            return f'{prefix}.{node.attr}'
+    return None
+
+
+def _check_type_argument(node):
+    """Checks a type argument, such as `int` in `List[int]`, is one mypy
+    accepts."""
+    if _is_constant(node, Ellipsis):
+        return
+    if isinstance(node, (ast.List, ast.Tuple)):
+        for elt in node.elts:
+            _check_type_argument(elt)
+        return
+    _type_name(node)
+
+
+def _type_name(node):
+    """Gets the name mypy gives to a type annotation.
+
+    :param node: The annotation.
+    :type node: ast.expr
+    :rtype: str
+    :raises UnsupportedSyntax: If the annotation has no name for mypy, or is
+        not supported.
+    """
+    if _is_constant(node, None):
+        return 'None'
+    if isinstance(node, ast.Subscript):
+        type_arguments = node.slice
+        if type(type_arguments).__name__ == 'Index':
+            type_arguments = type_arguments.value
+        if isinstance(type_arguments, ast.Tuple):
+            for elt in type_arguments.elts:
+                _check_type_argument(elt)
+        else:
+            _check_type_argument(type_arguments)
+        node = node.value
+    name = _dotted_name(node)
+    if name is None:
+        raise UnsupportedSyntax(
+            f"Unsupported type annotation at line "
+            f"{getattr(node, 'lineno', '?')}.")
+    return name
+
+
+def _all_args(arguments):
+    """Lists the parameters of a function in mypy order.
+
+    :rtype: list[ast.arg]
+    """
+    args = list(arguments.args)
+    if arguments.vararg:
+        args.append(arguments.vararg)
+    args.extend(arguments.kwonlyargs)
+    if arguments.kwarg:
+        args.append(arguments.kwarg)
+    return args
+
+
+def _parse_func_type(type_comment):
+    """Parses the type comment of a function.
+
+    Before Python 3.8, the parameter types are parsed as the arguments of a
+    call. Either way, the stars of `*args` and `**kwargs` types are dropped.
+
+    :rtype: ast.FunctionType|_FuncType
+    """
+    try:
+        if _TYPE_COMMENTS:
+            return ast.parse(type_comment, '<func_type>', 'func_type')
+        arg_types, arrow, return_type = type_comment.partition('->')
+        call = ast.parse(f'_{arg_types.strip()}', '<func_type>', 'eval').body
+        if not arrow or not isinstance(call, ast.Call) or \
+                not isinstance(call.func, ast.Name) or \
+                len(call.keywords) > 1 or \
+                any(keyword.arg is not None for keyword in call.keywords):
+            raise SyntaxError(type_comment)
+        argtypes = list(call.args)
+        if argtypes and isinstance(argtypes[-1], ast.Starred):
+            argtypes[-1] = argtypes[-1].value
+        if any(isinstance(arg, ast.Starred) for arg in argtypes):
+            raise SyntaxError(type_comment)
+        argtypes.extend(keyword.value for keyword in call.keywords)
+        return _FuncType(
+            argtypes,
+            ast.parse(return_type.strip(), '<func_type>', 'eval').body)
+    except SyntaxError:
+        raise UnsupportedSyntax('Invalid function type comment.')
+
+
+def _check_function(func_def):
+    """Checks the signature of a function is one mypy accepts."""
+    if getattr(func_def.args, 'posonlyargs', None):
+        raise UnsupportedSyntax('Positional-only parameters.')
+    args = _all_args(func_def.args)
+    for arg in args:
+        if getattr(arg, 'type_comment', None) is not None:
+            raise UnsupportedSyntax('Parameter type comment.')
+        if arg.annotation is not None:
+            _type_name(arg.annotation)
+    if func_def.returns is not None:
+        _type_name(func_def.returns)
+    if getattr(func_def, 'type_comment', None) is not None:
+        func_type = _parse_func_type(func_def.type_comment)
+        if func_def.returns is not None or \
+                any(arg.annotation is not None for arg in args):
+            raise UnsupportedSyntax('Both annotations and type comment.')
+        if len(func_type.argtypes) != len(args):
+            raise UnsupportedSyntax('Type comment does not match parameters.')
+        for type_node in func_type.argtypes + [func_type.returns]:
+            _type_name(type_node)
+
+
+def _check_redefinitions(stmts):
+    """Checks that no decorated function of a block is followed by a function
+    of the same name, which mypy would merge as overloads."""
+    for stmt, next_stmt in zip(stmts, stmts[1:]):
+        if isinstance(stmt, _FUNCTIONS) and stmt.decorator_list and \
+                isinstance(next_stmt, _FUNCTIONS) and \
+                next_stmt.name == stmt.name:
+            raise UnsupportedSyntax(f"Overloads of '{stmt.name}'.")
+
+
+def _check_type_comment(node):
+    """Checks a statement has no type comment, as only the ones of functions
+    are supported."""
+    if getattr(node, 'type_comment', None) is not None:
+        raise UnsupportedSyntax(f'Type comment at line {node.lineno}.')
+
+
+def _check_type_params(node):
+    """Checks a definition has no type parameters, which mypy does not
+    know."""
+    if getattr(node, 'type_params', None):
+        raise UnsupportedSyntax(f'Type parameters at line {node.lineno}.')
+
+
+def _check_blocks(node):
+    """Checks the blocks of statements of a node."""
+    for field in ('body', 'orelse', 'finalbody'):
+        stmts = getattr(node, field, None)
+        if stmts:
+            _check_redefinitions(stmts)
+
+
+def _check_loop(node):
+    _check_type_comment(node)
+    _check_blocks(node)
+
+
+def _check_function_def(node):
+    _check_type_params(node)
+    _check_function(node)
+    _check_redefinitions(node.body)
+
+
+def _check_class_def(node):
+    _check_type_params(node)
+    _check_redefinitions(node.body)
+
+
+def _check_ann_assign(node):
+    _type_name(node.annotation)
+
+
+_NODE_CHECKS = dict.fromkeys((
+    'TypeIgnore', 'Return', 'Delete', 'AugAssign', 'Raise', 'Assert',
+    'Import', 'ImportFrom', 'Global', 'Nonlocal', 'Expr', 'Pass', 'Break',
+    'Continue', 'BoolOp', 'BinOp', 'UnaryOp', 'Lambda', 'IfExp', 'Dict',
+    'Set', 'ListComp', 'SetComp', 'DictComp', 'GeneratorExp', 'Await',
+    'Yield', 'YieldFrom', 'Compare', 'Call', 'Constant', 'Num', 'Str',
+    'Bytes', 'NameConstant', 'Ellipsis', 'JoinedStr', 'FormattedValue',
+    'Attribute', 'Subscript', 'Starred', 'Name', 'List', 'Tuple', 'Slice',
+    'ExtSlice', 'Index', 'arguments', 'arg', 'keyword', 'alias',
+    'comprehension',
+))
+_NODE_CHECKS.update(dict.fromkeys(
+    (subclass.__name__ for operator in _OPERATORS
+     for subclass in operator.__subclasses__())))
+_NODE_CHECKS.update({
+    'Module': _check_blocks,
+    'FunctionDef': _check_function_def,
+    'AsyncFunctionDef': _check_function_def,
+    'ClassDef': _check_class_def,
+    'Assign': _check_type_comment,
+    'AnnAssign': _check_ann_assign,
+    'For': _check_loop,
+    'AsyncFor': _check_loop,
+    'While': _check_blocks,
+    'If': _check_blocks,
+    'With': _check_loop,
+    'AsyncWith': _check_loop,
+    'withitem': None,
+    'Try': _check_blocks,
+    'ExceptHandler': _check_blocks,
+})
+"""Check of each syntax node the mypy backend converts, if any. Other nodes,
+such as the ones of newer Python versions, make it fail."""
+
+
+def _check_tree(tree):
+    """Checks that a syntax tree only holds constructs mypy converts like
+    this module expects.
+
+    :raises UnsupportedSyntax: On the first unsupported construct.
+    """
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        node_type = type(node).__name__
+        if node_type not in _NODE_CHECKS:
+            raise UnsupportedSyntax(f'Unsupported syntax: {node_type}.')
+        check = _NODE_CHECKS[node_type]
+        if check is not None:
+            check(node)
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        nodes.append(item)
+            elif isinstance(value, ast.AST):
+                nodes.append(value)
+
+
+def _functions_in_order(tree):
+    """Lists the functions defined in a tree, in the order of their `def`
+    keywords.
+
+    :rtype: list[ast.FunctionDef|ast.AsyncFunctionDef]
+    """
+    functions = []
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, _FUNCTIONS):
+            functions.append(node)
+        nodes.extend(reversed(list(ast.iter_child_nodes(node))))
+    return functions
+
+
+def _read_type_comment(lines, func_def):
+    """Reads the type comment of a function from the tokens of its header.
+
+    A function type comment either follows the colon ending the signature,
+    or comes before the first statement of the body, other comments aside.
+
+    :param lines: Lines of the source code.
+    :type lines: list[str]
+    :param func_def: The function, whose line is the one of its first
+        decorator or of its `def` keyword.
+    :type func_def: ast.FunctionDef|ast.AsyncFunctionDef
+    :return: The type comment of the function, if any.
+    :rtype: str
+    """
+    readline = iter(lines[func_def.lineno - 1:]).__next__
+    state = None
+    depth = 0
+    for token in tokenize.generate_tokens(readline):
+        if state is None:
+            if token.type == tokenize.NAME and token.string == 'def':
+                state = 'signature'
+        elif state == 'signature':
+            if token.string in ('(', '[', '{'):
+                depth += 1
+            elif token.string in (')', ']', '}'):
+                depth -= 1
+            elif token.string == ':' and depth == 0:
+                state = 'colon'
+        elif token.type == tokenize.COMMENT:
+            match = _TYPE_COMMENT_PATTERN.match(token.string)
+            if match:
+                return match.group(1).strip()
+        elif state == 'colon' and token.type == tokenize.NEWLINE:
+            state = 'newline'
+        elif token.type != tokenize.NL:
+            return None
+    raise UnsupportedSyntax(f'Function not found at line {func_def.lineno}.')
+
+
+def _read_type_comments(source, tree):
+    """Sets the type comments of functions on their nodes, as the ast module
+    does from Python 3.8.
+
+    Only the headers of functions are tokenized. Each comment looking like a
+    type comment must be one of them, so that type comments of other
+    statements, or found in strings, hand the contract to mypy.
+
+    :raises UnsupportedSyntax: If the source holds other type comments.
+    """
+    lines = io.StringIO(
+        source.replace('\r\n', '\n').replace('\r', '\n')).readlines()
+    type_comments = 0
+    try:
+        for func_def in _functions_in_order(tree):
+            func_def.type_comment = _read_type_comment(lines, func_def)
+            type_comments += func_def.type_comment is not None
+    except (tokenize.TokenError, SyntaxError) as e:
+        raise UnsupportedSyntax(f'Invalid source: {e}')
+    if type_comments != len(_TYPE_COMMENT_PATTERN.findall(source)):
+        raise UnsupportedSyntax('Type comment outside of a function header.')
+
+
+class _CostVisitor(ast.NodeVisitor):
+    """Walks the body of a function to measure it like the mypy backend.
+
+    Nodes are counted as the mypy nodes they are converted to, which are
+    usually one per syntax node.
+    """
+
+    def __init__(self, module_functions):
+        """Creates a new _CostVisitor.
+
+        :param module_functions: Names of the functions of the module.
+        :type module_functions: set[str]
+        """
+        self.module_functions = module_functions
+        self.cost = FunctionCost()
+        self._loop_depth = 0
+
+    def _enter_loops(self, count=1):
+        self._loop_depth += count
+        self.cost.max_loop_depth = max(self.cost.max_loop_depth,
+                                       self._loop_depth)
+
+    def _visit_all(self, nodes):
+        for node in nodes:
+            if node is not None:
+                self.visit(node)
+
+    def visit_block(self, stmts):
+        """Counts and visits the statements of a block."""
+        self.cost.statements += len(stmts)
+        self._visit_all(stmts)
+
+    def generic_visit(self, node):
+        if isinstance(node, _OPERATORS):
+            return
+        self.cost.nodes += 1
+        super().generic_visit(node)
+
+    def _visit_defaults(self, arguments):
+        self._visit_all(arguments.defaults)
+        self._visit_all(arguments.kw_defaults)
+
+    def visit_FunctionDef(self, node):
+        self.cost.nodes += 2 if node.decorator_list else 1
+        self._visit_all(node.decorator_list)
+        self._visit_defaults(node.args)
+        self.visit_block(node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        # A lambda is a function whose body is a return statement.
+        self.cost.nodes += 2
+        self.cost.statements += 1
+        self._visit_defaults(node.args)
+        self.visit(node.body)
+
+    def visit_ClassDef(self, node):
+        self.cost.nodes += 1
+        self._visit_all(node.decorator_list)
+        self._visit_all(node.bases)
+        self.visit_block(node.body)
+
+    def visit_Delete(self, node):
+        # Several targets are deleted as a tuple.
+        self.cost.nodes += 2 if len(node.targets) > 1 else 1
+        self._visit_all(node.targets)
+
+    def visit_AnnAssign(self, node):
+        # A missing value stands for a node of its own.
+        self.cost.nodes += 1 if node.value is not None else 2
+        self._visit_all((node.value, node.target))
+
+    def visit_For(self, node):
+        self._enter_loops()
+        self.cost.nodes += 1
+        self._visit_all((node.target, node.iter))
+        self.visit_block(node.body)
+        self.visit_block(node.orelse)
+        self._loop_depth -= 1
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self._enter_loops()
+        self.cost.nodes += 1
+        self.visit(node.test)
+        self.visit_block(node.body)
+        self.visit_block(node.orelse)
+        self._loop_depth -= 1
+
+    def visit_If(self, node):
+        self.cost.nodes += 1
+        self.visit(node.test)
+        self.visit_block(node.body)
+        self.visit_block(node.orelse)
+
+    def visit_With(self, node):
+        self.cost.nodes += 1
+        for item in node.items:
+            self._visit_all((item.context_expr, item.optional_vars))
+        self.visit_block(node.body)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Try(self, node):
+        self.cost.nodes += 1
+        self.visit_block(node.body)
+        for handler in node.handlers:
+            # The name of a handler is a node of its own.
+            self.cost.nodes += 1 if handler.name else 0
+            self._visit_all((handler.type,))
+            self.visit_block(handler.body)
+        self.visit_block(node.orelse)
+        self.visit_block(node.finalbody)
+
+    def visit_Import(self, node):
+        self.cost.nodes += 1
+
+    visit_ImportFrom = visit_Import
+
+    def visit_BoolOp(self, node):
+        # Operands are chained by pairs.
+        self.cost.nodes += len(node.values) - 1
+        self._visit_all(node.values)
+
+    def visit_Call(self, node):
+        self.cost.nodes += 1
+        if isinstance(node.func, ast.Name) and \
+                node.func.id in self.module_functions:
+            self.cost.call_sites.append((node.func.id, self._loop_depth))
+        # Unpacked arguments are not nodes of their own.
+        self._visit_all(arg.value if isinstance(arg, ast.Starred) else arg
+                        for arg in node.args)
+        self._visit_all(keyword.value for keyword in node.keywords)
+        self.visit(node.func)
+
+    def visit_JoinedStr(self, node):
+        if _str_value(node) is not None:
+            self.cost.nodes += 1
+            return
+        # A f-string is a call to ''.join() on a list.
+        self.cost.nodes += 4
+        self._visit_all(node.values)
+
+    def visit_FormattedValue(self, node):
+        # Each value is a call to '{}'.format().
+        self.cost.nodes += 3
+        self.visit(node.value)
+
+    def visit_Index(self, node):
+        self.visit(node.value)
+
+    def _visit_generators(self, node, elts):
+        self._enter_loops(len(node.generators))
+        self.cost.nodes += 1
+        for generator in node.generators:
+            self._visit_all((generator.iter, generator.target))
+            self._visit_all(generator.ifs)
+        self._visit_all(elts)
+        self._loop_depth -= len(node.generators)
+
+    def visit_GeneratorExp(self, node):
+        self._visit_generators(node, (node.elt,))
+
+    def visit_ListComp(self, node):
+        # Comprehensions wrap a generator expression.
+        self.cost.nodes += 1
+        self._visit_generators(node, (node.elt,))
+
+    visit_SetComp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_generators(node, (node.key, node.value))
+
+
+def _measure(func_def, module_functions):
+    """Measures a single function.
+
+    :param func_def: The function to measure.
+    :type func_def: ast.FunctionDef|ast.AsyncFunctionDef
+    :param module_functions: Names of the functions of the module.
+    :type module_functions: set[str]
+    :rtype: FunctionCost
+    """
+    visitor = _CostVisitor(module_functions)
+    visitor.visit_block(func_def.body)
+    return visitor.cost
+
+
+def _create_storage_var(name, rvalue):
+    """Examines the value assigned to a storage variable to deduce its value
+    and type, like the mypy backend.
+
+    :param name: Name of the storage variable.
+    :type name: str
+    :param rvalue: Value assigned to the storage variable.
+    :type rvalue: ast.expr
+    :rtype: Variable
+    """
+    node_type = type(rvalue).__name__
+    if node_type in _EMPTY_CONTAINERS:
+        if not (rvalue.keys if node_type == 'Dict' else rvalue.elts):
+            return Variable(name, _EMPTY_CONTAINERS[node_type], [])
+    elif node_type == 'Name':
+        raise ValueError(_NAME_INITIALIZER_ERROR.format(rvalue.id))
+    elif _str_value(rvalue) is not None:
+        return Variable(name, str, _str_value(rvalue))
+    elif node_type in _CONSTANTS:
+        value = _constant_value(rvalue)
+        if value is None or isinstance(value, bool):
+            raise ValueError(_NAME_INITIALIZER_ERROR.format(value))
+        if isinstance(value, (int, float)):
+            return Variable(name, type(value), value)
+        if isinstance(value, bytes):
+            # mypy keeps the escaped content of the literal.
+            return Variable(name, bytes, str(value)[2:-1])
+    raise UnsupportedSyntax(
+        f'Unsupported storage value at line {rvalue.lineno}.')
+
+
+def _extract_storage_vars(tree):
+    """Validates and extracts the storage variables of a contract.
+
+    :rtype: list[Variable]
+    """
+    storage_vars = []
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Assign):
+            targets = stmt.targets
+        elif isinstance(stmt, ast.AnnAssign):
+            targets = [stmt.target]
+        else:
+            continue
+        for target in targets:
+            if not isinstance(target, ast.Name) or target.id.startswith('_'):
+                continue
+            if stmt.value is None:
+                raise UnsupportedSyntax(
+                    f'Storage variable without value at line {stmt.lineno}.')
+            storage_vars.append(_create_storage_var(target.id, stmt.value))
+    return storage_vars
+
+
+def _signature(func_def):
+    """Gets the type names of the parameters and of the return value of a
+    function, None standing for a missing annotation.
+
+    :rtype: tuple[list[str|None],str|None]
+    """
+    if getattr(func_def, 'type_comment', None) is not None:
+        func_type = _parse_func_type(func_def.type_comment)
+        return ([_type_name(type_node) for type_node in func_type.argtypes],
+                _type_name(func_type.returns))
+    return (
+        [_type_name(arg.annotation) if arg.annotation is not None else None
+         for arg in _all_args(func_def.args)],
+        _type_name(func_def.returns) if func_def.returns is not None else
+        None
+    )
+
+
+def _create_endpointdef(func_def, cost_analyser):
+    """Validates a function of the contract and creates an endpoint out of it.
+
+    :param func_def: The function to turn into an endpoint.
+    :type func_def: ast.FunctionDef|ast.AsyncFunctionDef
+    :param cost_analyser: Analyser of the module the endpoint belongs to.
+    :type cost_analyser: CostAnalyser
+    :rtype: EndPointDef
+    """
+    arg_types, return_type = _signature(func_def)
+    if return_type is None and all(typ is None for typ in arg_types):
+        raise ValueError(
+            f"line {func_def.lineno}: error: Required type hint or "
+            f"annotation is missing for endpoint '{func_def.name}'.")
+    if None in arg_types:
+        raise ValueError(
+            f"line {func_def.lineno}: error: typing is missing for some "
+            f"parameters in type annotation of '{func_def.name}'.")
+    if return_type is None:
+        raise UnsupportedSyntax(f"No return type for '{func_def.name}'.")
+
+    arg_names = [arg.arg for arg in _all_args(func_def.args)]
+    if any(arg_name.startswith('__') for arg_name in arg_names):
+        raise UnsupportedSyntax(f"Elided parameter in '{func_def.name}'.")
+
+    docs = [_str_value(stmt.value) for stmt in func_def.body
+            if isinstance(stmt, ast.Expr) and
+            _str_value(stmt.value) is not None]
+    return EndPointDef(
+        func_def.name,
+        return_type,
+        [TypedNamed(arg_name, arg_type)
+         for arg_name, arg_type in zip(arg_names, arg_types)],
+        docs[0] if docs else None,
+        cost_analyser.profile(func_def.name)
+    )
+
+
+def _extract_endpoints(tree):
+    """Validates and extracts the endpoints of a contract.
+
+    :rtype: list[EndPointDef]
+    """
+    functions = {stmt.name: stmt for stmt in tree.body
+                 if isinstance(stmt, _FUNCTIONS)}
+    names = set(functions)
+    cost_analyser = CostAnalyser({
+        name: _measure(func_def, names)
+        for name, func_def in functions.items()
+    })
+    return [
+        _create_endpointdef(stmt, cost_analyser)
+        for stmt in tree.body
+        if isinstance(stmt, _FUNCTIONS) and not stmt.decorator_list and
+        not stmt.name.startswith('_')
+    ]
+
+
+def parse(source, filename):
+    """Parses provided source code and returns its interface if successful.
+
+    :param source: The source code of the contract to parse.
+    :type source: str
+    :param filename: The name of the file the contract comes from.
+    :type filename: str
+    :return: The generated interface.
+    :rtype: ContractInterface
+    :raises ValueError: If the contract is invalid.
+    :raises UnsupportedSyntax: If the contract must be parsed by mypy.
+    """
+    try:
+        if _TYPE_COMMENTS:
+            tree = ast.parse(source, filename, type_comments=True)
+        else:
+            tree = ast.parse(source, filename)
+    except (SyntaxError, ValueError) as e:
+        raise UnsupportedSyntax(f'Invalid source: {e}')
+    if not _TYPE_COMMENTS and _TYPE_COMMENT_PATTERN.search(source):
+        _read_type_comments(source, tree)
+    _check_tree(tree)
+
+    storage_vars = _extract_storage_vars(tree)
+    endpoints = _extract_endpoints(tree)
+    contract_name = filename.split('.')[0]
+    return ContractInterface(contract_name, storage_vars, endpoints)
@@ -0,0 +1,229 @@
+"""This module caches the results of contract parsing.
+
+Parsing a contract gives the same result, interface or error, as long as its
+source, its file name, the parsing backend, the format of the results,
+pikciosc and mypy do not change. Results are kept in memory and, if
+PKC_SC_PARSE_CACHE_DIR is set, on disk so that they survive restarts. Both
+caches keep at most PKC_SC_PARSE_CACHE_SIZE results (256 by default), the
+least recently used ones being evicted first.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from pikciosc import __version__
+
+ENV_PKC_SC_PARSE_CACHE_DIR = 'PKC_SC_PARSE_CACHE_DIR'
+ENV_PKC_SC_PARSE_CACHE_SIZE = 'PKC_SC_PARSE_CACHE_SIZE'
+
+_ENTRY_EXT = '.json'
+
+PARSE_RESULT_FORMAT = 1
+"""Version of the parsing results. Must be bumped whenever parsing or the
+interfaces and cost profiles it produces change, to ignore cached results."""
+
+
+_MYPY_VERSION = None
+
+
+def _get_mypy_version():
+    """Gets the version of mypy, importing it on first use only.
+
+    :return: The version, or an empty string if mypy is not installed.
+    :rtype: str
+    """
+    global _MYPY_VERSION
+    if _MYPY_VERSION is None:
+        try:
+            from mypy.version import __version__ as mypy_version
+        except ImportError:
+            mypy_version = ''
+        _MYPY_VERSION = mypy_version
+    return _MYPY_VERSION
+
+
+class ParseError(ValueError):
+    """Raised when a contract fails to parse."""
+
+
+class ParseCache(object):
+    """Memory and disk cache of parsing results, keyed by content."""
+
+    def __init__(self, folder=None, max_entries=256):
+        """Creates a new ParseCache.
+
+        :param folder: Optional folder where results are persisted.
+        :type folder: str
+        :param max_entries: Maximum number of results kept in memory, and on
+            disk.
+        :type max_entries: int
+        """
+        self.folder = folder
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def get_key(source, filename, backend):
+        """Computes the key of the result of a parse.
+
+        :param source: The source code of the contract.
+        :type source: str
+        :param filename: The name of the file the contract comes from.
+        :type filename: str
+        :param backend: Name of the parsing backend.
+        :type backend: str
+        :rtype: str
+        """
+        digest = hashlib.sha256(source.encode())
+        digest.update(f'\0{filename}\0{backend}\0{PARSE_RESULT_FORMAT}'
+                      f'\0{__version__}\0{_get_mypy_version()}'.encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.folder, key + _ENTRY_EXT)
+
+    def get(self, key):
+        """Gets a cached result.
+
+        :param key: Key of the result.
+        :type key: str
+        :return: The interface as a dictionary, or a dictionary with a single
+            'error' message. None if not cached.
+        :rtype: dict|None
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        if self.folder:
+            result = self._read_entry(key)
+            if result is not None:
+                self._remember(key, result)
+                with self._lock:
+                    self.hits += 1
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """Caches a result.
+
+        :param key: Key of the result.
+        :type key: str
+        :param result: The interface as a dictionary, or a dictionary with a
+            single 'error' message.
+        :type result: dict
+        """
+        self._remember(key, result)
+        if self.folder:
+            self._write_entry(key, result)
+            self._evict_entries()
+
+    def _remember(self, key, result):
+        """Keeps a result in memory."""
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_entry(self, key):
+        """Reads a result from disk, marking it as recently used.
+
+        :rtype: dict|None
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path) as fd:
+                result = json.load(fd)
+            os.utime(entry_path)
+            return result
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logging.warning(f'Dropping corrupted parse cache entry {key}.')
+            self._remove_entry(entry_path)
+            return None
+
+    def _write_entry(self, key, result):
+        """Writes a result to disk atomically."""
+        import uuid  # Slow to load, and only needed by the disk cache.
+
+        entry_path = self._entry_path(key)
+        temp_path = f'{entry_path}.{uuid.uuid4()}.tmp'
+        try:
+            with open(temp_path, 'w') as fd:
+                json.dump(result, fd)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            logging.warning(f'Could not persist parse cache entry: {e}')
+        finally:
+            self._remove_entry(temp_path)
+
+    @staticmethod
+    def _remove_entry(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict_entries(self):
+        """Removes the least recently used results from disk, past the
+        maximum number of entries."""
+        entries = []
+        for file_name in os.listdir(self.folder):
+            if not file_name.endswith(_ENTRY_EXT):
+                continue
+            path = os.path.join(self.folder, file_name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path))
+            except FileNotFoundError:
+                continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            self._remove_entry(path)
+
+    def clear(self):
+        """Drops all the results, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+        if self.folder:
+            for file_name in os.listdir(self.folder):
+                if file_name.endswith(_ENTRY_EXT):
+                    self._remove_entry(os.path.join(self.folder, file_name))
+
+
+_PARSE_CACHE = None
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def get_parse_cache():
+    """Gets the parse cache of the process, configured from the environment
+    on first use.
+
+    :rtype: ParseCache
+    """
+    global _PARSE_CACHE
+    with _PARSE_CACHE_LOCK:
+        if _PARSE_CACHE is None:
+            _PARSE_CACHE = ParseCache(
+                os.environ.get(ENV_PKC_SC_PARSE_CACHE_DIR) or None,
+                int(os.environ.get(ENV_PKC_SC_PARSE_CACHE_SIZE, 256))
+            )
+        return _PARSE_CACHE
@@ -0,0 +1,178 @@
+"""This module encapsulates the static cost analysis of Smart Contract (SC)
+endpoints from their source code.
+
+Each module function is measured on its own by the parsing backend, then
+endpoints aggregate the measures of the module functions they call,
+transitively.
+"""
+from pikciosc.models import CostProfile
+
+
+class FunctionCost(object):
+    """Static measures of a single function, excluding the functions it
+    calls."""
+
+    def __init__(self):
+        self.statements = 0
+        self.nodes = 0
+        self.max_loop_depth = 0
+        self.call_sites = []
+        """Names of the module functions called, with the loop depth of each
+        call site."""
+
+
+class CostAnalyser(object):
+    """Computes the cost profiles of the functions of a module."""
+
+    def __init__(self, costs):
+        """Creates a new CostAnalyser from the measures of each function.
+
+        :param costs: Measures of every function of the module, by name.
+        :type costs: dict[str,FunctionCost]
+        """
+        self._costs = costs
+        self._profiles = {}
+        self._loop_depths = None
+        self._cyclic = None
+
+    def _components(self):
+        """Lists the strongly connected components of the call graph, with
+        Tarjan's algorithm. Functions of a component call each other,
+        possibly through other functions of the component.
+
+        :return: The components, callees coming before their callers.
+        :rtype: list[list[str]]
+        """
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in self._costs:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            # Explicit stack, so that long call chains can't overflow.
+            work = [(root, iter(self._costs[root].call_sites))]
+            while work:
+                current, call_sites = work[-1]
+                for callee, _ in call_sites:
+                    if callee not in index:
+                        index[callee] = lowlink[callee] = len(index)
+                        stack.append(callee)
+                        on_stack.add(callee)
+                        work.append(
+                            (callee, iter(self._costs[callee].call_sites)))
+                        break
+                    if callee in on_stack:
+                        lowlink[current] = min(lowlink[current],
+                                               index[callee])
+                else:
+                    work.pop()
+                    if work:
+                        caller = work[-1][0]
+                        lowlink[caller] = min(lowlink[caller],
+                                              lowlink[current])
+                    if lowlink[current] == index[current]:
+                        component = []
+                        while not component or component[-1] != current:
+                            component.append(stack.pop())
+                            on_stack.discard(component[-1])
+                        components.append(component)
+        return components
+
+    def _analyse_call_graph(self):
+        """Computes the deepest loop nesting reached by each function, through
+        the loops enclosing its call sites, and tells which functions are part
+        of a call cycle.
+
+        Call cycles are followed once: the functions of a cycle share the
+        deepest nesting reached by going once through one of its calls.
+        """
+        self._loop_depths = {}
+        self._cyclic = {}
+        for component in self._components():
+            members = set(component)
+            local_depths = {}
+            for member in component:
+                cost = self._costs[member]
+                local_depths[member] = max([cost.max_loop_depth] + [
+                    site_depth + self._loop_depths[callee]
+                    for callee, site_depth in cost.call_sites
+                    if callee not in members
+                ])
+            depth = max([local_depths[member] for member in component] + [
+                site_depth + local_depths[callee]
+                for member in component
+                for callee, site_depth in self._costs[member].call_sites
+                if callee in members
+            ])
+            cyclic = len(component) > 1 or any(
+                callee == component[0]
+                for callee, _ in self._costs[component[0]].call_sites)
+            for member in component:
+                self._loop_depths[member] = depth
+                self._cyclic[member] = cyclic
+
+    def _reachable(self, name):
+        """Lists the functions reachable from provided one, itself included.
+
+        :return: The reachable functions, callees coming before their callers
+            unless they are part of a call cycle.
+        :rtype: list[str]
+        """
+        reachable = []
+        reached = {name}
+        work = [(name, iter(self._costs[name].call_sites))]
+        while work:
+            current, call_sites = work[-1]
+            for callee, _ in call_sites:
+                if callee not in reached:
+                    reached.add(callee)
+                    work.append((callee, iter(self._costs[callee].call_sites)))
+                    break
+            else:
+                work.pop()
+                reachable.append(current)
+        return reachable
+
+    def _upper_bound(self, name, reachable_names, recursive):
+        """Computes the maximum number of nodes evaluated by a call to
+        provided function, if it has neither loops nor recursion.
+
+        :rtype: int|None
+        """
+        if recursive or any(self._costs[reached].max_loop_depth
+                            for reached in reachable_names):
+            return None
+        bounds = {}
+        # Callees come first in reachable_names.
+        for reached in reachable_names:
+            cost = self._costs[reached]
+            bounds[reached] = cost.nodes + sum(
+                bounds[callee] for callee, _ in cost.call_sites)
+        return bounds[name]
+
+    def profile(self, name):
+        """Gets the cost profile of a module function.
+
+        :param name: Name of the function.
+        :type name: str
+        :rtype: CostProfile
+        """
+        if self._loop_depths is None:
+            self._analyse_call_graph()
+        if name not in self._profiles:
+            reachable = self._reachable(name)
+            recursive = any(self._cyclic[reached] for reached in reachable)
+            self._profiles[name] = CostProfile(
+                sum(self._costs[reached].statements for reached in reachable),
+                sum(self._costs[reached].nodes for reached in reachable),
+                self._loop_depths[name],
+                sorted(reached for reached in reachable if reached != name),
+                recursive,
+                self._upper_bound(name, reachable, recursive)
+            )
+        return self._profiles[name]
@@ -5,6 +5,8 @@ from mypy.nodes import FuncDef, StrExpr, ExpressionStmt
 from mypy.types import AnyType
 
 from pikciosc.models import EndPointDef, TypedNamed
+from pikciosc.parse.cost import CostAnalyser
+from pikciosc.parse.mypy_cost import measure_functions
 
 
 def _is_valid_endpoint(def_):
@@ -68,7 +70,7 @@ def _extract_documentation_if_any(raw_endpoint):
     return string_expressions[0].value if string_expressions else None
 
 
-def _create_endpointdef(raw_endpoint):
+def _create_endpointdef(raw_endpoint, cost_analyser):
     """Analyses candidate endpoint resulting from compilation and creates an
     endpoint out of it.
 
@@ -76,6 +78,8 @@ def _create_endpointdef(raw_endpoint):
 
     :param raw_endpoint: The raw endpoint resulting from extraction.
     :type raw_endpoint: FuncDef
+    :param cost_analyser: Analyser of the module the endpoint belongs to.
+    :type cost_analyser: CostAnalyser
     :return: The resulting Pikcio endpoint.
     :rtype EndPointDef
     """
@@ -85,7 +89,8 @@ def _create_endpointdef(raw_endpoint):
         raw_endpoint.name(),
         raw_endpoint.type.ret_type.name,
         _extract_parameters(raw_endpoint),
-        _extract_documentation_if_any(raw_endpoint)
+        _extract_documentation_if_any(raw_endpoint),
+        cost_analyser.profile(raw_endpoint.name())
     )
 
 
@@ -97,8 +102,9 @@ def extract_endpoints(compiled_source):
     :return: A list of all the valid endpoints in the compiled code.
     :rtype: list[EndPointDef]
     """
+    cost_analyser = CostAnalyser(measure_functions(compiled_source))
     return [
-        _create_endpointdef(def_)
+        _create_endpointdef(def_, cost_analyser)
         for def_ in compiled_source.defs
         if _is_valid_endpoint(def_)
     ]
@@ -0,0 +1,125 @@
+"""This module measures the functions of a Smart Contract (SC) parsed by mypy,
+for the static cost analysis.
+"""
+from mypy.nodes import Decorator, FuncDef, NameExpr
+from mypy.traverser import TraverserVisitor
+
+from pikciosc.parse.cost import FunctionCost
+
+_NOT_NODES = ('visit_block', 'visit_func', 'visit_mypy_file', 'visit_var')
+"""Visit methods which do not stand for a syntax node of the source."""
+
+
+class _CostVisitor(TraverserVisitor):
+    """Walks the body of a function to measure it.
+
+    Every visited node is counted by the methods generated below.
+    """
+
+    def __init__(self, module_functions):
+        """Creates a new _CostVisitor.
+
+        :param module_functions: Names of the functions of the module.
+        :type module_functions: set[str]
+        """
+        super().__init__()
+        self.module_functions = module_functions
+        self.cost = FunctionCost()
+        self._loop_depth = 0
+
+    def _enter_loops(self, count=1):
+        self._loop_depth += count
+        self.cost.max_loop_depth = max(self.cost.max_loop_depth,
+                                       self._loop_depth)
+
+    def visit_block(self, block):
+        self.cost.statements += len(block.body)
+        super().visit_block(block)
+
+    def visit_for_stmt(self, o):
+        self._enter_loops()
+        super().visit_for_stmt(o)
+        self._loop_depth -= 1
+
+    def visit_while_stmt(self, o):
+        self._enter_loops()
+        super().visit_while_stmt(o)
+        self._loop_depth -= 1
+
+    def visit_generator_expr(self, o):
+        self._enter_loops(len(o.sequences))
+        super().visit_generator_expr(o)
+        self._loop_depth -= len(o.sequences)
+
+    def visit_dictionary_comprehension(self, o):
+        self._enter_loops(len(o.sequences))
+        super().visit_dictionary_comprehension(o)
+        self._loop_depth -= len(o.sequences)
+
+    def visit_call_expr(self, o):
+        if isinstance(o.callee, NameExpr) and \
+                o.callee.name in self.module_functions:
+            self.cost.call_sites.append((o.callee.name, self._loop_depth))
+        super().visit_call_expr(o)
+
+
+def _counting(visit):
+    """Wraps a visit method so that it counts the visited node."""
+    def counting_visit(self, node):
+        self.cost.nodes += 1
+        return visit(self, node)
+    counting_visit.__name__ = visit.__name__
+    return counting_visit
+
+
+for _name in dir(_CostVisitor):
+    if _name.startswith('visit_') and _name not in _NOT_NODES:
+        setattr(_CostVisitor, _name,
+                _counting(getattr(_CostVisitor, _name)))
+
+
+def _module_functions(compiled_source):
+    """Lists the functions defined at the top level of a module.
+
+    :param compiled_source: The compiled code resulting of a mypy parse.
+    :type compiled_source: MypyFile
+    :return: The functions, by name.
+    :rtype: dict[str,FuncDef]
+    """
+    functions = {}
+    for def_ in compiled_source.defs:
+        if isinstance(def_, Decorator):
+            def_ = def_.func
+        if isinstance(def_, FuncDef):
+            functions[def_.name()] = def_
+    return functions
+
+
+def _measure(func_def, module_functions):
+    """Measures a single function.
+
+    :param func_def: The function to measure.
+    :type func_def: FuncDef
+    :param module_functions: Names of the functions of the module.
+    :type module_functions: set[str]
+    :rtype: FunctionCost
+    """
+    visitor = _CostVisitor(module_functions)
+    func_def.body.accept(visitor)
+    return visitor.cost
+
+
+def measure_functions(compiled_source):
+    """Measures every function defined at the top level of a module.
+
+    :param compiled_source: The compiled code resulting of a mypy parse.
+    :type compiled_source: MypyFile
+    :return: The measures of each function, by name.
+    :rtype: dict[str,FunctionCost]
+    """
+    functions = _module_functions(compiled_source)
+    names = set(functions)
+    return {
+        name: _measure(func_def, names)
+        for name, func_def in functions.items()
+    }
@@ -2,31 +2,40 @@
 
 It provides entrypoints to validate a Smart Contract and generate its
 interface.
+
+Two backends are available. `mypy` parses contracts with mypy. `ast`, the
+default, parses them with the standard library and falls back to mypy on the
+contracts it does not support, generating the same interfaces and errors much
+faster. The default backend can be changed with PKC_SC_PARSE_BACKEND.
 """
 import json
 import logging
+import os
+import sys
 from argparse import ArgumentParser
 
-from mypy.build import parse, Options
-from mypy.errors import CompileError
-
 from pikciosc.models import ContractInterface
-from pikciosc.parse.endpoint import extract_endpoints
-from pikciosc.parse.storage import extract_storage_vars
+from pikciosc.parse import ast_parser
+from pikciosc.parse.cache import ParseError, get_parse_cache
 
+ENV_PKC_SC_PARSE_BACKEND = 'PKC_SC_PARSE_BACKEND'
 
-def parse_string(source, filename):
-    """Parses provided source code and returns its interface if successful.
+BACKEND_AST = 'ast'
+BACKEND_MYPY = 'mypy'
+BACKENDS = (BACKEND_AST, BACKEND_MYPY)
 
-    Raises an exception otherwise.
 
-    :param source: The source code of the contract to parse.
-    :type source: str
-    :param filename: The name of the file the contract comes from.
-    :type filename: str
-    :return: The generated interface.
+def _parse_mypy(source, filename):
+    """Parses provided source code with mypy, without cache.
+
+    mypy is imported on first use, as it is slow to load.
+
     :rtype: ContractInterface
     """
+    from mypy.build import parse, Options
+    from pikciosc.parse.endpoint import extract_endpoints
+    from pikciosc.parse.storage import extract_storage_vars
+
     logging.debug('Compiling source_code...')
     compiled = parse(source, filename, '__main__', None, options=Options())
     logging.debug('Done.')
@@ -47,7 +56,114 @@ def parse_string(source, filename):
     return interface
 
 
-def parse_file_cli(source_path):
+def _parse_ast(source, filename):
+    """Parses provided source code with the ast module, or with mypy if it is
+    not supported, without cache.
+
+    :rtype: ContractInterface
+    """
+    try:
+        return ast_parser.parse(source, filename)
+    except ast_parser.UnsupportedSyntax as e:
+        logging.debug(f'Parsing with mypy: {e}')
+        return _parse_mypy(source, filename)
+
+
+_BACKEND_PARSERS = {
+    BACKEND_AST: _parse_ast,
+    BACKEND_MYPY: _parse_mypy,
+}
+
+
+def _get_backend(backend=None):
+    """Gets the name of the backend to use, from the environment by default.
+
+    :param backend: Name of the backend, if chosen by the caller.
+    :type backend: str
+    :rtype: str
+    """
+    backend = backend or os.environ.get(ENV_PKC_SC_PARSE_BACKEND, BACKEND_AST)
+    if backend not in _BACKEND_PARSERS:
+        raise ValueError(f"Unknown parse backend '{backend}'. Expected one "
+                         f"of {', '.join(BACKENDS)}.")
+    return backend
+
+
+def _is_parse_error(error):
+    """Tells whether an exception reports an invalid contract.
+
+    Compilation errors can only come from mypy, so they are only checked once
+    it has been loaded.
+
+    :type error: Exception
+    :rtype: bool
+    """
+    if isinstance(error, (ValueError, NotImplementedError)):
+        return True
+    mypy_errors = sys.modules.get('mypy.errors')
+    return mypy_errors is not None and \
+        isinstance(error, mypy_errors.CompileError)
+
+
+def _parse(source, filename, backend):
+    """Parses provided source code with provided backend, without cache.
+
+    :rtype: ContractInterface
+    """
+    return _BACKEND_PARSERS[backend](source, filename)
+
+
+def _parse_cached(source, filename, backend):
+    """Parses provided source code through the parse cache.
+
+    :return: The generated interface, and whether it comes from the cache.
+    :rtype: tuple[ContractInterface,bool]
+    """
+    cache = get_parse_cache()
+    key = cache.get_key(source, filename, backend)
+    result = cache.get(key)
+    if result is not None:
+        logging.debug(f'Parse cache hit for {key}.')
+        if 'error' in result:
+            raise ParseError(result['error'])
+        return ContractInterface.from_dict(result), True
+
+    logging.debug(f'Parse cache miss for {key}.')
+    try:
+        interface = _parse(source, filename, backend)
+    except Exception as e:
+        if _is_parse_error(e):
+            cache.put(key, {'error': str(e)})
+        raise
+    cache.put(key, interface.to_dict())
+    return interface, False
+
+
+def parse_string(source, filename, use_cache=True, backend=None):
+    """Parses provided source code and returns its interface if successful.
+
+    Raises an exception otherwise. Results are cached, errors included: an
+    error read from the cache is raised as a ParseError.
+
+    :param source: The source code of the contract to parse.
+    :type source: str
+    :param filename: The name of the file the contract comes from.
+    :type filename: str
+    :param use_cache: If False, the parse cache is bypassed.
+    :type use_cache: bool
+    :param backend: Name of the parsing backend, PKC_SC_PARSE_BACKEND or
+        'ast' by default.
+    :type backend: str
+    :return: The generated interface.
+    :rtype: ContractInterface
+    """
+    backend = _get_backend(backend)
+    if not use_cache:
+        return _parse(source, filename, backend)
+    return _parse_cached(source, filename, backend)[0]
+
+
+def parse_file_cli(source_path, use_cache=True, backend=None):
     """Parses provided source code in a file to generate a contract interface.
 
     If the code cannot be parsed or code fails to validate, interface won't be
@@ -55,21 +171,39 @@ def parse_file_cli(source_path):
 
     :param source_path: Path to the file containing the code.
     :type source_path: str
+    :param use_cache: If False, the parse cache is bypassed.
+    :type use_cache: bool
+    :param backend: Name of the parsing backend, PKC_SC_PARSE_BACKEND or
+        'ast' by default.
+    :type backend: str
     :return: A dictionary encapsulating a parsing result.
     :rtype: dict
     """
+    backend = _get_backend(backend)
     with open(source_path) as fd:
         code = fd.read()
     try:
-        sc_interface = parse_string(code, 'submitted_code')
+        if not use_cache:
+            return _parse(code, 'submitted_code', backend).to_dict()
+        sc_interface, cache_hit = _parse_cached(code, 'submitted_code',
+                                                backend)
+        if cache_hit:
+            logging.info(f"Interface of '{source_path}' read from the parse "
+                         f"cache.")
         return sc_interface.to_dict()
-    except (CompileError, ValueError, NotImplementedError) as e:
+    except Exception as e:
+        if not _is_parse_error(e):
+            raise
         logging.error(e)
         return {'error': str(e)}
 
 
-def _parse_args():
-    """Loads the arguments from the command line."""
+def _parse_args(argv=None):
+    """Loads the arguments from the command line.
+
+    :param argv: Arguments to load instead of the ones of the process.
+    :type argv: list[str]
+    """
     parser = ArgumentParser(description='Pikcio Smart Contract Parsing '
                                         'module.')
     parser.add_argument("file", type=str, help='source code file to parse')
@@ -77,16 +211,25 @@ def _parse_args():
                         help='If positive, prettify the output json with tabs')
     parser.add_argument("-o", "--output", type=str, dest='output',
                         help='Path to the generated interface.')
-    known_args, _ = parser.parse_known_args()
-    return known_args.file, known_args.indent, known_args.output
+    parser.add_argument("--no-cache", action='store_false', dest='use_cache',
+                        help='Bypass the parse cache.')
+    parser.add_argument("-b", "--backend", choices=BACKENDS,
+                        help='Parsing backend, PKC_SC_PARSE_BACKEND or ast '
+                             'by default.')
+    known_args, _ = parser.parse_known_args(argv)
+    return (
+        known_args.file, known_args.indent, known_args.output,
+        known_args.use_cache, known_args.backend
+    )
 
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
-    args_file, indent, output_path = _parse_args()
-    result = json.dumps(parse_file_cli(args_file), indent=indent)
+    args_file, indent, output_path, use_cache, backend = _parse_args()
+    result = json.dumps(parse_file_cli(args_file, use_cache, backend),
+                        indent=indent)
     if output_path:
         with open(output_path, 'w') as outfile:
             outfile.write(result)
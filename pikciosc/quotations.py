@@ -9,7 +9,8 @@ import importlib.util
 from argparse import ArgumentParser
 from os import environ
 
-from pikciosc.compile import compile_source
+from pikciosc.compile import compile_to_bytes, build_quotation_table, \
+    get_quotation_table_path
 
 ENV_PKC_SC_SUBMIT_CHAR_COST = 'PKC_SC_SUBMIT_CHAR_COST'
 ENV_PKC_SC_EXEC_LINE_COST = 'PKC_SC_EXEC_LINE_COST'
@@ -70,6 +71,20 @@ def _unit_cost(env_var):
     return float(raw_unit_cost)
 
 
+def _get_submitted_filename():
+    """Gets the file name submitted source code is compiled under.
+
+    Submitted code used to be compiled from a temporary file. The compiled
+    code embeds its file name, so a name of the same length keeps quotes
+    unchanged.
+
+    :rtype: str
+    """
+    import tempfile
+    import uuid
+    return os.path.join(tempfile.gettempdir(), f'{str(uuid.uuid4())}.py')
+
+
 def get_submit_quotation(source):
     """Creates and returns a quotation for submitting provided source code.
 
@@ -81,14 +96,10 @@ def get_submit_quotation(source):
     :return: The quotation.
     :rtype: Quotation
     """
-    bytecode_path = compile_source(source)
-    try:
-        with open(bytecode_path, 'rb') as fd:
-            code_len = len(base64.encodebytes(fd.read()))
-        cost_per_char = _unit_cost(ENV_PKC_SC_SUBMIT_CHAR_COST)
-        return Quotation(code_len, cost_per_char)
-    finally:
-        os.remove(bytecode_path)
+    code_len = len(base64.encodebytes(
+        compile_to_bytes(source, _get_submitted_filename())))
+    cost_per_char = _unit_cost(ENV_PKC_SC_SUBMIT_CHAR_COST)
+    return Quotation(code_len, cost_per_char)
 
 
 def _load_module(module_path):
@@ -111,6 +122,69 @@ def _load_module(module_path):
     return module
 
 
+def _legacy_line_count(compiled_file, endpoint_name):
+    """Counts the lines of an endpoint of a contract compiled without
+    quotation table. The contract module is executed to find its source.
+
+    :rtype: int
+    """
+    module = _load_module(compiled_file)
+    endpoint = getattr(module, endpoint_name)
+    # Please note that here, "lines" contains the endpoint name and comments
+    # as well.
+    lines, _ = inspect.getsourcelines(endpoint)
+    return len(lines)
+
+
+def load_quotation_table(contract_file):
+    """Loads the quotation table of a contract, without executing it.
+
+    :param contract_file: Path to the contract source or bytecode.
+    :type contract_file: str
+    :return: The number of lines of each endpoint, by name, or None if the
+        contract has been compiled without quotation table.
+    :rtype: dict[str,int]|None
+    """
+    if contract_file.endswith('.py'):
+        with open(contract_file) as fd:
+            return build_quotation_table(fd.read())
+    try:
+        with open(get_quotation_table_path(contract_file)) as fd:
+            return json.load(fd)
+    except FileNotFoundError:
+        return None
+
+
+def get_exec_quotations(calls):
+    """Creates and returns the quotations for executing many endpoints.
+
+    The quotation table of each contract is read once, and the contracts
+    are not executed unless they have been compiled without table.
+
+    :param calls: Couples of contract path (source or bytecode) and
+        endpoint name.
+    :type calls: list[tuple[str,str]]
+    :return: The quotations, in the order of the calls.
+    :rtype: list[Quotation]
+    """
+    cost_per_line = _unit_cost(ENV_PKC_SC_EXEC_LINE_COST)
+    tables = {}
+    quotations = []
+    for contract_file, endpoint_name in calls:
+        if contract_file not in tables:
+            tables[contract_file] = load_quotation_table(contract_file)
+        table = tables[contract_file]
+        if table is None:
+            line_count = _legacy_line_count(contract_file, endpoint_name)
+        elif endpoint_name in table:
+            line_count = table[endpoint_name]
+        else:
+            raise ValueError(f"Endpoint '{endpoint_name}' not found in "
+                             f"'{contract_file}'.")
+        quotations.append(Quotation(line_count, cost_per_line))
+    return quotations
+
+
 def get_exec_quotation(compiled_file, endpoint_name):
     """Creates and returns a quotation for executing provided endpoint.
 
@@ -121,14 +195,7 @@ def get_exec_quotation(compiled_file, endpoint_name):
     :return: The quotation.
     :rtype: Quotation
     """
-    module = _load_module(compiled_file)
-    endpoint = getattr(module, endpoint_name)
-    # Please note that here, "lines" contains the endpoint name and comments
-    # as well.
-    lines, _ = inspect.getsourcelines(endpoint)
-
-    cost_per_line = _unit_cost(ENV_PKC_SC_EXEC_LINE_COST)
-    return Quotation(len(lines), cost_per_line)
+    return get_exec_quotations([(compiled_file, endpoint_name)])[0]
 
 
 def get_submit_quotation_cli(source_file):
@@ -144,8 +211,12 @@ def get_submit_quotation_cli(source_file):
     return get_submit_quotation(source)
 
 
-def _parse_args():
-    """Loads the arguments from the command line."""
+def _parse_args(argv=None):
+    """Loads the arguments from the command line.
+
+    :param argv: Arguments to load instead of the ones of the process.
+    :type argv: list[str]
+    """
     parser = ArgumentParser(description='Pikcio Smart Contract Quotation '
                                         'module.')
     parser.add_argument("service", choices=['submit', 'invoke'],
@@ -156,10 +227,10 @@ def _parse_args():
                         help='Invoked endpoint (for invocation service only)')
     parser.add_argument("-o", "--output", type=str, dest='output',
                         help='Path to the generated interface.')
-    known_args, _ = parser.parse_known_args()
+    known_args, _ = parser.parse_known_args(argv)
     return (
         known_args.service, known_args.file, known_args.endpoint,
-        known_args.indent, known_args.output
+        known_args.output
     )
 
 
@@ -167,7 +238,7 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
-    service, args_file, _endpoint, indent, output_path = _parse_args()
+    service, args_file, _endpoint, output_path = _parse_args()
     if service == 'submit':
         quotation = get_submit_quotation_cli(args_file)
     elif service == 'invoke':
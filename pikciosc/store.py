@@ -0,0 +1,227 @@
+"""This module stores compiled contracts by content.
+
+A contract is compiled once per source code, Python bytecode version and
+optimization level, whatever the number of names it is submitted under. The
+store folder contains:
+
+- `objects/<ab>/<key>.pyc`: compiled contracts, sharded by the first two
+  characters of their key, the SHA-256 of what they are compiled from. The
+  quotation table of each contract is stored next to it.
+- `objects/<ab>/<key>.sha256`: digest of the compiled contract, checked
+  before it is used.
+- `names/<contract>`: key of the contract stored under each name.
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import uuid
+
+from pikciosc.compile import OPTIMIZE_LEVEL, compile_source
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+_SHARD_LENGTH = 2
+
+
+def _sha256_file(path):
+    """Computes the SHA-256 of the content of a file.
+
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    """Replaces the content of a file in a single step.
+
+    :param path: Path to the file.
+    :type path: str
+    :param text: New content of the file.
+    :type text: str
+    """
+    temp_path = f'{path}.{uuid.uuid4()}.tmp'
+    try:
+        with open(temp_path, 'w') as fd:
+            fd.write(text)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_objects_folder(script_path):
+    """Gets the objects folder of the store a compiled contract comes from.
+
+    :param script_path: Path to a compiled contract.
+    :type script_path: str
+    :return: The objects folder, or None if the contract is not stored in an
+        artifact store.
+    :rtype: str|None
+    """
+    shard_folder = os.path.dirname(os.path.abspath(script_path))
+    objects_folder = os.path.dirname(shard_folder)
+    key, ext = os.path.splitext(os.path.basename(script_path))
+    if ext == '.pyc' and _KEY_PATTERN.match(key) and \
+            os.path.basename(shard_folder) == key[:_SHARD_LENGTH] and \
+            os.path.basename(objects_folder) == 'objects':
+        return objects_folder
+    return None
+
+
+class ArtifactStore(object):
+    """Content-addressed store of compiled contracts."""
+
+    def __init__(self, folder):
+        """Opens a store, creating its folders if necessary.
+
+        :param folder: Root folder of the store.
+        :type folder: str
+        """
+        self.folder = folder
+        self.objects_folder = os.path.join(folder, 'objects')
+        self.names_folder = os.path.join(folder, 'names')
+        os.makedirs(self.objects_folder, exist_ok=True)
+        os.makedirs(self.names_folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._verified = {}
+        """Keys of the objects already verified, with the stamp of the
+        object file when it was verified."""
+
+    @staticmethod
+    def get_key(source):
+        """Computes the key of the contract compiled from a source code.
+
+        :param source: Source code of the contract.
+        :type source: str
+        :rtype: str
+        """
+        digest = hashlib.sha256(source.encode())
+        digest.update(
+            f'\0{sys.implementation.cache_tag}\0{OPTIMIZE_LEVEL}'.encode())
+        return digest.hexdigest()
+
+    def get_object_path(self, key):
+        """Gets the path of a compiled contract, stored or not.
+
+        :param key: Key of the contract.
+        :type key: str
+        :rtype: str
+        """
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid artifact key '{key}'.")
+        return os.path.join(self.objects_folder, key[:_SHARD_LENGTH],
+                            f'{key}.pyc')
+
+    def _name_path(self, contract_name):
+        """Gets the path of the index entry of a contract name.
+
+        :rtype: str
+        """
+        if not contract_name or os.path.basename(contract_name) != \
+                contract_name or contract_name.startswith('.'):
+            raise ValueError(f"Invalid contract name '{contract_name}'.")
+        return os.path.join(self.names_folder, contract_name)
+
+    def verify(self, key):
+        """Checks that a compiled contract is stored and intact.
+
+        :param key: Key of the contract.
+        :type key: str
+        :rtype: bool
+        """
+        object_path = self.get_object_path(key)
+        try:
+            stat = os.stat(object_path)
+            with open(f'{os.path.splitext(object_path)[0]}.sha256') as fd:
+                expected_digest = fd.read().strip()
+        except FileNotFoundError:
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._verified.get(key) == stamp:
+                return True
+        if _sha256_file(object_path) != expected_digest:
+            logging.warning(f'Compiled contract {key} is corrupted.')
+            return False
+        with self._lock:
+            self._verified[key] = stamp
+        return True
+
+    def put(self, source, filename=None):
+        """Compiles a source code into the store, unless already done.
+
+        :param source: Source code of the contract.
+        :type source: str
+        :param filename: Name of the source file, as reported in tracebacks.
+        :type filename: str
+        :return: The key of the compiled contract.
+        :rtype: str
+        """
+        key = self.get_key(source)
+        if self.verify(key):
+            return key
+        object_path = self.get_object_path(key)
+        compile_source(source, object_path, filename=filename)
+        _write_atomic(f'{os.path.splitext(object_path)[0]}.sha256',
+                      _sha256_file(object_path))
+        return key
+
+    def add(self, contract_name, source, filename=None):
+        """Compiles a source code into the store and registers it under a
+        contract name, replacing any previous version.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :param source: Source code of the contract.
+        :type source: str
+        :param filename: Name of the source file, as reported in tracebacks.
+        :type filename: str
+        :return: The path to the compiled contract.
+        :rtype: str
+        """
+        name_path = self._name_path(contract_name)
+        key = self.put(source, filename)
+        _write_atomic(name_path, key)
+        return self.get_object_path(key)
+
+    def get_contract_key(self, contract_name):
+        """Gets the key of the contract stored under a name.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :return: The key, or None if the name is unknown.
+        :rtype: str|None
+        """
+        try:
+            with open(self._name_path(contract_name)) as fd:
+                return fd.read().strip()
+        except FileNotFoundError:
+            return None
+
+    @property
+    def contract_names(self):
+        """Gets the names of the contracts of the store."""
+        return tuple(name for name in os.listdir(self.names_folder)
+                     if not name.endswith('.tmp'))
+
+    def find_script(self, contract_name):
+        """Finds the compiled contract stored under a name.
+
+        :param contract_name: Name of the contract.
+        :type contract_name: str
+        :return: Path to the compiled contract, or None if the name is unknown.
+        :rtype: str|None
+        """
+        key = self.get_contract_key(contract_name)
+        if key is None:
+            return None
+        if not self.verify(key):
+            raise ValueError(f"Compiled contract of '{contract_name}' is "
+                             f"missing or corrupted.")
+        return self.get_object_path(key)
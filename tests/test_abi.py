@@ -0,0 +1,109 @@
+import hashlib
+import json
+
+import pytest
+
+from pikciosc import abi
+from pikciosc.abi import ABI
+from pikciosc.models import CallInfo, ContractInterface, StopWatch, \
+    Variable
+from pikciosc.parse import parse_string
+
+_CONTRACT = '''
+def transfer(to: str, amount: int) -> bool:
+    return True
+
+
+def balance(account: str) -> int:
+    return 0
+'''
+
+
+def _interface(selectors=None):
+    json_dct = parse_string(_CONTRACT, 'contract.py').to_dict()
+    for endpoint in json_dct['endpoints']:
+        endpoint['selector'] = (selectors or {}).get(endpoint['name'])
+    return ContractInterface.from_dict(json_dct)
+
+
+def _abi(selectors=None):
+    return ABI(_interface(selectors))
+
+
+def _selector(signature):
+    return hashlib.sha3_256(signature.encode()).digest()[:8]
+
+
+def setup_function():
+    abi.clear_caches()
+
+
+def test_selectors_hash_the_endpoint_signatures():
+    contract_abi = _abi()
+    interface = parse_string(_CONTRACT, 'contract.py')
+    for endpoint in interface.endpoints:
+        assert contract_abi._encode_endpoint(endpoint.name) == _selector(
+            endpoint.canonical_signature)
+
+
+def test_mismatching_persisted_selectors_are_ignored():
+    expected = _abi()
+    abi.clear_caches()
+    swapped = {
+        'transfer': expected._encode_endpoint('balance').hex(),
+        'balance': expected._encode_endpoint('transfer').hex(),
+    }
+    tampered = _abi(swapped)
+    encoded = tampered.encode_call('balance', {'account': 'a'})
+    assert expected.decode_call(encoded) == ('balance', {'account': 'a'})
+    # The selectors cached for the interface are the right ones.
+    assert _abi()._selectors_map == expected._selectors_map
+
+
+def test_persisted_selectors_are_not_computed_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'contract.json')
+    expected = _abi()
+    expected.persist_selectors(path)
+    abi.clear_caches()
+
+    def sha3_256(_):
+        raise AssertionError('Persisted selectors were computed again.')
+    monkeypatch.setattr(hashlib, 'sha3_256', sha3_256)
+    assert ABI.from_file_interface(path)._selectors_map == \
+        expected._selectors_map
+
+
+def test_persisted_selectors_of_changed_interfaces_are_ignored(tmp_path):
+    path = str(tmp_path / 'contract.json')
+    _abi().persist_selectors(path)
+    abi.clear_caches()
+    with open(path) as fd:
+        json_dct = json.load(fd)
+    # 'balance' now takes an int: its persisted selector is stale.
+    json_dct['endpoints'][1]['params'][0]['type'] = 'int'
+    contract_abi = ABI(ContractInterface.from_dict(json_dct))
+    assert contract_abi._encode_endpoint('balance') == _selector(
+        'balance(int)')
+
+
+def _call_result():
+    return CallInfo('balance', [Variable('account', str, 'a')],
+                    StopWatch(1.0, 2.0), ret_val=42, gas_used=7)
+
+
+def test_call_results_encode_statically_with_the_interface():
+    interface = _interface()
+    encoded = ABI.encode_call_result(_call_result(), interface)
+    assert encoded == _abi().encode_result(_call_result())
+    decoded = ABI.decode_call_result(encoded, interface, allow_pickle=False)
+    assert decoded.to_dict() == _call_result().to_dict()
+
+
+def test_call_results_are_pickled_without_the_interface():
+    with pytest.warns(DeprecationWarning):
+        encoded = ABI.encode_call_result(_call_result())
+    with pytest.warns(DeprecationWarning):
+        decoded = ABI.decode_call_result(encoded)
+    assert decoded.to_dict() == _call_result().to_dict()
+    with pytest.raises(ValueError):
+        ABI.decode_call_result(encoded, allow_pickle=False)
@@ -0,0 +1,178 @@
+import asyncio
+import inspect
+import os
+
+import pytest
+
+from pikciosc.compile import compile_source
+from pikciosc.invoke import aio
+from pikciosc.invoke.aio import AsyncInvoker
+from pikciosc.invoke.limits import ENV_PKC_SC_WALL_TIME_LIMIT
+from pikciosc.models import ERROR_CATEGORY_LIMIT, Variable
+from pikciosc.parse import parse_string
+
+_CONTRACT = '''
+import os
+import time
+
+total = 0
+
+
+def add(amount: int) -> int:
+    global total
+    total += amount
+    return total
+
+
+def nap(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def stubborn(pid_path: str) -> int:
+    with open(pid_path, 'w') as fd:
+        fd.write(str(os.getpid()))
+    while True:
+        try:
+            time.sleep(10)
+        except BaseException:
+            pass
+'''
+
+
+class _Invoker(AsyncInvoker):
+    """Records the timeout and registry of invocations."""
+
+    def __init__(self):
+        super().__init__()
+        self.made = []
+
+    async def invoke(self, bin_folder, interface_folder, last_exec_info,
+                     contract_name, endpoint, kwargs, timeout=None,
+                     registry=None):
+        self.made.append((timeout, registry))
+
+
+def test_timeout_is_still_the_seventh_positional_argument(monkeypatch):
+    invoker = _Invoker()
+    monkeypatch.setattr(aio, '_DEFAULT_INVOKER', invoker)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(aio.invoke_async(
+            'bin', 'interfaces', None, 'contract', 'endpoint', [], 2.5))
+    finally:
+        loop.close()
+    assert invoker.made == [(2.5, None)]
+
+
+def test_registry_follows_timeout():
+    for method in (AsyncInvoker.invoke, AsyncInvoker.invoke_batch,
+                   aio.invoke_async):
+        names = list(inspect.signature(method).parameters)
+        assert names[-2:] == ['timeout', 'registry']
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    monkeypatch.setenv('SANDBOX', 'none')
+    bin_folder = tmp_path / 'bin'
+    interface_folder = tmp_path / 'interfaces'
+    bin_folder.mkdir()
+    interface_folder.mkdir()
+    compile_source(_CONTRACT, str(bin_folder / 'contract.pyc'))
+    parse_string(_CONTRACT, 'contract.py').to_file(
+        str(interface_folder / 'contract.json'))
+    return str(bin_folder), str(interface_folder)
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+async def _read_pid(pid_path):
+    while not os.path.exists(pid_path) or not os.path.getsize(pid_path):
+        await asyncio.sleep(0.01)
+    with open(pid_path) as fd:
+        return int(fd.read())
+
+
+def test_invoke(folders):
+    execution_info = _run(AsyncInvoker().invoke(
+        *folders, None, 'contract', 'add', [Variable('amount', int, 2)]))
+    assert execution_info.is_success
+    assert execution_info.call_info.ret_val == 2
+    assert execution_info.storage_after[0].value == 2
+
+
+def test_invoke_batch(folders):
+    executions = _run(AsyncInvoker().invoke_batch(*folders, None, 'contract', [
+        ('add', [Variable('amount', int, 2)]),
+        ('add', [Variable('amount', int, 3)]),
+    ]))
+    assert [info.call_info.ret_val for info in executions] == [2, 5]
+
+
+def test_concurrency_is_bounded(folders):
+    invoker = AsyncInvoker(max_concurrency=1)
+
+    async def naps():
+        return await asyncio.gather(*(
+            invoker.invoke(*folders, None, 'contract', 'nap',
+                           [Variable('seconds', float, 0.2)])
+            for _ in range(2)
+        ))
+    first, second = sorted(
+        (info.call_info.stop_watch for info in _run(naps())),
+        key=lambda stop_watch: stop_watch.start)
+    assert first.end <= second.start
+
+
+def test_workers_are_killed_on_timeout(folders, tmp_path):
+    pid_path = str(tmp_path / 'worker.pid')
+    with pytest.raises(asyncio.TimeoutError):
+        _run(AsyncInvoker(timeout=0.5).invoke(
+            *folders, None, 'contract', 'stubborn',
+            [Variable('pid_path', str, pid_path)]))
+    with open(pid_path) as fd:
+        assert not _is_running(int(fd.read()))
+
+
+def test_workers_are_killed_on_cancellation(folders, tmp_path):
+    pid_path = str(tmp_path / 'worker.pid')
+
+    async def cancel():
+        task = asyncio.ensure_future(AsyncInvoker().invoke(
+            *folders, None, 'contract', 'stubborn',
+            [Variable('pid_path', str, pid_path)]))
+        pid = await _read_pid(pid_path)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pid
+    assert not _is_running(_run(cancel()))
+
+
+def test_wall_time_limits_fail_the_call(folders, tmp_path, monkeypatch):
+    monkeypatch.setenv(ENV_PKC_SC_WALL_TIME_LIMIT, '0.2')
+    pid_path = str(tmp_path / 'worker.pid')
+    execution_info = _run(AsyncInvoker().invoke(
+        *folders, None, 'contract', 'stubborn',
+        [Variable('pid_path', str, pid_path)]))
+    assert execution_info.call_info.success_info.category == \
+        ERROR_CATEGORY_LIMIT
+    with open(pid_path) as fd:
+        assert not _is_running(int(fd.read()))
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from pikciosc import bulk
+
+_CONTRACT = '''
+def endpoint(a: int) -> int:
+    return a
+'''
+
+
+def _crash_or_process(file_path, **kwargs):
+    """Processes a contract, unless its name asks for a crash."""
+    if 'crash' in os.path.basename(file_path):
+        os._exit(1)
+    return _process_contract(file_path, **kwargs)
+
+
+_process_contract = bulk.process_contract
+
+
+@pytest.fixture
+def contracts(tmp_path):
+    folder = tmp_path / 'contracts'
+    folder.mkdir()
+    for name in ('a', 'b', 'c', 'd'):
+        (folder / f'{name}.py').write_text(_CONTRACT)
+    return folder
+
+
+def _results(output_path):
+    with open(output_path) as fd:
+        return [json.loads(line) for line in fd]
+
+
+def test_run(contracts, tmp_path):
+    output_path = str(tmp_path / 'results.ndjson')
+    assert bulk.run(str(contracts), output_path, workers=2) == (4, 0, 0)
+    results = _results(output_path)
+    assert [os.path.basename(r['file']) for r in results] == [
+        'a.py', 'b.py', 'c.py', 'd.py']
+    assert all(r['interface']['endpoints'] for r in results)
+    assert bulk.run(str(contracts), output_path, workers=2) == (0, 4, 0)
+
+
+def test_failed_contracts_are_processed_again(contracts, tmp_path):
+    output_path = str(tmp_path / 'results.ndjson')
+    (contracts / 'b.py').write_text('def endpoint(a):\n    return a\n')
+    assert bulk.run(str(contracts), output_path, workers=2) == (4, 0, 1)
+    # The error may be transient: it is retried even if b did not change.
+    assert bulk.run(str(contracts), output_path, workers=2) == (1, 3, 1)
+    (contracts / 'b.py').write_text(_CONTRACT)
+    assert bulk.run(str(contracts), output_path, workers=2) == (1, 3, 0)
+    assert bulk.run(str(contracts), output_path, workers=2) == (0, 4, 0)
+
+
+def test_crashes_only_fail_their_contract(contracts, tmp_path,
+                                          monkeypatch):
+    monkeypatch.setattr(bulk, 'process_contract', _crash_or_process)
+    (contracts / 'c_crash.py').write_text(_CONTRACT)
+    output_path = str(tmp_path / 'results.ndjson')
+    assert bulk.run(str(contracts), output_path, workers=2) == (5, 0, 1)
+    errors = {os.path.basename(r['file']): r.get('error')
+              for r in _results(output_path)}
+    assert errors == {'a.py': None, 'b.py': None, 'c.py': None,
+                      'c_crash.py': bulk._CRASH_ERROR, 'd.py': None}
@@ -0,0 +1,57 @@
+import pytest
+
+from pikciosc.abi import ABI
+from pikciosc.codec import SequenceCodec
+from pikciosc.parse import parse_string
+
+_TYPES = [bool, int, float, str, bytes, list, None]
+_VALUES = [True, -3, 2.5, 'text', b'\x00bytes', [1, 'a', None], {'k': (1,)}]
+
+
+def test_round_trip():
+    codec = SequenceCodec(_TYPES)
+    encoded = codec.encode(_VALUES)
+    assert codec.decode(encoded) == (_VALUES, len(encoded))
+    assert codec.decode(memoryview(b'..' + encoded), 2)[0] == _VALUES
+
+
+@pytest.mark.parametrize('value', [2 ** 63, -2 ** 63 - 1, 10 ** 40])
+def test_big_integers(value):
+    codec = SequenceCodec([int, bool])
+    encoded = codec.encode([value, False])
+    assert codec.decode(encoded)[0] == [value, False]
+
+
+@pytest.mark.parametrize('typ, value', [
+    (bool, 5), (bool, 'no'), (bool, None), (bool, 0),
+    (int, True), (int, 1.5), (int, '1'),
+    (float, False), (float, '1.5'),
+    (str, b'bytes'), (bytes, 'text'),
+])
+def test_values_are_not_coerced(typ, value):
+    with pytest.raises(ValueError):
+        SequenceCodec([typ]).encode([value])
+
+
+def test_integers_are_accepted_as_floats():
+    codec = SequenceCodec([float])
+    assert codec.decode(codec.encode([2]))[0] == [2.0]
+
+
+def test_truncated_values_are_rejected():
+    encoded = SequenceCodec([int, str]).encode([10 ** 40, 'text'])
+    for end in range(len(encoded)):
+        with pytest.raises(ValueError):
+            SequenceCodec([int, str]).decode(encoded[:end])
+
+
+def test_abi_rejects_mistyped_arguments():
+    interface = parse_string(
+        'def f(b: bool, amount: int) -> int:\n    return amount\n',
+        'contract.py')
+    abi = ABI(interface)
+    with pytest.raises(ValueError):
+        abi.encode_call('f', {'b': 5, 'amount': 1})
+    encoded = abi.encode_call('f', {'b': True, 'amount': 10 ** 30})
+    assert abi.decode_call(encoded, allow_pickle=False) == (
+        'f', {'b': True, 'amount': 10 ** 30})
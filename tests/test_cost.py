@@ -0,0 +1,84 @@
+from pikciosc.parse import ast_parser
+from pikciosc.parse.cost import CostAnalyser, FunctionCost
+
+
+def _fan_out_contract(count):
+    """Builds a contract whose helpers each call the next one twice, in a
+    loop."""
+    lines = [f'def _helper{count}() -> int:\n    return 1\n']
+    for i in reversed(range(count)):
+        lines.append(
+            f'def _helper{i}() -> int:\n'
+            f'    for _ in range(2):\n'
+            f'        _helper{i + 1}()\n'
+            f'    return _helper{i + 1}()\n'
+        )
+    lines.append('def run() -> int:\n    return _helper0()\n')
+    return '\n'.join(lines)
+
+
+def _profile(source, endpoint):
+    interface = ast_parser.parse(source, 'contract.py')
+    return next(e for e in interface.endpoints if e.name == endpoint).cost
+
+
+def test_loop_depth_follows_calls():
+    profile = _profile(_fan_out_contract(3), 'run')
+    assert profile.max_loop_depth == 3
+    assert profile.recursive is False
+
+
+def test_loop_depth_of_recursive_functions():
+    source = (
+        'def _ping(n: int) -> int:\n'
+        '    for _ in range(n):\n'
+        '        _pong(n - 1)\n'
+        '    return n\n'
+        '\n'
+        'def _pong(n: int) -> int:\n'
+        '    return _ping(n)\n'
+        '\n'
+        'def run(n: int) -> int:\n'
+        '    while n:\n'
+        '        n = _ping(n)\n'
+        '    return n\n'
+    )
+    profile = _profile(source, 'run')
+    assert profile.max_loop_depth == 2
+    assert profile.recursive is True
+
+
+def test_fan_out_call_graphs():
+    profile = _profile(_fan_out_contract(200), 'run')
+    assert profile.max_loop_depth == 200
+    assert len(profile.calls) == 201
+
+
+def test_long_call_chains():
+    count = 5000
+    lines = [f'def _helper{count}() -> int:\n    return 1\n']
+    for i in reversed(range(count)):
+        lines.append(f'def _helper{i}() -> int:\n'
+                     f'    return _helper{i + 1}()\n')
+    lines.append('def run() -> int:\n    return _helper0()\n')
+    profile = _profile('\n'.join(lines), 'run')
+    assert len(profile.calls) == count + 1
+    assert profile.upper_bound is not None
+
+
+def _cost(max_loop_depth, *call_sites):
+    cost = FunctionCost()
+    cost.max_loop_depth = max_loop_depth
+    cost.call_sites = list(call_sites)
+    return cost
+
+
+def test_call_cycles_do_not_depend_on_visiting_order():
+    # a loops over calls to b, which calls a back.
+    costs = {'a': _cost(1, ('b', 1)), 'b': _cost(0, ('a', 0))}
+    for order in (('a', 'b'), ('b', 'a')):
+        analyser = CostAnalyser(costs)
+        profiles = {name: analyser.profile(name) for name in order}
+        assert profiles['a'].max_loop_depth == 1
+        assert profiles['b'].max_loop_depth == 1
+        assert profiles['a'].recursive and profiles['b'].recursive
@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+from pikciosc.invoke.forkserver import ForkServer
+from pikciosc.invoke.limits import ENV_PKC_SC_WALL_TIME_LIMIT
+from pikciosc.models import ERROR_CATEGORY_LIMIT, Variable
+
+_CONTRACT = '''
+import os
+import time
+
+
+def echo(value: int) -> int:
+    return value
+
+
+def stubborn(pid_path: str) -> int:
+    with open(pid_path, 'w') as fd:
+        fd.write(str(os.getpid()))
+    while True:
+        try:
+            time.sleep(10)
+        except BaseException:
+            pass
+'''
+
+_BLOCKING_CONTRACT = '''
+while True:
+    pass
+
+
+def echo(value: int) -> int:
+    return value
+'''
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv(ENV_PKC_SC_WALL_TIME_LIMIT, '0.5')
+    server = ForkServer()
+    yield server
+    server.close()
+
+
+def _write(tmp_path, name, source):
+    path = tmp_path / name
+    path.write_text(source)
+    return str(path)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_children_are_killed_on_timeout(server, tmp_path):
+    script_path = _write(tmp_path, 'contract.py', _CONTRACT)
+    pid_path = str(tmp_path / 'child.pid')
+    execution_info = server.execute(script_path, [], 'stubborn', [
+        Variable('pid_path', str, pid_path)])
+    assert not execution_info.is_success
+    assert execution_info.call_info.success_info.category == \
+        ERROR_CATEGORY_LIMIT
+
+    with open(pid_path) as fd:
+        pid = int(fd.read())
+    deadline = time.monotonic() + 5
+    while _is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not _is_running(pid)
+
+
+def test_blocking_modules_do_not_block_the_server(server, tmp_path):
+    blocking_path = _write(tmp_path, 'blocking.py', _BLOCKING_CONTRACT)
+    assert not server.execute(blocking_path, [], 'echo', [
+        Variable('value', int, 1)]).is_success
+
+    script_path = _write(tmp_path, 'contract.py', _CONTRACT)
+    execution_info = server.execute(script_path, [], 'echo', [
+        Variable('value', int, 2)])
+    assert execution_info.is_success
+    assert execution_info.call_info.ret_val == 2
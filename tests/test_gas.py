@@ -0,0 +1,81 @@
+import pytest
+
+from pikciosc.invoke import gas, shell
+from pikciosc.models import ERROR_CATEGORY_LIMIT, Variable
+
+_CONTRACT = '''
+def _spin():
+    while True:
+        pass
+
+
+def swallow() -> int:
+    count = 0
+    try:
+        while True:
+            count += 1
+    except BaseException:
+        pass
+    while True:
+        count += 1
+
+
+def retry() -> int:
+    while True:
+        try:
+            _spin()
+        except BaseException:
+            continue
+
+
+def cheap() -> int:
+    return 1
+
+
+def builtin_work(n: int) -> int:
+    text = 'x' * n
+    return sum(range(n)) + len(text)
+'''
+
+
+@pytest.fixture
+def contract(tmp_path):
+    path = tmp_path / 'contract.py'
+    path.write_text(_CONTRACT)
+    return shell._load_module(str(path))
+
+
+@pytest.mark.parametrize('granularity', [gas.GRANULARITY_LINE,
+                                         gas.GRANULARITY_OPCODE])
+@pytest.mark.parametrize('endpoint', ['swallow', 'retry'])
+def test_out_of_gas_error_cannot_be_caught(contract, monkeypatch,
+                                           granularity, endpoint):
+    monkeypatch.setenv(gas.ENV_PKC_SC_GAS_GRANULARITY, granularity)
+    call_info = shell._call(contract, endpoint, [], gas_limit=1000)
+    assert not call_info.success_info.is_success
+    assert call_info.success_info.category == ERROR_CATEGORY_LIMIT
+    assert call_info.gas_used == 1000
+    assert call_info.ret_val is None
+
+
+def test_tracing_is_restored_after_out_of_gas(contract):
+    shell._call(contract, 'swallow', [], gas_limit=1000)
+    call_info = shell._call(contract, 'cheap', [], gas_limit=1000)
+    assert call_info.success_info.is_success
+    assert call_info.ret_val == 1
+
+
+@pytest.mark.parametrize('granularity', [gas.GRANULARITY_LINE,
+                                         gas.GRANULARITY_OPCODE])
+def test_work_done_by_builtins_is_not_metered(contract, monkeypatch,
+                                              granularity):
+    # Documented limitation: only the instructions of the contract are
+    # charged, whatever the work done by a builtin call or an operator.
+    monkeypatch.setenv(gas.ENV_PKC_SC_GAS_GRANULARITY, granularity)
+    gas_used = []
+    for n in (10, 10 ** 6):
+        call_info = shell._call(contract, 'builtin_work',
+                                [Variable('n', int, n)], gas_limit=1000)
+        assert call_info.success_info.is_success
+        gas_used.append(call_info.gas_used)
+    assert gas_used[0] == gas_used[1]
@@ -0,0 +1,58 @@
+import pytest
+
+from pikciosc.invoke import invoke
+from pikciosc.invoke.journal import ContractJournal
+from pikciosc.models import Variable
+from pikciosc.parse import parse_string
+
+_CONTRACT = '''
+total = 0
+
+
+def add(amount: int) -> int:
+    global total
+    total += amount
+    return total
+'''
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    monkeypatch.setenv('SANDBOX', 'none')
+    bin_folder = tmp_path / 'bin'
+    interface_folder = tmp_path / 'interfaces'
+    bin_folder.mkdir()
+    interface_folder.mkdir()
+    (bin_folder / 'contract.py').write_text(_CONTRACT)
+    parse_string(_CONTRACT, 'contract.py').to_file(
+        str(interface_folder / 'contract.json'))
+    return str(bin_folder), str(interface_folder)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = ContractJournal(str(tmp_path / 'journal'), 'contract',
+                              snapshot_interval=2)
+    yield journal
+    journal.close()
+
+
+def _add(folders, last_exec_info, journal, amount):
+    return invoke(*folders, last_exec_info, 'contract', 'add',
+                  [Variable('amount', int, amount)], journal=journal)
+
+
+def test_storage_is_restored_from_the_journal(folders, journal):
+    for amount in (1, 2, 3):
+        assert _add(folders, None, journal, amount).is_success
+    assert [var.value for var in journal.get_state()] == [6]
+
+
+def test_last_execution_must_match_the_journal(folders, journal):
+    first = _add(folders, None, journal, 1)
+    second = _add(folders, first, journal, 2)
+    assert second.call_info.ret_val == 3
+    with pytest.raises(ValueError):
+        _add(folders, first, journal, 3)
+    assert len(journal) == 2
+    assert [var.value for var in journal.get_state()] == [3]
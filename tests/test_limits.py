@@ -0,0 +1,30 @@
+import logging
+import threading
+
+import pytest
+
+from pikciosc.invoke import limits
+from pikciosc.invoke.limits import ExecutionLimits, WallTimeExceededError
+
+
+def test_wall_time_limit():
+    with pytest.raises(WallTimeExceededError):
+        with ExecutionLimits(wall_time=0.05):
+            while True:
+                pass
+
+
+def test_unenforced_limits_are_reported(monkeypatch, caplog):
+    monkeypatch.setattr(limits, '_UNENFORCED_WARNED', False)
+
+    def run():
+        with ExecutionLimits(wall_time=0.05):
+            pass
+
+    with caplog.at_level(logging.WARNING):
+        for _ in range(2):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+    assert len(caplog.records) == 1
+    assert 'not enforced' in caplog.records[0].getMessage()
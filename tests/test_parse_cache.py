@@ -0,0 +1,26 @@
+from pikciosc.parse import cache
+from pikciosc.parse.cache import ParseCache
+
+
+def test_key_depends_on_contract_and_backend():
+    key = ParseCache.get_key('a = 1\n', 'contract.py', 'ast')
+    assert key == ParseCache.get_key('a = 1\n', 'contract.py', 'ast')
+    assert key != ParseCache.get_key('a = 2\n', 'contract.py', 'ast')
+    assert key != ParseCache.get_key('a = 1\n', 'other.py', 'ast')
+    assert key != ParseCache.get_key('a = 1\n', 'contract.py', 'mypy')
+
+
+def test_key_depends_on_versions(monkeypatch):
+    key = ParseCache.get_key('a = 1\n', 'contract.py', 'ast')
+    monkeypatch.setattr(cache, 'PARSE_RESULT_FORMAT',
+                        cache.PARSE_RESULT_FORMAT + 1)
+    format_key = ParseCache.get_key('a = 1\n', 'contract.py', 'ast')
+    monkeypatch.setattr(cache, '__version__', '99.0.0')
+    version_key = ParseCache.get_key('a = 1\n', 'contract.py', 'ast')
+    assert len({key, format_key, version_key}) == 3
+
+
+def test_disk_entries_survive_restarts(tmp_path):
+    key = ParseCache.get_key('a = 1\n', 'contract.py', 'ast')
+    ParseCache(str(tmp_path)).put(key, {'error': 'message'})
+    assert ParseCache(str(tmp_path)).get(key) == {'error': 'message'}
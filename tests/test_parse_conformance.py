@@ -0,0 +1,372 @@
+"""Checks that the ast parsing backend matches the mypy backend.
+
+Every contract of the corpus is parsed by both backends without cache. Their
+interfaces, or error types and messages, must be identical. Contracts handed
+to mypy by the ast backend match by construction.
+"""
+import pytest
+
+from pikciosc.parse import ast_parser
+from pikciosc.parse.parser import _parse_mypy
+
+pytest.importorskip('mypy')
+
+_CORPUS = {
+    'storage': '''
+a = 1
+b = 2.5
+c = 'text'
+d = b'by\\tes'
+e = []
+f = ()
+g = {}
+h: int = 3
+i = j = 4
+_private = 5
+k, l = 6, 7
+m = f'folded'
+''',
+    'storage_name': '''
+a = 1
+b = a
+''',
+    'storage_true': 'flag = True\n',
+    'storage_none': 'nothing = None\n',
+    'storage_non_empty': 'items = [1, 2]\n',
+    'storage_negative': 'value = -1\n',
+    'storage_call': 'values = set()\n',
+    'storage_annotation_only': 'value: int\n',
+    'storage_complex': 'value = 1j\n',
+    'endpoints': '''
+"""Module documentation."""
+import math
+from typing import Dict, List, Optional
+
+rate = 0.5
+
+
+def _helper(value: int) -> int:
+    return value * 2
+
+
+def plain(a: int, b: str = 'x', *args: int, c: float, **kwargs: str) -> bool:
+    """Documented endpoint."""
+    return bool(_helper(a))
+
+
+async def later(values: List[int]) -> Optional[Dict[str, int]]:
+    await other(values)
+    return None
+
+
+def other(values: typing.List[int]) -> None:
+    x = 1
+    'Not the first statement.'
+    return
+
+
+def _untyped_private(a, b):
+    return a
+
+
+@staticmethod
+def decorated(a):
+    return a
+''',
+    'missing_types': '''
+def endpoint(a, b):
+    return a
+''',
+    'missing_parameter_type': '''
+def endpoint(a: int, b) -> int:
+    return a
+''',
+    'missing_return_type': '''
+def endpoint(a: int, b: int):
+    return a
+''',
+    'ellipsis_annotation': '''
+def endpoint(a: ...) -> int:
+    return 1
+''',
+    'string_annotation': '''
+def endpoint(a: 'int') -> int:
+    return 1
+''',
+    'elided_parameter': '''
+def endpoint(__a: int) -> int:
+    return __a
+''',
+    'overloads': '''
+@decorator
+def endpoint(a: int) -> int:
+    return a
+
+
+def endpoint(a: str) -> str:
+    return a
+''',
+    'redefinition': '''
+def endpoint(a: int) -> int:
+    return a
+
+
+def endpoint(a: str) -> str:
+    return a + a
+''',
+    'type_comments': '''
+def endpoint(a, b):
+    # type: (int, str) -> bool
+    return True
+
+
+def private(a):  # type: (int) -> None
+    pass
+''',
+    'type_comments_placement': '''
+def after_comment(a):  # A comment.
+    # type: (int) -> int
+    return a
+
+
+def after_blank_line(a):
+
+    # A comment.
+    # type: (int) -> int
+    """Documented."""
+    return a
+
+
+@decorator
+def decorated(a):
+    # type: (int) -> int
+    def nested(b):  # type: (str) -> str
+        return b
+    return a
+
+
+def untyped(a: int) -> int:
+    # Nothing to see here.
+    return a
+''',
+    'type_comment_method': '''
+class Holder(object):
+    def method(self, a):
+        # type: (int) -> int
+        return a
+''',
+    'type_comment_twice': '''
+def endpoint(a):  # type: (int) -> int
+    # type: (str) -> str
+    return a
+''',
+    'type_comment_misplaced': '''
+def endpoint(a):
+    x = 1
+    # type: (int) -> int
+    return a
+''',
+    'type_comment_assignment': '''
+def endpoint(a):
+    # type: (int) -> int
+    x = []  # type: List[int]
+    return a
+''',
+    'type_comment_arity': '''
+def endpoint(a, b):
+    # type: (int) -> int
+    return a
+''',
+    'type_comment_starred': '''
+def endpoint(a, *b, **c):
+    # type: (str, *int, **float) -> int
+    return a
+''',
+    'type_comment_keyword': '''
+def endpoint(a, b):
+    # type: (str, b=int) -> int
+    return a
+''',
+    'type_comment_star_first': '''
+def endpoint(a, b):
+    # type: (*str, int) -> int
+    return a
+''',
+    'type_comment_and_annotation': '''
+def endpoint(a: int):
+    # type: (int) -> int
+    return a
+''',
+    'type_comment_in_string': '''
+def endpoint(a: int) -> str:
+    return "# type: (int) -> int"
+''',
+    'type_ignore': '''
+import missing  # type: ignore
+
+
+def endpoint(a: int) -> int:
+    return a
+''',
+    'syntax_error': '''
+def endpoint(a: int) -> int
+    return a
+''',
+    'statements': '''
+import os
+from os import path as p
+
+
+class Point(object):
+    """A class."""
+    x = 0
+
+    def move(self, dx):
+        self.x += dx
+
+
+def statements(a: int, items: list) -> int:
+    global rate
+    total = 0
+    for i, item in enumerate(items):
+        if item > a:
+            continue
+        elif item < 0:
+            break
+        else:
+            total += item
+    else:
+        total -= 1
+    while total > 100:
+        total //= 2
+    else:
+        pass
+    try:
+        total = total / a
+    except (ZeroDivisionError, ValueError) as e:
+        raise ValueError('bad') from e
+    except Exception:
+        raise
+    else:
+        total += 1
+    finally:
+        del items[0], items[1]
+    with open('a') as fd, open('b'):
+        fd.read()
+    assert total, 'message'
+    x: int = 1
+    y: List[int]
+    del x
+    return total
+''',
+    'expressions': '''
+def expressions(a: int, b: list) -> object:
+    c = a and b or not a and -a
+    d = a + b * 2 ** 3 // 4 % 5 - (a << 1 | a >> 2 & ~a ^ 1)
+    e = 1 < a <= 3 != a is not None in b not in b
+    f = a if b else None
+    g = {'x': 1, **{}}
+    h = {1, 2}
+    i = [x * y for x in b if x for y in b if y if x > y]
+    j = {x for x in b}
+    k = {x: y for x, y in b}
+    l = list(x for x in b)
+    m = lambda x, y=1, *z, w=2, **v: x + y
+    n = b[1], b[1:2], b[::2], b[1:2, 3], b[...]
+    o = [*b, *b]
+    p, *q = b
+    r = f'{a!r:>{a}} and {b}'
+    s = 'a' 'b' f'c'
+    t = b'bytes'
+    u = 1.5, 2j, True, False, None, ...
+    v = a.real.imag
+    w = super().method()
+    x = expressions(*b, **g)
+    return c
+''',
+    'calls': '''
+def leaf(a: int) -> int:
+    return a + 1
+
+
+def middle(a: int) -> int:
+    for i in range(a):
+        a = leaf(i)
+    return a
+
+
+def top(a: int) -> int:
+    values = [middle(x) for x in range(a)]
+    return leaf(middle(a)) + sum(values)
+
+
+def recursive(a: int) -> int:
+    return recursive(a - 1) if a else 0
+
+
+def mutual(a: int) -> int:
+    return other_mutual(a)
+
+
+def other_mutual(a: int) -> int:
+    return mutual(a)
+''',
+    'nested': '''
+def outer(a: int) -> int:
+    def inner(b=a, *, c=None):
+        return b
+
+    @decorator(a)
+    def decorated():
+        yield a
+        yield
+        yield from inner()
+
+    class Local(Base, metaclass=Meta):
+        pass
+    return inner()
+''',
+    'async': '''
+async def endpoint(a: int) -> int:
+    async with lock() as l:
+        async for x in source():
+            await x
+    return [x async for x in source()]
+''',
+    'nonlocal': '''
+def endpoint(a: int) -> int:
+    def inner():
+        nonlocal a
+        a = 2
+    inner()
+    return a
+''',
+}
+"""Contracts covering the constructs of the parsing backends, including the
+ones the ast backend hands to mypy."""
+
+
+def _result(parse, source, filename):
+    """Parses a contract and returns its interface as a dictionary, or its
+    error as a type name and a message.
+
+    :rtype: dict|tuple[str,str]
+    """
+    try:
+        return parse(source, filename).to_dict()
+    except ast_parser.UnsupportedSyntax:
+        raise
+    except Exception as e:
+        return type(e).__name__, str(e)
+
+
+@pytest.mark.parametrize('name', sorted(_CORPUS))
+def test_ast_backend_matches_mypy(name):
+    source = _CORPUS[name]
+    filename = 'submitted_code'
+    expected = _result(_parse_mypy, source, filename)
+    try:
+        actual = _result(ast_parser.parse, source, filename)
+    except ast_parser.UnsupportedSyntax:
+        return
+    assert actual == expected
@@ -0,0 +1,175 @@
+import os
+import sys
+
+import pytest
+
+from pikciosc.invoke import pool as pool_module
+from pikciosc.invoke.limits import WallTimeExceededError
+from pikciosc.invoke.pool import SandboxPool, _Worker
+from pikciosc.invoke.protocol import WorkerError
+from pikciosc.invoke.runner import DockerRunner, LocalRunner
+from pikciosc.invoke.sandbox import execute_sandbox
+from pikciosc.models import Variable
+from pikciosc.store import ArtifactStore
+
+_CONTRACT = '''
+total = 0
+
+
+def add(amount: int) -> int:
+    global total
+    total += amount
+    return total
+
+
+def fail() -> int:
+    raise ValueError('failure')
+'''
+
+
+class _FlakyRunner(LocalRunner):
+    """Local runner failing to start workers while `broken` is set."""
+
+    def __init__(self):
+        self.broken = False
+        self.started = 0
+
+    def command(self, name):
+        if self.broken:
+            raise OSError('runner unavailable')
+        self.started += 1
+        return super().command(name)
+
+
+class _StalledRunner(LocalRunner):
+    """Starts workers writing the beginning of a frame, then hanging."""
+
+    def command(self, name):
+        return [sys.executable, '-c',
+                'import sys, time\n'
+                'sys.stdout.buffer.write(b"\\0\\0\\0\\x10partial")\n'
+                'sys.stdout.flush()\n'
+                'time.sleep(60)\n']
+
+
+@pytest.fixture
+def script_path(tmp_path):
+    path = tmp_path / 'contract.py'
+    path.write_text(_CONTRACT)
+    return str(path)
+
+
+@pytest.fixture
+def runner():
+    return _FlakyRunner()
+
+
+@pytest.fixture
+def pool(runner):
+    pool = SandboxPool(runner, size=1, max_calls=2, acquire_timeout=5.0)
+    yield pool
+    pool.close()
+
+
+def _add(pool, script_path, amount, total=0):
+    return pool.execute(script_path, [Variable('total', int, total)], 'add',
+                        [Variable('amount', int, amount)])
+
+
+def test_execute(pool, script_path):
+    execution_info = _add(pool, script_path, 2, total=3)
+    assert execution_info.is_success
+    assert execution_info.call_info.ret_val == 5
+    assert execution_info.storage_after[0].value == 5
+
+
+def test_execute_batch(pool, script_path):
+    executions = pool.execute_batch(
+        script_path, [Variable('total', int, 0)], [
+            ('add', [Variable('amount', int, 1)]),
+            ('fail', []),
+            ('add', [Variable('amount', int, 2)]),
+        ])
+    assert [info.is_success for info in executions] == [True, False, True]
+    assert executions[-1].call_info.ret_val == 3
+
+
+def test_workers_are_recycled(pool, runner, script_path):
+    for _ in range(3):
+        assert _add(pool, script_path, 1).is_success
+    assert runner.started == 2
+    assert not pool.execute(script_path, [], 'fail', []).is_success
+    assert runner.started == 3
+    assert _add(pool, script_path, 1).is_success
+    assert runner.started == 3
+
+
+def test_pool_recovers_from_runner_failures(pool, runner, script_path):
+    runner.broken = True
+    # The running worker is recycled after its second call.
+    for _ in range(2):
+        assert _add(pool, script_path, 1).is_success
+    for _ in range(2):
+        with pytest.raises(WorkerError):
+            _add(pool, script_path, 1)
+
+    runner.broken = False
+    assert _add(pool, script_path, 1).is_success
+
+
+def test_acquire_times_out(runner, script_path):
+    pool = SandboxPool(runner, size=1, acquire_timeout=0.1)
+    try:
+        worker = pool._acquire()
+        with pytest.raises(WorkerError):
+            pool._acquire()
+        pool._release(worker)
+        assert _add(pool, script_path, 1).is_success
+    finally:
+        pool.close()
+
+
+def test_close_stops_busy_workers_on_release(runner):
+    pool = SandboxPool(runner, size=1)
+    worker = pool._acquire()
+    pool.close()
+    pool._release(worker)
+    assert not worker.is_alive
+    with pytest.raises(RuntimeError):
+        pool._acquire()
+
+
+def test_stored_contracts_share_a_pool(tmp_path, monkeypatch):
+    monkeypatch.setenv('SANDBOX', 'pool')
+    monkeypatch.setenv(pool_module.ENV_SANDBOX_POOL_RUNNER, 'local')
+    monkeypatch.setattr(pool_module, '_POOLS', {})
+    store = ArtifactStore(str(tmp_path / 'store'))
+    script_paths = set()
+    for i in range(8):
+        script_paths.add(store.add(f'contract{i}', f'{_CONTRACT}\n# {i}\n'))
+    assert len({os.path.dirname(path) for path in script_paths}) > 1
+    try:
+        for script_path in script_paths:
+            assert execute_sandbox(script_path, [Variable('total', int, 0)],
+                                   'add', [Variable('amount', int, 1)]
+                                   ).is_success
+        assert list(pool_module._POOLS) == [store.objects_folder]
+    finally:
+        pool_module.close_pools()
+
+
+def test_docker_paths_are_relative_to_the_mounted_folder(tmp_path):
+    runner = DockerRunner(str(tmp_path))
+    assert runner.script_path(str(tmp_path / 'ab' / 'key.pyc')) == \
+        '/usr/src/scripts/ab/key.pyc'
+    with pytest.raises(ValueError):
+        runner.script_path(str(tmp_path.parent / 'key.pyc'))
+
+
+def test_partial_frames_time_out():
+    worker = _Worker(_StalledRunner())
+    try:
+        with pytest.raises(WallTimeExceededError):
+            worker.request({'op': 'ping'}, timeout=0.5)
+    finally:
+        worker.close(timeout=0)
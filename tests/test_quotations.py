@@ -0,0 +1,42 @@
+import base64
+import os
+import py_compile
+import tempfile
+import uuid
+
+from pikciosc.quotations import ENV_PKC_SC_SUBMIT_CHAR_COST, \
+    get_submit_quotation
+
+_CONTRACT = '''
+"""Sample contract."""
+rates = {}
+
+
+def compute_rate(amount: float) -> float:
+    """Computes a rate."""
+    rates[amount] = amount * 0.3
+    return rates[amount]
+'''
+
+
+def _baseline_code_length(source):
+    """Compiles the source like the original submit quotation did, from a
+    temporary file."""
+    source_path = os.path.join(tempfile.gettempdir(), f'{uuid.uuid4()}.py')
+    with open(source_path, 'w') as fd:
+        fd.write(source)
+    try:
+        bytecode_path = py_compile.compile(source_path, optimize=2)
+        try:
+            with open(bytecode_path, 'rb') as fd:
+                return len(base64.encodebytes(fd.read()))
+        finally:
+            os.remove(bytecode_path)
+    finally:
+        os.remove(source_path)
+
+
+def test_submit_quotation_matches_the_baseline(monkeypatch):
+    monkeypatch.setenv(ENV_PKC_SC_SUBMIT_CHAR_COST, '2')
+    assert get_submit_quotation(_CONTRACT).code_length == \
+        _baseline_code_length(_CONTRACT)
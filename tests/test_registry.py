@@ -0,0 +1,42 @@
+import pytest
+
+from pikciosc.invoke import invoke
+from pikciosc.invoke.registry import ContractRegistry
+from pikciosc.models import Variable
+from pikciosc.parse import parse_string
+
+_CONTRACT = '''
+items = [0]
+
+
+def add(x: int) -> int:
+    items.append(x)
+    return len(items)
+'''
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setenv('SANDBOX', 'none')
+    bin_folder = tmp_path / 'bin'
+    interface_folder = tmp_path / 'interfaces'
+    bin_folder.mkdir()
+    interface_folder.mkdir()
+    (bin_folder / 'contract.py').write_text(_CONTRACT)
+    # List initializers can't be parsed, so the storage is declared here.
+    interface = parse_string(_CONTRACT.replace('[0]', '0'), 'contract.py')
+    interface.storage_vars = [Variable('items', list, [0])]
+    interface.to_file(str(interface_folder / 'contract.json'))
+    return ContractRegistry(str(bin_folder), str(interface_folder))
+
+
+def test_invocations_leave_cached_storage_unchanged(registry):
+    results = []
+    for x in range(3):
+        exec_info = invoke(None, None, None, 'contract', 'add',
+                           [Variable('x', int, x)], registry=registry)
+        assert exec_info.is_success
+        results.append(exec_info.call_info.ret_val)
+    assert results == [2, 2, 2]
+    storage = registry.get_interface('contract').storage_vars
+    assert [var.value for var in storage] == [[0]]
@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import wait
+
+import pytest
+
+from pikciosc.invoke import scheduler
+from pikciosc.invoke.scheduler import InvocationScheduler
+from pikciosc.models import ExecutionInfo
+
+
+class _Calls(object):
+    """Records invocations, which block until `release` is set."""
+
+    def __init__(self):
+        self.made = []
+        self.release = threading.Event()
+
+    def invoke(self, _bin, _interfaces, _last, contract_name, endpoint, *_):
+        self.made.append((contract_name, endpoint))
+        self.release.wait(5)
+        return ExecutionInfo([], storage_delta=[])
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = _Calls()
+    monkeypatch.setattr(scheduler, 'invoke', calls.invoke)
+    return calls
+
+
+def test_calls_to_a_contract_run_in_order(calls):
+    calls.release.set()
+    invocation_scheduler = InvocationScheduler(None, None, max_workers=4)
+    futures = [invocation_scheduler.submit('a', str(i), []) for i in range(5)]
+    for future in futures:
+        future.result(5)
+    invocation_scheduler.shutdown()
+    assert calls.made == [('a', str(i)) for i in range(5)]
+
+
+def test_shutdown_rejects_new_calls(calls):
+    calls.release.set()
+    invocation_scheduler = InvocationScheduler(None, None, max_workers=1)
+    invocation_scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        invocation_scheduler.submit('a', 'f', [])
+
+
+def test_shutdown_without_wait_cancels_queued_calls(calls):
+    invocation_scheduler = InvocationScheduler(None, None, max_workers=1)
+    running = invocation_scheduler.submit('a', 'first', [])
+    queued = [invocation_scheduler.submit('a', 'next', []),
+              invocation_scheduler.submit('b', 'other', [])]
+    invocation_scheduler.shutdown(wait=False)
+    with pytest.raises(RuntimeError):
+        invocation_scheduler.submit('a', 'late', [])
+
+    calls.release.set()
+    running.result(5)
+    wait(queued, 5)
+    assert all(future.cancelled() for future in queued)
+    stats = invocation_scheduler.stats()
+    assert stats['queued'] == 0
+    assert stats['running'] == 0
+    assert calls.made == [('a', 'first')]
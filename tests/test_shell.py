@@ -0,0 +1,31 @@
+from pikciosc.invoke import shell
+from pikciosc.models import Variable
+
+_CONTRACT = '''
+counter = 0
+balances = {}
+history = []
+
+
+def deposit(account: str, amount: int) -> int:
+    balances[account] = balances.get(account, 0) + amount
+    return balances[account]
+'''
+
+
+def test_storage_delta_holds_the_changed_variables(tmp_path):
+    script_path = tmp_path / 'contract.py'
+    script_path.write_text(_CONTRACT)
+    balances = {'a': 1}
+    storage_vars = [Variable('counter', int, 3),
+                    Variable('balances', dict, balances),
+                    Variable('history', list, [1, 2])]
+    execution_info = shell.execute(str(script_path), storage_vars, 'deposit', [
+        Variable('account', str, 'a'), Variable('amount', int, 2)])
+    assert execution_info.is_success
+    assert [(var.name, var.value) for var in execution_info.storage_delta] \
+        == [('balances', {'a': 3})]
+    assert [var.value for var in execution_info.storage_after] == \
+        [3, {'a': 3}, [1, 2]]
+    # Values provided by the caller are left unchanged.
+    assert balances == {'a': 1}